@@ -1,4 +1,16 @@
-from django.contrib import admin
+from datetime import date
+
+from django.contrib import admin, messages
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connection
+from django.db.models import QuerySet
+from django.template.response import TemplateResponse
+from django.utils.functional import cached_property
+from django.urls import path
+from django.utils import timezone
+
+from .export import reponse_export
+from .rapports import rapport
 from .models import (
     Ville,
     ActiviteJour,
@@ -8,7 +20,112 @@ from .models import (
     PackComplet,
     ReservationPackComplet,
     OptionReservation,
+    EmailSortant,
+    StatistiqueJournaliere,
+    TauxChange,
+    STATUT,
 )
+from .prix import recalculer_prix
+
+
+def action_changer_statut(statut, libelle):
+    """
+    Construit une action admin qui passe les réservations sélectionnées au statut donné
+    en une seule requête UPDATE ; les clients sont notifiés par lot (statuts_modifies).
+    """
+    def action(modeladmin, request, queryset):
+        lignes = queryset.update(statut=statut)
+        modeladmin.message_user(request, f"{lignes} réservation(s) passée(s) au statut « {libelle} ».", messages.SUCCESS)
+
+    action.__name__ = f"marquer_{statut.replace(' ', '_')}"
+    action.short_description = f"Passer au statut « {libelle} »"
+    return action
+
+
+def action_exporter(format_fichier):
+    """
+    Construit une action admin qui exporte les lignes sélectionnées (ou toute
+    la liste filtrée) en flux, sans charger la table en mémoire (voir export.py).
+    """
+    def action(modeladmin, request, queryset):
+        return reponse_export(queryset, format_fichier)
+
+    action.__name__ = f"exporter_{format_fichier}"
+    action.short_description = f"Exporter en {format_fichier.upper()}"
+    return action
+
+
+ACTIONS_EXPORT = [action_exporter("csv"), action_exporter("xlsx")]
+
+
+# -----------------------------
+# LISTES SUR LES GRANDES TABLES
+# -----------------------------
+
+# En dessous de ce nombre de lignes estimées, le COUNT(*) exact reste bon marché
+SEUIL_COMPTE_ESTIME = 10000
+
+
+def estimation_lignes(modele):
+    """
+    Nombre de lignes estimé par les statistiques du SGBD (pg_class sous
+    PostgreSQL, sqlite_stat1 après ANALYZE sous SQLite), None si indisponible.
+    Sous SQLite, chaque ligne de sqlite_stat1 (une par index de la table, idx
+    NULL pour une table sans index) commence par le nombre de lignes indexées :
+    le plus grand est retenu, un index partiel n'en couvrant qu'une partie.
+    """
+    table = modele._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [table])
+            elif connection.vendor == "sqlite":
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+                if cursor.fetchone() is None:
+                    return None
+                cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s", [table])
+            else:
+                return None
+            lignes = cursor.fetchall()
+    except DatabaseError:
+        return None
+    estimations = [int(str(stat).split()[0]) for stat, in lignes if str(stat).split()]
+    if not estimations or max(estimations) < 0:
+        return None
+    return max(estimations)
+
+
+class PaginateurEstime(Paginator):
+    """Compte estimé pour une liste non filtrée sur une grande table, COUNT(*) sinon."""
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if isinstance(queryset, QuerySet) and not queryset.query.where:
+            estimation = estimation_lignes(queryset.model)
+            if estimation is not None and estimation >= SEUIL_COMPTE_ESTIME:
+                return estimation
+        return super().count
+
+
+class GrandeTableAdmin(admin.ModelAdmin):
+    """
+    Liste admin en nombre de requêtes constant : les colonnes (et les __str__)
+    qui suivent une clé étrangère doivent figurer dans list_select_related.
+    """
+    paginator = PaginateurEstime
+    # Évite le second COUNT(*) sur toute la table quand un filtre est actif
+    show_full_result_count = False
+
+
+class ActiviteJourFilter(admin.RelatedFieldListFilter):
+    """Filtre par activité : ActiviteJour.__str__ affiche la ville (une seule requête)."""
+
+    def field_choices(self, field, request, model_admin):
+        return [
+            (activite.pk, str(activite))
+            for activite in ActiviteJour.objects.select_related("ville").order_by("ville__nom", "nom")
+        ]
 
 # -----------------------------
 # VILLE
@@ -24,8 +141,9 @@ class VilleAdmin(admin.ModelAdmin):
 # ACTIVITÉ JOUR
 # -----------------------------
 @admin.register(ActiviteJour)
-class ActiviteJourAdmin(admin.ModelAdmin):
+class ActiviteJourAdmin(GrandeTableAdmin):
     list_display = ['nom', 'ville', 'duree']
+    list_select_related = ['ville']
     list_filter = ['ville']
     search_fields = ['nom', 'description']
     ordering = ['ville', 'nom']
@@ -36,8 +154,8 @@ class ActiviteJourAdmin(admin.ModelAdmin):
 # -----------------------------
 @admin.register(PackJour)
 class PackJourAdmin(admin.ModelAdmin):
-    list_display = ['nom', 'prix_mad', 'prix_eur', 'prix_usd']
-    list_filter = ['activites']
+    list_display = ['nom', 'prix_mad', 'prix_eur', 'prix_usd', 'capacite_journaliere']
+    list_filter = [('activites', ActiviteJourFilter)]
     search_fields = ['nom', 'description']
     filter_horizontal = ['activites']
     ordering = ['nom']
@@ -47,19 +165,22 @@ class PackJourAdmin(admin.ModelAdmin):
 # RÉSERVATION PACK JOUR
 # -----------------------------
 @admin.register(ReservationPackJour)
-class ReservationPackJourAdmin(admin.ModelAdmin):
-    list_display = ['pack', 'user', 'date', 'nb_personne', 'devise', 'date_reservation']
+class ReservationPackJourAdmin(GrandeTableAdmin):
+    list_display = ['pack', 'user', 'date', 'nb_personne', 'devise', 'montant_total', 'date_reservation']
+    list_select_related = ['pack', 'user']
     list_filter = ['devise']
-    search_fields = ['pack__nom', 'user__username']
+    search_fields = ['pack__nom', 'user__email']
     ordering = ['-date_reservation']
+    actions = ACTIONS_EXPORT
 
 
 # -----------------------------
 # ACTIVITÉ COMPLÈTE (segmentée par jour)
 # -----------------------------
 @admin.register(ActiviteComplet)
-class ActiviteCompletAdmin(admin.ModelAdmin):
+class ActiviteCompletAdmin(GrandeTableAdmin):
     list_display = ['nom', 'pack', 'jour_numero']
+    list_select_related = ['pack']
     list_filter = ['pack', 'jour_numero']
     search_fields = ['nom', 'description']
     ordering = ['pack', 'jour_numero', 'nom']
@@ -70,7 +191,7 @@ class ActiviteCompletAdmin(admin.ModelAdmin):
 # -----------------------------
 @admin.register(PackComplet)
 class PackCompletAdmin(admin.ModelAdmin):
-    list_display = ['nom', 'type_pack', 'duree_jours', 'prix_mad', 'prix_eur', 'prix_usd']
+    list_display = ['nom', 'type_pack', 'duree_jours', 'prix_mad', 'prix_eur', 'prix_usd', 'capacite_journaliere']
     list_filter = ['type_pack']
     search_fields = ['nom', 'description']
     ordering = ['nom']
@@ -80,23 +201,106 @@ class PackCompletAdmin(admin.ModelAdmin):
 # RÉSERVATION PACK COMPLET
 # -----------------------------
 @admin.register(ReservationPackComplet)
-class ReservationPackCompletAdmin(admin.ModelAdmin):
-    list_display = ['pack', 'user', 'date_debut', 'date_fin', 'nb_personne', 'devise', 'statut', 'date_reservation']
+class ReservationPackCompletAdmin(GrandeTableAdmin):
+    list_display = ['pack', 'user', 'date_debut', 'date_fin', 'nb_personne', 'devise', 'montant_total', 'statut', 'date_reservation']
+    list_select_related = ['pack', 'user']
     list_filter = ['devise', 'statut']
-    search_fields = ['pack__nom', 'user__username']
+    search_fields = ['pack__nom', 'user__email']
     ordering = ['-date_reservation']
+    actions = [action_changer_statut(statut, libelle) for statut, libelle in STATUT] + ACTIONS_EXPORT
 
 
 # -----------------------------
 # OPTIONS DE RÉSERVATION
 # -----------------------------
 @admin.register(OptionReservation)
-class OptionReservationAdmin(admin.ModelAdmin):
+class OptionReservationAdmin(GrandeTableAdmin):
     list_display = [
         'nom_option', 'type_option', 'quantite',
         'prix_mad', 'prix_eur', 'prix_usd',
         'reservation_complet', 'reservation_jour'
     ]
+    list_select_related = ['reservation_complet__pack', 'reservation_jour__pack']
     list_filter = ['type_option']
     search_fields = ['nom_option']
     ordering = ['nom_option']
+    actions = ACTIONS_EXPORT
+
+
+# -----------------------------
+# TAUX DE CHANGE
+# -----------------------------
+@admin.register(TauxChange)
+class TauxChangeAdmin(admin.ModelAdmin):
+    list_display = ['devise', 'taux', 'date_maj']
+    ordering = ['devise']
+    actions = ['retarifier_catalogue']
+
+    @admin.action(description="Recalculer les prix des packs et options avec les taux actuels")
+    def retarifier_catalogue(self, request, queryset):
+        lignes = sum(recalculer_prix().values())
+        self.message_user(request, f"{lignes} prix recalculé(s).", messages.SUCCESS)
+
+
+# -----------------------------
+# FILE D'ENVOI DES E-MAILS
+# -----------------------------
+@admin.register(EmailSortant)
+class EmailSortantAdmin(GrandeTableAdmin):
+    list_display = ['sujet', 'statut', 'tentatives', 'prochaine_tentative', 'date_creation', 'date_envoi']
+    list_filter = ['statut']
+    search_fields = ['sujet']
+    ordering = ['-date_creation']
+
+
+# -----------------------------
+# STATISTIQUES ET TABLEAU DE BORD
+# -----------------------------
+@admin.register(StatistiqueJournaliere)
+class StatistiqueJournaliereAdmin(admin.ModelAdmin):
+    list_display = ['jour', 'pack_nom', 'type_reservation', 'devise', 'nb_reservations', 'nb_personnes', 'chiffre_affaires']
+    list_filter = ['type_reservation', 'devise', 'type_pack']
+    date_hierarchy = 'jour'
+    ordering = ['-jour']
+    change_list_template = 'admin/Appli/statistiques_change_list.html'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        urls = [
+            path(
+                'tableau-de-bord/',
+                self.admin_site.admin_view(self.tableau_de_bord),
+                name='Appli_statistiques_tableau_de_bord',
+            ),
+        ]
+        return urls + super().get_urls()
+
+    def tableau_de_bord(self, request):
+        """Synthèse de l'année (ou de ?debut=&fin=) à partir des agrégats journaliers."""
+        aujourd_hui = timezone.localdate()
+        try:
+            debut = date.fromisoformat(request.GET.get('debut', ''))
+        except ValueError:
+            debut = aujourd_hui.replace(month=1, day=1)
+        try:
+            fin = date.fromisoformat(request.GET.get('fin', ''))
+        except ValueError:
+            fin = aujourd_hui
+
+        context = {
+            **self.admin_site.each_context(request),
+            'title': "Tableau de bord des réservations",
+            'opts': self.model._meta,
+            'debut': debut,
+            'fin': fin,
+            'par_mois': rapport(debut, fin, par='mois'),
+            'par_type_pack': rapport(debut, fin, par='type_pack'),
+            'par_pack': rapport(debut, fin, par='pack'),
+            'par_ville': rapport(debut, fin, par='ville'),
+        }
+        return TemplateResponse(request, 'admin/Appli/rapports.html', context)
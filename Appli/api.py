@@ -0,0 +1,286 @@
+import codecs
+import hashlib
+import hmac
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.middleware.csrf import CsrfViewMiddleware
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+
+from .disponibilites import disponibilites
+from .import_reservations import ImportReservations, LECTEURS, TAILLE_LOT
+from .liste_packs import filtres_requete, page_packs, TAILLE_PAGE
+from .models import PackJour, PackComplet, TYPE_DOCUMENT_CHOICES
+from .profilage import budget_requetes
+from .catalogue import cache_catalogue
+from .notification.email import notifier_import_reservations
+from .recherche import rechercher, version_recherche, LIBELLES_TRANCHE, PAR_PAGE
+
+# -----------------------------------------------------------------
+# API : DISPONIBILITÉS D'UN PACK
+# -----------------------------------------------------------------
+
+MODELES_PACK = {
+    "jour": PackJour,
+    "complet": PackComplet,
+}
+
+DUREE_PAR_DEFAUT = 30
+DUREE_MAX = 92
+# Le calendrier public ne remonte pas avant aujourd'hui ni au-delà d'un an
+HORIZON_JOURS = 366
+
+# Durée de fraîcheur côté navigateur / CDN ; au-delà, revalidation par ETag
+CACHE_DISPONIBILITES = 60
+CACHE_LISTE_PACKS = 60
+CACHE_RECHERCHE = 60
+CLE_RECHERCHE = "recherche:v{version}:{empreinte}"
+
+
+def _erreur(message):
+    return JsonResponse({"erreur": message}, status=400)
+
+
+@budget_requetes(6)
+@require_GET
+def disponibilites_pack(request, type_pack, pack_id):
+    """
+    /api/packs/<jour|complet>/<id>/availability?from=AAAA-MM-JJ&to=AAAA-MM-JJ
+
+    Places restantes par jour, sous forme de liste compacte à partir de `from`.
+    L'ETag dérive du compteur version_disponibilite du pack : un calendrier
+    inchangé est revalidé (304) sans lire l'index.
+    """
+    modele = MODELES_PACK.get(type_pack)
+    if modele is None:
+        raise Http404("Type de pack inconnu.")
+
+    try:
+        debut = date.fromisoformat(request.GET["from"]) if "from" in request.GET else timezone.localdate()
+        fin = date.fromisoformat(request.GET["to"]) if "to" in request.GET else debut + timedelta(days=DUREE_PAR_DEFAUT - 1)
+    except (ValueError, OverflowError):
+        return _erreur("Dates invalides (format AAAA-MM-JJ).")
+    if fin < debut:
+        return _erreur("`to` doit être postérieur ou égal à `from`.")
+    if (fin - debut).days >= DUREE_MAX:
+        return _erreur(f"Période limitée à {DUREE_MAX} jours.")
+    aujourd_hui = timezone.localdate()
+    if debut < aujourd_hui or fin > aujourd_hui + timedelta(days=HORIZON_JOURS):
+        return _erreur(f"Période limitée à aujourd'hui et aux {HORIZON_JOURS} jours suivants.")
+
+    pack = get_object_or_404(
+        modele.objects.only("id", "capacite_journaliere", "version_disponibilite"),
+        pk=pack_id,
+    )
+
+    etag = f'"{type_pack}-{pack.pk}-{pack.version_disponibilite}-{pack.capacite_journaliere}-{debut:%Y%m%d}-{fin:%Y%m%d}"'
+    reponse = get_conditional_response(request, etag=etag)
+    if reponse is None:
+        places = disponibilites(pack, debut, fin)
+        reponse = JsonResponse({
+            "pack": pack.pk,
+            "type": type_pack,
+            "from": debut,
+            "to": fin,
+            "capacite": pack.capacite_journaliere,
+            # None : pack sans limite de places
+            "places": list(places.values()) if places is not None else None,
+        })
+
+    reponse["ETag"] = etag
+    patch_cache_control(reponse, public=True, max_age=CACHE_DISPONIBILITES)
+    return reponse
+
+
+def _entier(valeur, nom):
+    if not valeur:
+        return None
+    try:
+        return int(valeur)
+    except ValueError:
+        raise ValueError(f"`{nom}` doit être un entier.")
+
+
+# -----------------------------------------------------------------
+# API : LISTE DES PACKS (CARTES ET AUTOCOMPLÉTION)
+# -----------------------------------------------------------------
+
+def _carte_pack(pack, type_pack):
+    return {
+        "id": pack.pk,
+        "nom": pack.nom,
+        "prix_mad": pack.prix_mad,
+        "image": pack.image.url if pack.image else "",
+        "url": reverse(f"reservation_{type_pack}_detail", args=[pack.pk]),
+        "type_pack": getattr(pack, "type_pack", None),
+        "duree_jours": getattr(pack, "duree_jours", 1),
+    }
+
+
+@budget_requetes(2)
+@require_GET
+def liste_packs(request, type_pack):
+    """
+    /api/packs/<jour|complet>/?ville=3&type_pack=AVENTURE&duree=4&prix=1500-5000&q=sah&apres=<curseur>&taille=10
+
+    Page de packs triés par nom, filtrés en SQL ; `suivant` est le curseur de
+    la page suivante (None en fin de liste). Sert aussi l'autocomplétion des
+    formulaires de réservation (`q`, `taille`).
+    """
+    modele = MODELES_PACK.get(type_pack)
+    if modele is None:
+        raise Http404("Type de pack inconnu.")
+
+    try:
+        filtres = filtres_requete(request.GET)
+        taille = _entier(request.GET.get("taille"), "taille") or TAILLE_PAGE
+    except ValueError as exc:
+        return _erreur(str(exc))
+
+    packs, suivant = page_packs(modele, apres=request.GET.get("apres"), taille=taille, **filtres)
+    reponse = JsonResponse({
+        "packs": [_carte_pack(pack, type_pack) for pack in packs],
+        "suivant": suivant,
+    })
+    patch_cache_control(reponse, public=True, max_age=CACHE_LISTE_PACKS)
+    return reponse
+
+
+# -----------------------------------------------------------------
+# API : RECHERCHE
+# -----------------------------------------------------------------
+
+
+@budget_requetes(8)
+@require_GET
+def recherche(request):
+    """
+    /recherche/?q=desert&type_pack=AVENTURE&ville=3&duree=4&prix=1500-5000&type=pack_complet&page=2
+
+    Recherche plein texte (accents ignorés, pluriels et dérivés ramenés à leur
+    racine) avec facettes type_pack, ville, durée et tranche de prix.
+    """
+    parametres = request.GET
+    if parametres.get("type") and parametres["type"] not in dict(TYPE_DOCUMENT_CHOICES):
+        return _erreur("Type de document inconnu.")
+    if parametres.get("prix") and parametres["prix"] not in LIBELLES_TRANCHE:
+        return _erreur("Tranche de prix inconnue.")
+    try:
+        ville = _entier(parametres.get("ville"), "ville")
+        duree = _entier(parametres.get("duree"), "duree")
+        page = _entier(parametres.get("page"), "page") or 1
+        par_page = _entier(parametres.get("par_page"), "par_page") or PAR_PAGE
+    except ValueError as exc:
+        return _erreur(str(exc))
+
+    criteres = dict(
+        q=parametres.get("q", "")[:200],
+        type_objet=parametres.get("type"),
+        type_pack=parametres.get("type_pack"),
+        ville=ville,
+        duree=duree,
+        tranche=parametres.get("prix"),
+        page=page,
+        par_page=par_page,
+    )
+    # Résultats sérialisés mis en cache sous la version de l'index
+    cache = cache_catalogue()
+    empreinte = hashlib.sha1(repr(sorted(criteres.items())).encode()).hexdigest()
+    cle = CLE_RECHERCHE.format(version=version_recherche(), empreinte=empreinte)
+    resultat = cache.get(cle)
+    if resultat is None:
+        resultat = rechercher(**criteres)
+        resultat["resultats"] = [
+            {
+                "type": document.type_objet,
+                "id": document.objet_id,
+                "titre": document.titre,
+                "resume": document.resume,
+                "url": document.url,
+                "type_pack": document.type_pack,
+                "duree_jours": document.duree_jours,
+                "prix_mad": document.prix_mad,
+                "villes": document.villes_resultat,
+            }
+            for document in resultat["resultats"]
+        ]
+        cache.set(cle, resultat, CACHE_RECHERCHE)
+    reponse = JsonResponse(resultat)
+    patch_cache_control(reponse, public=True, max_age=CACHE_RECHERCHE)
+    return reponse
+
+
+# -----------------------------------------------------------------
+# API : IMPORT DE RÉSERVATIONS EN LOT (PARTENAIRES, STAFF)
+# -----------------------------------------------------------------
+
+FORMATS_IMPORT = {
+    "application/x-ndjson": "jsonl",
+    "application/jsonl": "jsonl",
+    "text/csv": "csv",
+}
+
+
+def _partenaire(request):
+    """Nom de l'agence du jeton « Authorization: Bearer … », None si absent ou inconnu."""
+    schema, _, jeton = request.headers.get("Authorization", "").partition(" ")
+    if schema.lower() != "bearer" or not jeton:
+        return None
+    for connu, nom in settings.PARTENAIRES_JETONS.items():
+        if hmac.compare_digest(jeton.encode(), connu.encode()):
+            return nom
+    return None
+
+
+@csrf_exempt
+@require_POST
+def import_reservations(request):
+    """
+    POST /api/reservations/import/?taille_lot=1000
+    Corps JSONL (application/x-ndjson) ou CSV (text/csv), voir import_reservations.py.
+
+    Agences : jeton « Authorization: Bearer … » (settings.PARTENAIRES_JETONS),
+    sans colonne `client` (un jeton ne désigne aucun compte client).
+    Staff : session, avec le jeton CSRF habituel. Le corps est lu ligne à ligne,
+    sans être chargé en mémoire. Répond le rapport d'import
+    {"lignes", "reservations", "options", "erreurs": [{"ligne", "reference", "erreurs"}]}.
+    Un envoi répété est sans effet : les références déjà importées par la même
+    agence (ou le même compte staff) sont rejetées.
+    """
+    source = _partenaire(request)
+    partenaire = source is not None
+    if not partenaire:
+        if not request.user.is_staff:
+            return JsonResponse({"erreur": "Authentification requise."}, status=401)
+        # Vue exemptée pour les jetons : la session reste soumise au contrôle CSRF
+        refus = CsrfViewMiddleware(lambda r: None).process_view(request, None, (), {})
+        if refus is not None:
+            return refus
+        source = request.user.email
+
+    format_fichier = request.GET.get("format") or FORMATS_IMPORT.get(request.content_type)
+    if format_fichier not in LECTEURS:
+        return _erreur("Format attendu : JSONL (application/x-ndjson) ou CSV (text/csv).")
+    try:
+        taille_lot = _entier(request.GET.get("taille_lot"), "taille_lot") or TAILLE_LOT
+    except ValueError as exc:
+        return _erreur(str(exc))
+
+    importeur = ImportReservations(
+        taille_lot=max(1, min(taille_lot, TAILLE_LOT)), clients_autorises=not partenaire, source=source
+    )
+    try:
+        rapport = importeur.importer(LECTEURS[format_fichier](codecs.iterdecode(request, "utf-8-sig")))
+        status = 200
+    except UnicodeDecodeError:
+        # Les paquets déjà lus restent enregistrés : le rapport les décompte
+        rapport = dict(importeur.rapport(), erreur="Le fichier doit être encodé en UTF-8.")
+        status = 400
+    notifier_import_reservations(importeur, source=source)
+    return JsonResponse(rapport, status=status)
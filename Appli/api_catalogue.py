@@ -0,0 +1,273 @@
+import hashlib
+from datetime import datetime, timezone as tz
+from functools import wraps
+from itertools import groupby
+
+from django.db.models import Prefetch
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import condition, require_GET
+
+from .catalogue import date_modification_catalogue, version_catalogue
+from .models import Ville, ActiviteJour, ActiviteComplet, PackJour, PackComplet
+from .prix import prix_en_lot
+from .profilage import budget_requetes
+from .serialisation import reponse_json
+
+# -----------------------------------------------------------------
+# API CATALOGUE (LECTURE SEULE) : /api/v1/…
+# -----------------------------------------------------------------
+# Villes, packs jour (avec leurs activités) et packs complets (activités
+# regroupées par jour), prix dans chaque devise de MONNAIE_CHOICES.
+# - Nombre de requêtes constant : une requête par niveau (prefetch_related) ;
+#   les activités ne sont lues que si le champ est demandé.
+# - ?fields=id,nom,prix : champs renvoyés (tous par défaut).
+# - ETag et Last-Modified dérivent de la version du catalogue : une
+#   revalidation (If-None-Match / If-Modified-Since) répond 304 sans requête.
+# - Réponses compressées en gzip si le client l'accepte.
+# - Listes paginées par curseur sur l'id : ?apres=<id>&taille=<n>.
+
+VERSION_API = "v1"
+CACHE_API_CATALOGUE = 300
+
+TAILLE_PAGE = 50
+TAILLE_PAGE_MAX = 200
+
+
+def _url_image(image):
+    return image.url if image else ""
+
+
+def _ville_courte(ville):
+    return {"id": ville.pk, "nom": ville.nom}
+
+
+# -----------------------------
+# SÉRIALISATION
+# -----------------------------
+
+def _ville(ville, champs):
+    return {
+        "id": ville.pk,
+        "nom": ville.nom,
+        "description": ville.description or "",
+        "image": _url_image(ville.image),
+    }
+
+
+def _pack_jour(pack, champs):
+    donnees = {
+        "id": pack.pk,
+        "nom": pack.nom,
+        "description": pack.description or "",
+        "image": _url_image(pack.image),
+        "capacite_journaliere": pack.capacite_journaliere,
+        "url": reverse("reservation_jour_detail", args=[pack.pk]),
+    }
+    if "activites" in champs:
+        donnees["activites"] = [
+            {
+                "id": activite.pk,
+                "nom": activite.nom,
+                "description": activite.description or "",
+                "duree": activite.duree or "",
+                "ville": _ville_courte(activite.ville),
+            }
+            for activite in pack.activites.all()
+        ]
+    return donnees
+
+
+def _pack_complet(pack, champs):
+    donnees = {
+        "id": pack.pk,
+        "nom": pack.nom,
+        "description": pack.description or "",
+        "image": _url_image(pack.image),
+        "type_pack": pack.type_pack,
+        "type_pack_libelle": pack.get_type_pack_display(),
+        "duree_jours": pack.duree_jours,
+        "duree_nuits": pack.duree_nuits,
+        "capacite_journaliere": pack.capacite_journaliere,
+        "url": reverse("reservation_complet_detail", args=[pack.pk]),
+    }
+    if "activites" in champs:
+        # Activités triées par jour_numero à la lecture (voir _packs_complet)
+        donnees["activites"] = [
+            {
+                "jour_numero": jour_numero,
+                "activites": [
+                    {
+                        "id": activite.pk,
+                        "nom": activite.nom,
+                        "description": activite.description or "",
+                        "villes": [_ville_courte(ville) for ville in activite.villes.all()],
+                    }
+                    for activite in activites
+                ],
+            }
+            for jour_numero, activites in groupby(pack.activites.all(), key=lambda a: a.jour_numero)
+        ]
+    return donnees
+
+
+# -----------------------------
+# REQUÊTES
+# -----------------------------
+
+def _villes(champs):
+    return Ville.objects.all()
+
+
+def _packs_jour(champs):
+    packs = PackJour.objects.all()
+    if "activites" in champs:
+        packs = packs.prefetch_related(
+            Prefetch("activites", queryset=ActiviteJour.objects.select_related("ville").order_by("nom", "id"))
+        )
+    return packs
+
+
+def _packs_complet(champs):
+    packs = PackComplet.objects.all()
+    if "activites" in champs:
+        packs = packs.prefetch_related(
+            Prefetch(
+                "activites",
+                queryset=ActiviteComplet.objects.order_by("jour_numero", "id").prefetch_related(
+                    Prefetch("villes", queryset=Ville.objects.only("id", "nom").order_by("nom"))
+                ),
+            )
+        )
+    return packs
+
+
+# (requête, sérialisation, champs disponibles, prix par devise)
+RESSOURCES = {
+    "villes": (
+        _villes, _ville,
+        ("id", "nom", "description", "image"),
+        False,
+    ),
+    "packs/jour": (
+        _packs_jour, _pack_jour,
+        ("id", "nom", "description", "image", "prix", "capacite_journaliere", "url", "activites"),
+        True,
+    ),
+    "packs/complet": (
+        _packs_complet, _pack_complet,
+        ("id", "nom", "description", "image", "type_pack", "type_pack_libelle", "duree_jours",
+         "duree_nuits", "prix", "capacite_journaliere", "url", "activites"),
+        True,
+    ),
+}
+
+
+def _serialiser(objets, serialiser, champs, avec_prix):
+    lignes = [serialiser(objet, champs) for objet in objets]
+    if avec_prix and "prix" in champs:
+        # Un seul accès aux taux de change pour toute la page
+        for ligne, prix in zip(lignes, prix_en_lot(objets)):
+            ligne["prix"] = prix
+    return [{champ: ligne[champ] for champ in champs} for ligne in lignes]
+
+
+def _erreur(message, status=400):
+    return reponse_json({"erreur": message}, status=status)
+
+
+def _champs(request, disponibles):
+    """Champs demandés par ?fields= (dans l'ordre de `disponibles`) ; ValueError si l'un est inconnu."""
+    demandes = [champ.strip() for champ in request.GET.get("fields", "").split(",") if champ.strip()]
+    inconnus = sorted(set(demandes) - set(disponibles))
+    if inconnus:
+        raise ValueError(f"Champs inconnus : {', '.join(inconnus)}.")
+    return [champ for champ in disponibles if champ in demandes] if demandes else list(disponibles)
+
+
+# -----------------------------
+# REQUÊTES CONDITIONNELLES
+# -----------------------------
+
+def _etag(request, *args, **kwargs):
+    # Une représentation par URL complète (champs, page) et par version du catalogue
+    empreinte = hashlib.sha1(request.get_full_path().encode()).hexdigest()[:16]
+    return f"{VERSION_API}-{version_catalogue()}-{empreinte}"
+
+
+def _derniere_modification(request, *args, **kwargs):
+    return datetime.fromtimestamp(date_modification_catalogue(), tz=tz.utc)
+
+
+def api_catalogue(vue):
+    """Lecture seule, conditionnelle (ETag / Last-Modified), compressée en gzip."""
+    vue_conditionnelle = condition(etag_func=_etag, last_modified_func=_derniere_modification)(vue)
+
+    @gzip_page
+    @require_GET
+    @wraps(vue)
+    def enveloppe(request, *args, **kwargs):
+        reponse = vue_conditionnelle(request, *args, **kwargs)
+        if reponse.status_code in (200, 304):
+            # Aussi sur les 304 : le client garde sa copie pour la même durée
+            patch_cache_control(reponse, public=True, max_age=CACHE_API_CATALOGUE)
+        else:
+            # Erreur (400, 404) : ni cache partagé ni validateurs à renvoyer plus tard
+            for entete in ("ETag", "Last-Modified"):
+                if reponse.has_header(entete):
+                    del reponse[entete]
+        return reponse
+    return enveloppe
+
+
+# -----------------------------
+# VUES
+# -----------------------------
+
+@budget_requetes(4)
+@api_catalogue
+def liste(request, ressource):
+    """
+    /api/v1/villes/, /api/v1/packs/jour/, /api/v1/packs/complet/
+
+    {"version": …, "resultats": […], "suivant": <id ou null>}
+    """
+    requete, serialiser, disponibles, avec_prix = RESSOURCES[ressource]
+    try:
+        champs = _champs(request, disponibles)
+    except ValueError as exc:
+        return _erreur(str(exc))
+    try:
+        apres = int(request.GET.get("apres") or 0)
+        taille = max(1, min(int(request.GET.get("taille") or TAILLE_PAGE), TAILLE_PAGE_MAX))
+    except ValueError:
+        return _erreur("`apres` et `taille` doivent être des entiers.")
+
+    objets = list(requete(champs).filter(pk__gt=apres).order_by("pk")[:taille + 1])
+    suivant = None
+    if len(objets) > taille:
+        objets = objets[:taille]
+        suivant = objets[-1].pk
+
+    return reponse_json({
+        "version": version_catalogue(),
+        "resultats": _serialiser(objets, serialiser, champs, avec_prix),
+        "suivant": suivant,
+    })
+
+
+@budget_requetes(4)
+@api_catalogue
+def detail(request, ressource, pk):
+    """/api/v1/villes/<id>/, /api/v1/packs/jour/<id>/, /api/v1/packs/complet/<id>/"""
+    requete, serialiser, disponibles, avec_prix = RESSOURCES[ressource]
+    try:
+        champs = _champs(request, disponibles)
+    except ValueError as exc:
+        return _erreur(str(exc))
+
+    objet = requete(champs).filter(pk=pk).first()
+    if objet is None:
+        return _erreur("Objet introuvable.", status=404)
+    return reponse_json(_serialiser([objet], serialiser, champs, avec_prix)[0])
@@ -4,3 +4,14 @@ from django.apps import AppConfig
 class AppliConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'Appli'
+
+    def ready(self):
+        # Enregistre les signaux du catalogue, des places, des images, des notifications,
+        # des statistiques et de l'index de recherche, ainsi que les checks des ressources statiques
+        from . import catalogue  # noqa: F401
+        from . import checks  # noqa: F401
+        from . import disponibilites  # noqa: F401
+        from . import images  # noqa: F401
+        from . import rapports  # noqa: F401
+        from . import recherche  # noqa: F401
+        from .notification import email  # noqa: F401
@@ -0,0 +1,644 @@
+import platform
+import statistics
+import time
+from datetime import timedelta
+from decimal import Decimal
+from itertools import count
+from urllib.parse import urlencode
+
+import django
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import (
+    Ville,
+    ActiviteJour,
+    ActiviteComplet,
+    PackJour,
+    PackComplet,
+    ReservationPackJour,
+    ReservationPackComplet,
+    OptionReservation,
+    TYPE_PACK_CHOICES,
+    MONNAIE_CHOICES,
+)
+from .percentiles import percentile
+
+# -----------------------------
+# BANC D'ESSAI DU PARCOURS DE RÉSERVATION
+# -----------------------------
+# Catalogue synthétique + client de test Django : latences (p50/p95/p99) et
+# nombre de requêtes SQL par scénario, sérialisables en JSON pour comparer
+# deux exécutions (voir la commande `manage.py bench`).
+
+MOT_DE_PASSE = "bench-estamira"
+
+# Pages rendues par le banc « rendu des gabarits »
+GABARITS_SITE = (
+    "accueil.html",
+    "services.html",
+    "contact.html",
+    "about.html",
+    "mon_activite.html",
+    "reservation/jour.html",
+    "reservation/complet.html",
+    "registration/login.html",
+    "registration/signup.html",
+)
+
+CHANGELISTS_ADMIN = (
+    "reservationpackjour",
+    "reservationpackcomplet",
+    "activitejour",
+    "activitecomplet",
+    "optionreservation",
+    "packjour",
+    "packcomplet",
+)
+
+
+def resumer(durees, requetes):
+    """Statistiques d'un scénario : durées en millisecondes, requêtes par appel."""
+    return {
+        "iterations": len(durees),
+        "p50_ms": round(percentile(durees, 50), 3),
+        "p95_ms": round(percentile(durees, 95), 3),
+        "p99_ms": round(percentile(durees, 99), 3),
+        "moyenne_ms": round(statistics.fmean(durees), 3),
+        "requetes": {
+            "min": min(requetes),
+            "mediane": statistics.median(requetes),
+            "max": max(requetes),
+        },
+    }
+
+
+# -----------------------------
+# JEU DE DONNÉES
+# -----------------------------
+
+def generer_catalogue(villes=10, packs=20, activites=5, utilisateurs=10, reservations=5):
+    """
+    Crée `villes` villes, `packs` packs de chaque type avec `activites`
+    activités chacun, `utilisateurs` clients ayant chacun `reservations`
+    réservations de chaque type, et un compte staff. Retourne
+    (clients, staff, packs_jour, packs_complet).
+    """
+    User = get_user_model()
+    prefixe = timezone.now().strftime("%Y%m%d%H%M%S%f")
+
+    liste_villes = Ville.objects.bulk_create(
+        [Ville(nom=f"Ville {prefixe}-{i}") for i in range(villes)]
+    )
+    activites_jour = ActiviteJour.objects.bulk_create([
+        ActiviteJour(nom=f"Activité {i}", ville=liste_villes[i % villes], duree="2h")
+        for i in range(packs * activites)
+    ])
+
+    packs_jour = PackJour.objects.bulk_create([
+        PackJour(nom=f"Pack jour {i:05d}", prix_mad=300 + i, prix_eur=30, prix_usd=33)
+        for i in range(packs)
+    ])
+    liens = PackJour.activites.through
+    liens.objects.bulk_create([
+        liens(packjour_id=pack.pk, activitejour_id=activites_jour[i * activites + j].pk)
+        for i, pack in enumerate(packs_jour)
+        for j in range(activites)
+    ])
+
+    types = [code for code, _ in TYPE_PACK_CHOICES]
+    packs_complet = PackComplet.objects.bulk_create([
+        PackComplet(
+            nom=f"Pack complet {i:05d}", type_pack=types[i % len(types)],
+            duree_jours=3, duree_nuits=2, prix_mad=2500 + i, prix_eur=250, prix_usd=275,
+        )
+        for i in range(packs)
+    ])
+    activites_complet = ActiviteComplet.objects.bulk_create([
+        ActiviteComplet(nom=f"Étape {j + 1}", jour_numero=j % 3 + 1, pack=pack)
+        for pack in packs_complet
+        for j in range(activites)
+    ])
+    liens = ActiviteComplet.villes.through
+    liens.objects.bulk_create([
+        liens(activitecomplet_id=activite.pk, ville_id=liste_villes[i % villes].pk)
+        for i, activite in enumerate(activites_complet)
+    ])
+
+    clients = [
+        User.objects.create_user(
+            email=f"client{i}-{prefixe}@bench.local", password=MOT_DE_PASSE,
+            prenom="Client", nom=str(i), tel="0600000000",
+        )
+        for i in range(utilisateurs)
+    ]
+    staff = User.objects.create_superuser(
+        email=f"staff-{prefixe}@bench.local", password=MOT_DE_PASSE,
+        prenom="Staff", nom="Bench", tel="0600000000",
+    )
+
+    # Historique des clients : montants renseignés à la main (bulk_create ne passe pas par save)
+    devises = [code for code, _ in MONNAIE_CHOICES]
+    demain = timezone.localdate() + timedelta(days=1)
+    maintenant = timezone.now()
+    historique_jour, historique_complet = [], []
+    for i, client in enumerate(clients):
+        for j in range(reservations):
+            pack_jour = packs_jour[(i + j) % packs]
+            pack_complet = packs_complet[(i + j) % packs]
+            historique_jour.append(ReservationPackJour(
+                user=client, pack=pack_jour, nb_personne=2, devise=devises[j % len(devises)],
+                montant_pack=pack_jour.prix_mad * 2, montant_total=pack_jour.prix_mad * 2, date=demain,
+                date_reservation=maintenant - timedelta(hours=j),
+            ))
+            historique_complet.append(ReservationPackComplet(
+                user=client, pack=pack_complet, nb_personne=2, devise=devises[j % len(devises)],
+                montant_pack=pack_complet.prix_mad * 2, montant_total=pack_complet.prix_mad * 2,
+                date_debut=demain, date_fin=demain + timedelta(days=2),
+                date_reservation=maintenant - timedelta(hours=j, minutes=30),
+            ))
+    ReservationPackJour.objects.bulk_create(historique_jour)
+    historique_complet = ReservationPackComplet.objects.bulk_create(historique_complet)
+    OptionReservation.objects.bulk_create([
+        OptionReservation(
+            reservation_complet=reservation, nom_option="Dîner", type_option="TRADITIONNEL",
+            prix_mad=Decimal(200), prix_eur=Decimal(20), prix_usd=Decimal(22),
+        )
+        for reservation in historique_complet
+    ])
+
+    return clients, staff, packs_jour, packs_complet
+
+
+# -----------------------------
+# MESURE
+# -----------------------------
+
+def mesurer(appel, iterations):
+    """Exécute `appel(i)` `iterations` fois ; retourne le résumé des latences et requêtes."""
+    durees, requetes = [], []
+    for i in range(iterations):
+        with CaptureQueriesContext(connection) as capture:
+            debut = time.perf_counter()
+            reponse = appel(i)
+            durees.append((time.perf_counter() - debut) * 1000)
+        requetes.append(len(capture.captured_queries))
+        if getattr(reponse, "status_code", 200) >= 400:
+            raise RuntimeError(f"Réponse HTTP {reponse.status_code} pendant la mesure.")
+    return resumer(durees, requetes)
+
+
+def executer(iterations=50, echauffement=5, **taille):
+    """
+    Génère le catalogue puis mesure chaque scénario. `taille` est transmis à
+    generer_catalogue. Retourne le dictionnaire de résultats (sérialisable JSON).
+    """
+    clients, staff, packs_jour, packs_complet = generer_catalogue(**taille)
+
+    visiteur = Client()
+    client = Client()
+    client.force_login(clients[0])
+    admin = Client()
+    admin.force_login(staff)
+
+    # Chaque POST réserve une date différente : pas de contention sur les places
+    jours = count(1)
+
+    def date_suivante():
+        return timezone.localdate() + timedelta(days=next(jours))
+
+    def poster_jour(i):
+        return client.post(reverse("reservation_jour_base"), {
+            "pack": packs_jour[i % len(packs_jour)].pk,
+            "nb_personne": 2,
+            "devise": "MAD",
+            "date": date_suivante().isoformat(),
+        })
+
+    def poster_complet(i):
+        debut = date_suivante()
+        return client.post(reverse("reservation_complet_base"), {
+            "pack": packs_complet[i % len(packs_complet)].pk,
+            "nb_personne": 2,
+            "devise": "EUR",
+            "date_debut": debut.isoformat(),
+            "date_fin": (debut + timedelta(days=2)).isoformat(),
+        })
+
+    scenarios = {
+        "home_page": lambda i: visiteur.get(reverse("accueil")),
+        "reservation_pack_jour_post": poster_jour,
+        "reservation_pack_complet_post": poster_complet,
+        "mon_activite": lambda i: client.get(reverse("mon_activite")),
+    }
+    for modele in CHANGELISTS_ADMIN:
+        url = reverse(f"admin:Appli_{modele}_changelist")
+        scenarios[f"admin_{modele}_changelist"] = lambda i, url=url: admin.get(url)
+
+    resultats = {}
+    for nom, appel in scenarios.items():
+        for i in range(echauffement):
+            appel(i)
+        resultats[nom] = mesurer(appel, iterations)
+    resultats.update(mesurer_gabarits(iterations, echauffement))
+
+    return {
+        "environnement": {
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "base": connection.vendor,
+        },
+        "parametres": {"iterations": iterations, "echauffement": echauffement, **taille},
+        "resultats": resultats,
+    }
+
+
+# -----------------------------
+# RECHERCHE
+# -----------------------------
+
+VOCABULAIRE = (
+    "désert dunes bivouac chameau kasbah médina souk hammam riad oasis atlas randonnée "
+    "excursion visite culturelle traditionnelle gastronomie cuisine tajine couscous artisanat "
+    "poterie tapis montagne vallée cascade plage océan surf coucher soleil étoiles nuit "
+    "berbère village jardin palais musée mosquée fontaine terrasse luxe détente spa aventure "
+    "quad dromadaire montgolfière photographie guide privé famille découverte"
+).split()
+
+VILLES_RECHERCHE = (
+    "Marrakech", "Fès", "Essaouira", "Merzouga", "Chefchaouen", "Ouarzazate", "Agadir",
+    "Rabat", "Tanger", "Meknès", "Zagora", "Aït Benhaddou", "Imlil", "Dakhla", "Ifrane",
+)
+
+REQUETES_RECHERCHE = (
+    {"q": "désert"},
+    {"q": "excursions culturelles"},
+    {"q": "kasb"},
+    {"q": "randonnée atlas", "type_pack": "AVENTURE"},
+    {"q": "hammam", "tranche": "1500-5000"},
+    {"q": "riad marrakech", "duree": 4},
+    {"type_pack": "LUXE", "tranche": "5000+"},
+)
+
+
+def generer_catalogue_recherche(documents=50000, graine=1):
+    """
+    Catalogue d'environ `documents` documents de recherche (packs complets de
+    quatre activités, packs jour de quatre activités, villes) aux descriptions
+    tirées de VOCABULAIRE, puis indexation complète.
+    """
+    import random
+    from .recherche import reindexer
+
+    hasard = random.Random(graine)
+
+    def phrase(mots=12):
+        return " ".join(hasard.choice(VOCABULAIRE) for _ in range(mots))
+
+    villes = Ville.objects.bulk_create([Ville(nom=nom, description=phrase()) for nom in VILLES_RECHERCHE])
+    # Chaque pack (avec ses quatre activités) donne cinq documents, moitié jour, moitié complet
+    packs = max(1, (documents - len(villes)) // 10)
+    types = [code for code, _ in TYPE_PACK_CHOICES]
+
+    activites_jour = ActiviteJour.objects.bulk_create([
+        ActiviteJour(nom=phrase(3).capitalize(), description=phrase(), ville=hasard.choice(villes))
+        for _ in range(packs * 4)
+    ])
+    packs_jour = PackJour.objects.bulk_create([
+        PackJour(nom=phrase(4).capitalize(), description=phrase(20), prix_mad=hasard.randrange(200, 3000))
+        for _ in range(packs)
+    ])
+    liens = PackJour.activites.through
+    liens.objects.bulk_create([
+        liens(packjour_id=pack.pk, activitejour_id=activites_jour[i * 4 + j].pk)
+        for i, pack in enumerate(packs_jour)
+        for j in range(4)
+    ])
+
+    packs_complet = PackComplet.objects.bulk_create([
+        PackComplet(
+            nom=phrase(4).capitalize(), description=phrase(30), type_pack=hasard.choice(types),
+            duree_jours=hasard.randrange(2, 9), prix_mad=hasard.randrange(1000, 20000),
+        )
+        for _ in range(packs)
+    ])
+    activites_complet = ActiviteComplet.objects.bulk_create([
+        ActiviteComplet(nom=phrase(3).capitalize(), description=phrase(), jour_numero=j + 1, pack=pack)
+        for pack in packs_complet
+        for j in range(4)
+    ])
+    liens = ActiviteComplet.villes.through
+    liens.objects.bulk_create([
+        liens(activitecomplet_id=activite.pk, ville_id=hasard.choice(villes).pk)
+        for activite in activites_complet
+    ])
+    return reindexer(taille_lot=1000)
+
+
+def executer_recherche(documents=50000, iterations=50, echauffement=5):
+    """
+    Latences pour REQUETES_RECHERCHE sur un catalogue généré :
+    « recherche_* » mesure rechercher() sans le cache des résultats (index et facettes),
+    « api_recherche_* » l'endpoint /recherche/, dont les résultats sont en cache.
+    """
+    from .recherche import rechercher
+
+    indexes = generer_catalogue_recherche(documents)
+    visiteur = Client()
+    # Noms des paramètres de rechercher() -> paramètres GET de /recherche/
+    parametres_get = {"type_objet": "type", "tranche": "prix"}
+
+    resultats = {}
+    for parametres in REQUETES_RECHERCHE:
+        suffixe = "_".join(f"{cle}={valeur}" for cle, valeur in parametres.items())
+        url = reverse("recherche") + "?" + urlencode(
+            {parametres_get.get(cle, cle): valeur for cle, valeur in parametres.items()}
+        )
+
+        def appel(i, parametres=parametres):
+            return rechercher(**parametres)
+
+        def appel_api(i, url=url):
+            return visiteur.get(url)
+
+        for mesure, fonction in (("recherche_", appel), ("api_recherche_", appel_api)):
+            for i in range(echauffement):
+                fonction(i)
+            resultats[mesure + suffixe] = mesurer(fonction, iterations)
+
+    return {
+        "environnement": {
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "base": connection.vendor,
+        },
+        "parametres": {"iterations": iterations, "echauffement": echauffement, "documents": sum(indexes.values())},
+        "resultats": resultats,
+    }
+
+
+# -----------------------------
+# IMPORT DE RÉSERVATIONS EN LOT
+# -----------------------------
+
+def generer_lot_reservations(reservations, graine=0):
+    """Enregistrements d'import (moitié packs jour avec une option, moitié packs complets de 3 nuits)."""
+    pack_jour = PackJour.objects.create(nom=f"Import jour {graine}", prix_mad=Decimal(500))
+    pack_complet = PackComplet.objects.create(
+        nom=f"Import complet {graine}", prix_mad=Decimal(3000), capacite_journaliere=reservations
+    )
+    debut = timezone.now().date() + timedelta(days=30)
+    for i in range(reservations):
+        jour = debut + timedelta(days=i % 60)
+        if i % 2:
+            yield i + 1, {
+                "type": "jour", "reference": f"B{graine}-{i}", "pack": pack_jour.pk, "nb_personne": 2,
+                "devise": "EUR", "date": jour.isoformat(),
+                "options": [{"nom_option": "Dîner", "prix_mad": "200", "quantite": 2}],
+            }
+        else:
+            yield i + 1, {
+                "type": "complet", "reference": f"B{graine}-{i}", "pack": pack_complet.pk, "nb_personne": 1,
+                "devise": "MAD", "date_debut": jour.isoformat(), "date_fin": (jour + timedelta(days=3)).isoformat(),
+            }
+
+
+def executer_import(paquets=20, taille_lot=1000, echauffement=2):
+    """
+    « import_reservations » : latence d'un paquet de `taille_lot` réservations
+    (validation, places, bulk_create, statistiques) ; le débit en réservations
+    par seconde en découle.
+    """
+    from .import_reservations import ImportReservations
+
+    for graine in range(echauffement):
+        ImportReservations(taille_lot).importer(generer_lot_reservations(taille_lot, graine=-1 - graine))
+    lots = [list(generer_lot_reservations(taille_lot, graine=graine)) for graine in range(paquets)]
+    importeur = ImportReservations(taille_lot)
+    resultat = mesurer(lambda i: importeur.importer(lots[i]), paquets)
+    if importeur.erreurs:
+        raise RuntimeError(f"{len(importeur.erreurs)} réservation(s) rejetée(s) pendant la mesure.")
+
+    return {
+        "environnement": {
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "base": connection.vendor,
+        },
+        "parametres": {"paquets": paquets, "taille_lot": taille_lot, "echauffement": echauffement},
+        "resultats": {"import_reservations": resultat},
+        "reservations_par_seconde": round(taille_lot * 1000 / resultat["moyenne_ms"]),
+    }
+
+
+# -----------------------------
+# EXPORT DES RÉSERVATIONS
+# -----------------------------
+
+def generer_reservations_export(reservations, graine=0, taille_lot=5000):
+    """Réservations de packs complets insérées en bulk_create, une option pour dix réservations."""
+    user = get_user_model().objects.create_user(
+        email=f"export{graine}@bench.test", password=MOT_DE_PASSE, prenom="E", nom="X", tel="0600000000"
+    )
+    pack = PackComplet.objects.create(nom=f"Export {graine}", prix_mad=Decimal(3000), prix_eur=Decimal(300))
+    debut = timezone.now().date()
+    for depart in range(0, reservations, taille_lot):
+        lot = ReservationPackComplet.objects.bulk_create([
+            ReservationPackComplet(
+                user=user, pack=pack, nb_personne=1 + i % 4, devise=MONNAIE_CHOICES[i % len(MONNAIE_CHOICES)][0],
+                montant_pack=Decimal(3000), montant_total=Decimal(3000), date_debut=debut + timedelta(days=i % 90),
+                date_fin=debut + timedelta(days=i % 90 + 3),
+            )
+            for i in range(depart, min(depart + taille_lot, reservations))
+        ])
+        OptionReservation.objects.bulk_create([
+            OptionReservation(reservation_complet=reservation, nom_option="Dîner", prix_mad=Decimal(200), quantite=2)
+            for reservation in lot[::10]
+        ])
+
+
+def _export_tablib(queryset):
+    from import_export import resources
+
+    class ReservationResource(resources.ModelResource):
+        class Meta:
+            model = ReservationPackComplet
+            fields = (
+                "id", "pack__nom", "user__email", "date_debut", "date_fin", "nb_personne",
+                "devise", "statut", "montant_total", "date_reservation",
+            )
+
+    return ReservationResource().export(queryset.select_related("pack", "user")).csv
+
+
+def executer_export(reservations=100000, iterations=3, echauffement=1):
+    """
+    « export_csv_flux » (export.py, StreamingHttpResponse) contre
+    « export_csv_tablib » (ModelResource de django-import-export, fichier
+    construit en mémoire) sur la même table ; pic mémoire Python mesuré à part
+    par tracemalloc, en Mo.
+    """
+    import tracemalloc
+
+    from .export import flux_csv
+
+    generer_reservations_export(reservations)
+    queryset = ReservationPackComplet.objects.order_by("pk")
+    variantes = {
+        "export_csv_flux": lambda i: sum(len(morceau) for morceau in flux_csv(queryset)),
+        "export_csv_tablib": lambda i: len(_export_tablib(queryset)),
+    }
+
+    resultats, memoire = {}, {}
+    for nom, appel in variantes.items():
+        for i in range(echauffement):
+            appel(i)
+        resultats[nom] = mesurer(appel, iterations)
+        tracemalloc.start()
+        appel(0)
+        memoire[nom] = round(tracemalloc.get_traced_memory()[1] / 2**20, 1)
+        tracemalloc.stop()
+
+    return {
+        "environnement": {
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "base": connection.vendor,
+        },
+        "parametres": {"iterations": iterations, "echauffement": echauffement, "reservations": reservations},
+        "resultats": resultats,
+        "pic_memoire_mo": memoire,
+    }
+
+
+# -----------------------------
+# RENDU DES GABARITS
+# -----------------------------
+
+def mesurer_gabarits(iterations=50, echauffement=5, gabarits=GABARITS_SITE):
+    """
+    Temps de rendu de chaque page pour un visiteur anonyme, hors vue et
+    middlewares. « gabarit_<page> » : gabarits déjà compilés (chargeur en
+    cache) ; « gabarit_<page>_compilation » : cache du chargeur vidé avant
+    chaque rendu, soit le coût d'un chargeur sans cache. Les fragments
+    {% cache %} restent chauds dans les deux cas.
+    """
+    from django.contrib.auth.models import AnonymousUser
+    from django.template import engines
+    from django.template.loader import render_to_string
+    from django.template.loaders.cached import Loader as ChargeurEnCache
+    from django.test import RequestFactory
+
+    from .catalogue import obtenir_catalogue
+    from .views import PACKS_ACCUEIL
+
+    chargeurs = [c for c in engines["django"].engine.template_loaders if isinstance(c, ChargeurEnCache)]
+    requete = RequestFactory().get("/")
+    requete.user = AnonymousUser()
+    catalogue = obtenir_catalogue()
+    contextes = {
+        "accueil.html": {
+            "packs": catalogue["packs"][:PACKS_ACCUEIL],
+            "packs_suivants": len(catalogue["packs"]) > PACKS_ACCUEIL,
+            "villes": catalogue["villes"],
+            "version_catalogue": catalogue["version"],
+        },
+    }
+
+    resultats = {}
+    for gabarit in gabarits:
+        def rendre(i, gabarit=gabarit):
+            return render_to_string(gabarit, contextes.get(gabarit, {}), request=requete)
+
+        def compiler_et_rendre(i, rendre=rendre):
+            for chargeur in chargeurs:
+                chargeur.reset()
+            return rendre(i)
+
+        cle = gabarit.removesuffix(".html").replace("/", "_")
+        variantes = {f"gabarit_{cle}": rendre}
+        if chargeurs:
+            variantes[f"gabarit_{cle}_compilation"] = compiler_et_rendre
+        for nom, appel in variantes.items():
+            for i in range(echauffement):
+                appel(i)
+            resultats[nom] = mesurer(appel, iterations)
+    return resultats
+
+
+def comparer(reference, resultats, seuil=0.10):
+    """
+    Lignes de comparaison scénario par scénario avec une exécution de
+    référence : variation du p95 et du nombre médian de requêtes.
+    Une ligne est marquée en régression au-delà de `seuil` (10 %) ou si le
+    nombre de requêtes augmente.
+    """
+    lignes = []
+    for nom, actuel in resultats["resultats"].items():
+        avant = reference.get("resultats", {}).get(nom)
+        if avant is None:
+            continue
+        variation = (actuel["p95_ms"] - avant["p95_ms"]) / avant["p95_ms"] if avant["p95_ms"] else 0
+        requetes = actuel["requetes"]["mediane"] - avant["requetes"]["mediane"]
+        lignes.append({
+            "scenario": nom,
+            "variation_p95": round(variation, 4),
+            "variation_requetes": requetes,
+            "regression": variation > seuil or requetes > 0,
+        })
+    return lignes
+
+
+# -----------------------------
+# CONCURRENCE
+# -----------------------------
+
+def reserver_en_parallele(pack, user, jour, threads=8, par_thread=25):
+    """
+    Enregistre threads × par_thread réservations du même pack à la même date
+    depuis `threads` threads (une connexion chacun) : toutes les écritures se
+    disputent la même ligne de Disponibilite. Retourne durée, débit et
+    nombre d'erreurs de verrouillage.
+    """
+    import threading
+    from django.db import OperationalError, connections
+
+    resultats = {"reservations": 0, "erreurs_verrou": 0, "autres_erreurs": 0}
+    verrou = threading.Lock()
+    depart = threading.Barrier(threads)
+
+    def travailleur():
+        reussies = verrouillees = autres = 0
+        try:
+            depart.wait()
+            for _ in range(par_thread):
+                try:
+                    ReservationPackJour(user=user, pack=pack, nb_personne=1, date=jour).save()
+                    reussies += 1
+                except OperationalError as exc:
+                    if "locked" in str(exc) or "busy" in str(exc):
+                        verrouillees += 1
+                    else:
+                        autres += 1
+        finally:
+            connections.close_all()
+            with verrou:
+                resultats["reservations"] += reussies
+                resultats["erreurs_verrou"] += verrouillees
+                resultats["autres_erreurs"] += autres
+
+    liste = [threading.Thread(target=travailleur) for _ in range(threads)]
+    debut = time.perf_counter()
+    for thread in liste:
+        thread.start()
+    for thread in liste:
+        thread.join()
+    duree = time.perf_counter() - debut
+
+    resultats["duree_s"] = round(duree, 3)
+    resultats["reservations_par_s"] = round(resultats["reservations"] / duree, 1)
+    return resultats
@@ -0,0 +1,63 @@
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.utils.cache import patch_vary_headers
+
+from .catalogue import cache_catalogue, version_catalogue
+
+# -----------------------------
+# CACHE DES PAGES POUR LES VISITEURS ANONYMES
+# -----------------------------
+# La réponse complète n'est mise en cache que pour un visiteur anonyme sans
+# message en attente : un utilisateur connecté (barre de navigation, jeton
+# CSRF du formulaire de déconnexion) reçoit toujours une page rendue pour lui.
+# La clé contient la version du catalogue ; les réponses portent
+# « Vary: Cookie » pour que les caches intermédiaires distinguent les deux cas.
+
+CLE_PAGE = "pages:v{version}:{empreinte}"
+
+
+def _cachable(request):
+    return (
+        request.method in ("GET", "HEAD")
+        and not request.user.is_authenticated
+        # len() ne marque pas les messages comme lus
+        and not len(get_messages(request))
+    )
+
+
+def cle_page(request):
+    empreinte = hashlib.sha1(request.build_absolute_uri().encode()).hexdigest()
+    return CLE_PAGE.format(version=version_catalogue(), empreinte=empreinte)
+
+
+def cache_anonyme(duree=None):
+    """
+    Sert la vue depuis le cache aux visiteurs anonymes pendant `duree`
+    secondes (CACHE_PAGES_DUREE par défaut).
+
+        @cache_anonyme()
+        def services(request): ...
+    """
+    def decorateur(vue):
+        @wraps(vue)
+        def enveloppe(request, *args, **kwargs):
+            if not _cachable(request):
+                reponse = vue(request, *args, **kwargs)
+                patch_vary_headers(reponse, ("Cookie",))
+                return reponse
+
+            cache = cache_catalogue()
+            cle = cle_page(request)
+            reponse = cache.get(cle)
+            if reponse is None:
+                reponse = vue(request, *args, **kwargs)
+                patch_vary_headers(reponse, ("Cookie",))
+                # Une réponse qui pose un cookie (CSRF, session) est propre au visiteur
+                if reponse.status_code == 200 and not reponse.cookies and not reponse.streaming:
+                    cache.set(cle, reponse, getattr(settings, "CACHE_PAGES_DUREE", 600) if duree is None else duree)
+            return reponse
+        return enveloppe
+    return decorateur
@@ -0,0 +1,229 @@
+from time import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.urls import reverse
+
+from .models import (
+    Ville,
+    ActiviteJour,
+    PackJour,
+    ActiviteComplet,
+    PackComplet,
+)
+from .prix import prix_en_lot
+from .routeurs import lecture_primaire
+
+# -----------------------------
+# CLÉS DE CACHE
+# -----------------------------
+
+CLE_VERSION = "catalogue:version"
+CLE_MODIFICATION = "catalogue:modification"
+CLE_INSTANTANE = "catalogue:instantane:v{version}"
+CLE_PACK_PAR_DEFAUT = "catalogue:pack_par_defaut:{modele}"
+
+_ABSENT = object()
+
+MODELES_CATALOGUE = (Ville, ActiviteJour, PackJour, ActiviteComplet, PackComplet)
+
+
+def cache_catalogue():
+    """Retourne le backend de cache configuré pour le catalogue (CATALOGUE_CACHE_ALIAS)."""
+    return caches[getattr(settings, "CATALOGUE_CACHE_ALIAS", "default")]
+
+
+# -----------------------------
+# VERSION
+# -----------------------------
+
+def version_catalogue():
+    """
+    Version courante du catalogue.
+    Initialisée à partir de l'horloge pour ne jamais retomber sur un ancien
+    instantané si la clé de version est évincée du cache.
+    """
+    cache = cache_catalogue()
+    version = cache.get(CLE_VERSION)
+    if version is None:
+        cache.add(CLE_VERSION, int(time() * 1000), timeout=None)
+        version = cache.get(CLE_VERSION)
+    return version
+
+
+def invalider_catalogue():
+    """
+    Passe à une nouvelle version : les instantanés précédents ne sont plus lus.
+    La version n'avance que par incr(), atomique : deux invalidations
+    simultanées donnent deux versions distinctes. La date de modification est
+    tenue dans sa propre clé.
+    """
+    cache = cache_catalogue()
+    try:
+        cache.incr(CLE_VERSION)
+    except ValueError:
+        # Clé absente ou évincée : l'horloge dépasse toute version déjà servie
+        cache.add(CLE_VERSION, int(time() * 1000), timeout=None)
+    cache.set(CLE_MODIFICATION, time(), timeout=None)
+
+
+def date_modification_catalogue():
+    """
+    Date de la dernière modification du catalogue (horodatage Unix). Inconnue
+    (clé évincée), elle est fixée à maintenant : jamais antérieure à la vraie.
+    """
+    cache = cache_catalogue()
+    date = cache.get(CLE_MODIFICATION)
+    if date is None:
+        cache.add(CLE_MODIFICATION, time(), timeout=None)
+        date = cache.get(CLE_MODIFICATION)
+    return date
+
+
+# -----------------------------
+# CONSTRUCTION DE L'INSTANTANÉ
+# -----------------------------
+
+def _url_image(image):
+    return image.url if image else ""
+
+
+def _serialiser_pack_jour(pack):
+    return {
+        "id": pack.id,
+        "type": "jour",
+        "nom": pack.nom,
+        "description": pack.description or "",
+        "image": _url_image(pack.image),
+        "image_nom": pack.image.name or "",
+        "prix_mad": pack.prix_mad,
+        "prix_eur": pack.prix_eur,
+        "prix_usd": pack.prix_usd,
+        "url": reverse("reservation_jour_detail", args=[pack.id]),
+        "activites": [{"id": a.id, "nom": a.nom} for a in pack.activites.all()],
+    }
+
+
+def _serialiser_pack_complet(pack):
+    return {
+        "id": pack.id,
+        "type": "complet",
+        "nom": pack.nom,
+        "description": pack.description or "",
+        "image": _url_image(pack.image),
+        "image_nom": pack.image.name or "",
+        "prix_mad": pack.prix_mad,
+        "prix_eur": pack.prix_eur,
+        "prix_usd": pack.prix_usd,
+        "type_pack": pack.type_pack,
+        "type_pack_libelle": pack.get_type_pack_display(),
+        "duree_jours": pack.duree_jours,
+        "duree_nuits": pack.duree_nuits,
+        "url": reverse("reservation_complet_detail", args=[pack.id]),
+        "activites": [
+            {"id": a.id, "nom": a.nom, "jour_numero": a.jour_numero}
+            for a in pack.activites.all()
+        ],
+    }
+
+
+def construire_instantane():
+    """
+    Construit le catalogue complet sous forme de structures simples
+    (dict, list, Decimal), triées et prêtes à être mises en cache.
+    """
+    packs_jour = list(PackJour.objects.prefetch_related("activites"))
+    packs_complet = list(PackComplet.objects.prefetch_related("activites"))
+    packs = [_serialiser_pack_jour(p) for p in packs_jour]
+    packs += [_serialiser_pack_complet(p) for p in packs_complet]
+    # Prix dans toutes les devises proposées, convertis en un seul passage
+    for pack, prix in zip(packs, prix_en_lot(packs_jour + packs_complet)):
+        pack["prix"] = prix
+    packs.sort(key=lambda p: p["nom"])
+
+    villes = [
+        {
+            "id": v.id,
+            "nom": v.nom,
+            "description": v.description or "",
+            "image": _url_image(v.image),
+            "image_nom": v.image.name or "",
+        }
+        for v in Ville.objects.all()
+    ]
+
+    return {"packs": packs, "villes": villes}
+
+
+def obtenir_catalogue():
+    """
+    Retourne l'instantané du catalogue pour la version courante.
+    Cache chaud : aucune requête SQL. Cache froid : reconstruction puis stockage.
+    """
+    cache = cache_catalogue()
+    version = version_catalogue()
+    cle = CLE_INSTANTANE.format(version=version)
+
+    instantane = cache.get(cle)
+    if instantane is None:
+        instantane = construire_instantane()
+        instantane["version"] = version
+        cache.set(cle, instantane, timeout=None)
+    return instantane
+
+
+# -----------------------------
+# PACK PAR DÉFAUT DES RÉSERVATIONS
+# -----------------------------
+
+def pack_par_defaut(modele):
+    """
+    Identifiant du premier pack de `modele`, utilisé comme valeur par défaut
+    des réservations. Mis en cache (y compris « aucun pack ») et invalidé avec
+    le catalogue : instancier une réservation ou un formulaire ne coûte
+    aucune requête. RESERVATION_PACK_PAR_DEFAUT = False désactive la valeur
+    par défaut.
+    """
+    if not getattr(settings, "RESERVATION_PACK_PAR_DEFAUT", True):
+        return None
+
+    cache = cache_catalogue()
+    cle = CLE_PACK_PAR_DEFAUT.format(modele=modele._meta.label_lower)
+    pack_id = cache.get(cle, _ABSENT)
+    if pack_id is _ABSENT:
+        pack_id = modele.objects.order_by("pk").values_list("pk", flat=True).first()
+        cache.set(cle, pack_id, timeout=None)
+    return pack_id
+
+
+# -----------------------------
+# SIGNAUX : INVALIDATION ET RECONSTRUCTION
+# -----------------------------
+
+def _reconstruire():
+    # La réplique peut accuser un retard : l'instantané de la nouvelle version est lu sur la primaire
+    with lecture_primaire():
+        obtenir_catalogue()
+
+
+def _catalogue_modifie(sender, **kwargs):
+    action = kwargs.get("action")
+    if action is not None and not action.startswith("post_"):
+        return  # m2m_changed : on ne réagit qu'une fois l'opération effectuée
+
+    invalider_catalogue()
+    if sender in (PackJour, PackComplet):
+        cache_catalogue().delete(CLE_PACK_PAR_DEFAUT.format(modele=sender._meta.label_lower))
+    # Reconstruit après validation de la transaction ; plusieurs signaux
+    # pour une même sauvegarde admin ne reconstruisent qu'une seule fois.
+    transaction.on_commit(_reconstruire)
+
+
+for _modele in MODELES_CATALOGUE:
+    post_save.connect(_catalogue_modifie, sender=_modele, dispatch_uid=f"catalogue_save_{_modele.__name__}")
+    post_delete.connect(_catalogue_modifie, sender=_modele, dispatch_uid=f"catalogue_delete_{_modele.__name__}")
+
+m2m_changed.connect(_catalogue_modifie, sender=PackJour.activites.through, dispatch_uid="catalogue_m2m_pack_jour")
+m2m_changed.connect(_catalogue_modifie, sender=ActiviteComplet.villes.through, dispatch_uid="catalogue_m2m_activite_complet")
@@ -0,0 +1,67 @@
+import re
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.checks import Error, Tags, Warning, register
+
+# -----------------------------
+# RESSOURCES STATIQUES DES GABARITS
+# -----------------------------
+# En production, seuls les fichiers passés par {% static %} reçoivent le nom
+# avec empreinte du manifeste (et donc le Cache-Control immuable) : un chemin
+# /static/... écrit en dur est servi sans empreinte, et un fichier absent des
+# dossiers statiques n'entre pas dans le manifeste.
+
+APPS_GABARITS = ("Appli", "authUser")
+
+RE_BALISE_STATIC = re.compile(r"""{%\s*static\s+(['"])(?P<chemin>[^'"]+)\1""")
+
+
+def _re_chemin_en_dur():
+    prefixe = re.escape(settings.STATIC_URL)
+    return re.compile(rf"""(?:(?:src|href|srcset|poster)\s*=\s*["']?|url\(\s*["']?){prefixe}(?P<chemin>[^"')\s]+)""")
+
+
+def references_statiques(dossier):
+    """(fichier, ligne, chemin, en_dur) pour chaque ressource statique des gabarits de `dossier`."""
+    en_dur = _re_chemin_en_dur()
+    for fichier in sorted(Path(dossier).rglob("*.html")):
+        for numero, ligne in enumerate(fichier.read_text(encoding="utf-8").splitlines(), start=1):
+            for correspondance in RE_BALISE_STATIC.finditer(ligne):
+                yield fichier, numero, correspondance["chemin"], False
+            for correspondance in en_dur.finditer(ligne):
+                yield fichier, numero, correspondance["chemin"], True
+
+
+def _dossiers_gabarits(app_configs):
+    configs = app_configs or [apps.get_app_config(label) for label in APPS_GABARITS if apps.is_installed(label)]
+    for config in configs:
+        if config.label in APPS_GABARITS:
+            dossier = Path(config.path) / "templates"
+            if dossier.is_dir():
+                yield dossier
+
+
+@register(Tags.staticfiles)
+def verifier_ressources_statiques(app_configs=None, **kwargs):
+    erreurs = []
+    for dossier in _dossiers_gabarits(app_configs):
+        for fichier, numero, chemin, en_dur in references_statiques(dossier):
+            emplacement = f"{fichier.relative_to(dossier.parent.parent).as_posix()}:{numero}"
+            if en_dur:
+                erreurs.append(Error(
+                    f"{emplacement} : « {settings.STATIC_URL}{chemin} » est écrit en dur, "
+                    "il ne passera pas par le manifeste (pas d'empreinte ni de cache immuable).",
+                    hint=f"Utiliser {{% static '{chemin}' %}}.",
+                    id="Appli.E001",
+                ))
+            elif finders.find(chemin) is None:
+                erreurs.append(Warning(
+                    f"{emplacement} : « {chemin} » est introuvable dans les dossiers statiques.",
+                    hint="Ajouter le fichier sous static/ ou retirer la référence ; "
+                         "il serait servi sans empreinte en production.",
+                    id="Appli.W001",
+                ))
+    return erreurs
@@ -0,0 +1,122 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import CharField, DateField, F, Q, Value
+
+from .models import (
+    ReservationPackJour,
+    ReservationPackComplet,
+    STATUT,
+)
+
+# -----------------------------
+# CHRONOLOGIE DES RÉSERVATIONS
+# -----------------------------
+# Les deux tables de réservation sont réunies par un UNION SQL, triées et
+# paginées par la base (pagination par curseur sur date_reservation).
+# Le total est le montant_total stocké sur chaque réservation.
+
+TYPES_RESERVATION = {
+    "jour": "Pack 1 Jour",
+    "complet": "Pack Complet",
+}
+
+LIBELLES_STATUT = dict(STATUT)
+
+TAILLE_PAGE = 20
+
+COLONNES = (
+    "id", "date_reservation", "nb_personne", "devise",
+    "type_code", "pack_id_ref", "pack_nom", "debut", "fin", "etat", "total",
+)
+
+
+# Le curseur porte la date en microsecondes depuis l'epoch : pas de « + »
+# de fuseau (isoformat) qui deviendrait une espace dans une URL non encodée.
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+MICROSECONDE = timedelta(microseconds=1)
+
+
+def _epoch():
+    # Dates naïves quand USE_TZ est désactivé
+    return EPOCH if settings.USE_TZ else EPOCH.replace(tzinfo=None)
+
+
+def encoder_curseur(ligne):
+    microsecondes = (ligne["date_reservation"] - _epoch()) // MICROSECONDE
+    return f"{microsecondes}~{ligne['type_code']}~{ligne['id']}"
+
+
+def decoder_curseur(curseur):
+    """Retourne (date_reservation, type_code, id) ou None si le curseur est invalide."""
+    try:
+        microsecondes, type_code, pk = curseur.split("~")
+        return _epoch() + int(microsecondes) * MICROSECONDE, type_code, int(pk)
+    except (AttributeError, ValueError, OverflowError):
+        return None
+
+
+def _apres(queryset, type_code, curseur):
+    """Restreint une branche de l'UNION aux lignes situées après le curseur."""
+    if curseur is None:
+        return queryset
+    date_reservation, type_curseur, pk = curseur
+    condition = Q(date_reservation__lt=date_reservation)
+    if type_code < type_curseur:
+        condition |= Q(date_reservation=date_reservation)
+    elif type_code == type_curseur:
+        condition |= Q(date_reservation=date_reservation, id__lt=pk)
+    return queryset.filter(condition)
+
+
+def _branche(modele, type_code, user, curseur, debut, fin, etat):
+    queryset = _apres(modele.objects.filter(user=user), type_code, curseur)
+    return queryset.annotate(
+        type_code=Value(type_code, output_field=CharField()),
+        pack_id_ref=F("pack_id"),
+        pack_nom=F("pack__nom"),
+        debut=debut,
+        fin=fin,
+        etat=etat,
+        total=F("montant_total"),
+    ).values(*COLONNES)
+
+
+def requete_chronologie(user, curseur=None):
+    """UNION triée des deux tables pour `user`, à partir de `curseur` décodé."""
+    jour = _branche(
+        ReservationPackJour, "jour", user, curseur,
+        debut=F("date"),
+        fin=Value(None, output_field=DateField()),
+        etat=Value(None, output_field=CharField()),
+    )
+    complet = _branche(
+        ReservationPackComplet, "complet", user, curseur,
+        debut=F("date_debut"),
+        fin=F("date_fin"),
+        etat=F("statut"),
+    )
+
+    return jour.union(complet, all=True).order_by("-date_reservation", "-type_code", "-id")
+
+
+def chronologie_reservations(user, apres=None, taille=TAILLE_PAGE):
+    """
+    Page de la chronologie des réservations d'un utilisateur, de la plus récente
+    à la plus ancienne, en une seule requête (nom du pack et total inclus).
+    `apres` : curseur renvoyé par la page précédente.
+    Retourne (lignes, curseur_suivant) ; curseur_suivant vaut None en fin de liste.
+    """
+    curseur = decoder_curseur(apres) if apres else None
+    lignes = list(requete_chronologie(user, curseur)[:taille + 1])
+
+    curseur_suivant = None
+    if len(lignes) > taille:
+        lignes = lignes[:taille]
+        curseur_suivant = encoder_curseur(lignes[-1])
+
+    for ligne in lignes:
+        ligne["type_reservation"] = TYPES_RESERVATION[ligne["type_code"]]
+        ligne["statut"] = LIBELLES_STATUT.get(ligne["etat"])
+
+    return lignes, curseur_suivant
@@ -0,0 +1,6 @@
+from django.conf import settings
+
+
+def cache_fragments(request):
+    """Durée de vie des fragments mis en cache par les gabarits ({% cache DUREE_CACHE_FRAGMENTS ... %})."""
+    return {"DUREE_CACHE_FRAGMENTS": getattr(settings, "CACHE_FRAGMENTS_DUREE", 600)}
@@ -0,0 +1,303 @@
+from datetime import datetime, timedelta
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import (
+    INCONNU,
+    PackJour,
+    PackComplet,
+    ReservationPackJour,
+    ReservationPackComplet,
+    Disponibilite,
+)
+from .signals import statuts_modifies
+
+
+class PlacesInsuffisantes(ValidationError):
+    """Levée quand un pack n'a plus assez de places sur au moins une des dates demandées."""
+
+
+# -----------------------------
+# OUTILS
+# -----------------------------
+
+def champ_pack(modele_pack):
+    return "pack_jour" if modele_pack is PackJour else "pack_complet"
+
+
+def incrementer_version(modele_pack, pack_id):
+    """Invalide les ETags du calendrier du pack (UPDATE sans signal post_save)."""
+    modele_pack.objects.filter(pk=pack_id).update(version_disponibilite=F("version_disponibilite") + 1)
+
+
+def plage(debut, fin):
+    """Dates de `debut` à `fin` incluses."""
+    return [debut + timedelta(days=i) for i in range((fin - debut).days + 1)]
+
+
+def _en_date(valeur):
+    # Les valeurs par défaut (datetime.now) restent des datetime tant que l'instance n'est pas rechargée
+    return valeur.date() if isinstance(valeur, datetime) else valeur
+
+
+def occupation(reservation, initiale=False):
+    """
+    (pack_id, dates, nb_personne) occupés par une réservation, None si elle est
+    annulée, INCONNU si les valeurs chargées ne sont pas mémorisées.
+    `initiale=True` : valeurs telles que chargées depuis la base.
+    """
+    def valeur(champ):
+        if initiale:
+            return reservation.valeur_initiale(champ)
+        return getattr(reservation, reservation._meta.get_field(champ).attname)
+
+    if isinstance(reservation, ReservationPackJour):
+        champs = ("pack", "nb_personne", "date")
+    else:
+        champs = ("pack", "nb_personne", "date_debut", "date_fin", "statut")
+    valeurs = {champ: valeur(champ) for champ in champs}
+    if INCONNU in valeurs.values():
+        return INCONNU
+    if valeurs.get("statut") == "annulé":
+        return None
+
+    if "date" in valeurs:
+        dates = (_en_date(valeurs["date"]),)
+    else:
+        dates = tuple(plage(_en_date(valeurs["date_debut"]), _en_date(valeurs["date_fin"])))
+    return valeurs["pack"], dates, valeurs["nb_personne"]
+
+
+def places_occupees(pack, dates, exclure=None):
+    """{date: personnes déjà réservées} calculé depuis les réservations (hors annulées)."""
+    occupees = dict.fromkeys(dates, 0)
+    if isinstance(pack, PackJour):
+        lignes = (
+            ReservationPackJour.objects.filter(pack=pack, date__in=dates)
+            .exclude(pk=exclure)
+            .values("date")
+            .annotate(personnes=Sum("nb_personne"))
+        )
+        for ligne in lignes:
+            occupees[ligne["date"]] += ligne["personnes"]
+    else:
+        lignes = (
+            ReservationPackComplet.objects.filter(pack=pack, date_debut__lte=max(dates), date_fin__gte=min(dates))
+            .exclude(statut="annulé")
+            .exclude(pk=exclure)
+            .values_list("date_debut", "date_fin", "nb_personne")
+        )
+        for debut, fin, personnes in lignes:
+            for jour in plage(debut, fin):
+                if jour in occupees:
+                    occupees[jour] += personnes
+    return occupees
+
+
+def _creer_lignes(pack, dates, exclure=None):
+    """Crée les lignes manquantes de l'index à partir des réservations existantes."""
+    occupees = places_occupees(pack, dates, exclure)
+    champ = champ_pack(type(pack))
+    Disponibilite.objects.bulk_create(
+        [
+            Disponibilite(**{champ: pack}, date=jour, places_restantes=max(pack.capacite_journaliere - occupees[jour], 0))
+            for jour in dates
+        ],
+        ignore_conflicts=True,  # une requête concurrente a pu créer la même ligne
+    )
+
+
+# -----------------------------
+# LECTURE
+# -----------------------------
+
+def disponibilites(pack, debut, fin):
+    """
+    {date: places restantes} de `debut` à `fin` inclus, en une requête sur
+    l'index quand il couvre la période. None pour un pack sans capacité.
+    Lecture seule : les jours absents de l'index sont calculés depuis les
+    réservations sans créer de lignes (seules les réservations en créent).
+    """
+    if pack.capacite_journaliere is None:
+        return None
+
+    champ = champ_pack(type(pack))
+    dates = plage(debut, fin)
+    lignes = dict(
+        Disponibilite.objects.filter(**{champ: pack}, date__gte=debut, date__lte=fin)
+        .values_list("date", "places_restantes")
+    )
+    manquantes = [jour for jour in dates if jour not in lignes]
+    if manquantes:
+        occupees = places_occupees(pack, manquantes)
+        for jour in manquantes:
+            lignes[jour] = max(pack.capacite_journaliere - occupees[jour], 0)
+    return {jour: lignes[jour] for jour in dates}
+
+
+def _erreur_dates(completes):
+    return PlacesInsuffisantes(
+        "Plus assez de places pour le %(dates)s.",
+        code="places_insuffisantes",
+        params={"dates": ", ".join(jour.strftime("%d/%m/%Y") for jour in sorted(completes))},
+    )
+
+
+def verifier_places(pack, dates, nb_personne):
+    """Contrôle (sans réserver) qu'il reste `nb_personne` places à chaque date."""
+    if pack.capacite_journaliere is None or not dates:
+        return
+    restantes = disponibilites(pack, min(dates), max(dates))
+    completes = [jour for jour in dates if restantes[jour] < nb_personne]
+    if completes:
+        raise _erreur_dates(completes)
+
+
+# -----------------------------
+# ÉCRITURE
+# -----------------------------
+
+def reserver_places(pack, dates, nb_personne, exclure=None):
+    """
+    Décrémente les places restantes par UPDATE conditionnel
+    (places_restantes >= nb_personne) : deux réservations concurrentes ne
+    peuvent pas dépasser la capacité. Lève PlacesInsuffisantes sinon.
+    """
+    if pack.capacite_journaliere is None or not dates:
+        return
+
+    champ = champ_pack(type(pack))
+    with transaction.atomic():
+        existantes = set(
+            Disponibilite.objects.filter(**{champ: pack}, date__in=dates).values_list("date", flat=True)
+        )
+        manquantes = [jour for jour in dates if jour not in existantes]
+        if manquantes:
+            _creer_lignes(pack, manquantes, exclure=exclure)
+
+        completes = list(Disponibilite.objects.filter(
+            **{champ: pack},
+            date__in=dates,
+            places_restantes__lt=nb_personne,
+        ).values_list("date", flat=True))
+        if completes:
+            raise _erreur_dates(completes)
+
+        mises_a_jour = Disponibilite.objects.filter(
+            **{champ: pack},
+            date__in=dates,
+            places_restantes__gte=nb_personne,
+        ).update(places_restantes=F("places_restantes") - nb_personne)
+
+        if mises_a_jour != len(dates):
+            # Une réservation concurrente a pris les dernières places entre-temps :
+            # l'exception annule les décréments déjà faits (rollback du savepoint)
+            raise PlacesInsuffisantes("Plus assez de places disponibles.", code="places_insuffisantes")
+
+        incrementer_version(type(pack), pack.pk)
+
+
+def reserver_places_lot(pack, demandes):
+    """
+    Réserve en une seule UPDATE les places {date: personnes} d'un lot de
+    réservations du même pack (import en lot). La contrainte
+    places_restantes >= 0 refuse tout dépassement : PlacesInsuffisantes est
+    levée si une réservation concurrente a pris des places entre-temps.
+    """
+    if pack.capacite_journaliere is None or not demandes:
+        return
+
+    champ = champ_pack(type(pack))
+    with transaction.atomic():
+        existantes = set(
+            Disponibilite.objects.filter(**{champ: pack}, date__in=list(demandes)).values_list("date", flat=True)
+        )
+        manquantes = [jour for jour in demandes if jour not in existantes]
+        if manquantes:
+            _creer_lignes(pack, manquantes)
+
+        try:
+            with transaction.atomic():
+                Disponibilite.objects.filter(**{champ: pack}, date__in=list(demandes)).update(
+                    places_restantes=F("places_restantes") - Case(
+                        *[When(date=jour, then=Value(personnes)) for jour, personnes in demandes.items()],
+                        output_field=IntegerField(),
+                    )
+                )
+        except IntegrityError:
+            raise PlacesInsuffisantes("Plus assez de places disponibles.", code="places_insuffisantes")
+
+        incrementer_version(type(pack), pack.pk)
+
+
+def liberer_places(modele_pack, pack_id, dates, nb_personne):
+    """Rend les places d'une réservation annulée, supprimée ou modifiée."""
+    liberees = Disponibilite.objects.filter(
+        **{f"{champ_pack(modele_pack)}_id": pack_id},
+        date__in=dates,
+    ).update(places_restantes=F("places_restantes") + nb_personne)
+    if liberees:
+        incrementer_version(modele_pack, pack_id)
+
+
+def ajuster_places(reservation):
+    """
+    Passe de l'occupation enregistrée à l'occupation courante de la réservation.
+    Appelée par PlacesMixin.save() dans la transaction de l'enregistrement.
+    """
+    modele_pack = reservation._meta.get_field("pack").related_model
+    nouvelle = occupation(reservation)
+
+    ancienne = None
+    if reservation.pk is not None:
+        ancienne = occupation(reservation, initiale=True)
+        if ancienne is INCONNU:
+            # Instance construite à la main : on relit l'état enregistré
+            enregistree = type(reservation).objects.filter(pk=reservation.pk).first()
+            ancienne = occupation(enregistree) if enregistree else None
+
+    if ancienne == nouvelle:
+        return
+    if ancienne:
+        liberer_places(modele_pack, *ancienne)
+    if nouvelle:
+        reserver_places(reservation.pack, nouvelle[1], nouvelle[2], exclure=reservation.pk)
+
+
+# -----------------------------
+# SIGNAUX
+# -----------------------------
+
+@receiver(post_delete, sender=ReservationPackJour)
+@receiver(post_delete, sender=ReservationPackComplet)
+def reservation_supprimee(sender, instance, **kwargs):
+    places = occupation(instance, initiale=True)
+    if places is INCONNU:
+        places = occupation(instance)
+    if places:
+        liberer_places(sender._meta.get_field("pack").related_model, *places)
+
+
+@receiver(statuts_modifies, sender=ReservationPackComplet)
+def statuts_modifies_places(sender, pks, anciens_statuts=None, **kwargs):
+    """Annulations / réactivations en masse (actions admin)."""
+    for reservation in sender.objects.filter(pk__in=pks).select_related("pack"):
+        ancien = (anciens_statuts or {}).get(reservation.pk)
+        dates = plage(reservation.date_debut, reservation.date_fin)
+        if reservation.statut == "annulé" and ancien != "annulé":
+            liberer_places(PackComplet, reservation.pack_id, dates, reservation.nb_personne)
+        elif ancien == "annulé" and reservation.statut != "annulé":
+            reserver_places(reservation.pack, dates, reservation.nb_personne, exclure=reservation.pk)
+
+
+@receiver(post_save, sender=PackJour)
+@receiver(post_save, sender=PackComplet)
+def capacite_modifiee(sender, instance, created, **kwargs):
+    """L'index du pack est reconstruit à la demande quand sa capacité change."""
+    if not created and instance.champ_a_change("capacite_journaliere") is not False:
+        Disponibilite.objects.filter(**{champ_pack(sender): instance}).delete()
+        incrementer_version(sender, instance.pk)
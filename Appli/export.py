@@ -0,0 +1,269 @@
+import csv
+import io
+import re
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.db.models import F
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .models import (
+    ReservationPackJour,
+    ReservationPackComplet,
+    OptionReservation,
+    MONNAIE_CHOICES,
+    total_options,
+)
+from .prix import expression_prix
+
+# -----------------------------
+# EXPORT EN FLUX (CSV, XLSX)
+# -----------------------------
+# Les lignes sont lues par paquets (.iterator(chunk_size=…)) en values_list :
+# les colonnes des tables liées (pack, client) viennent de la même jointure
+# que select_related, sans instancier de modèle. Les totaux dans chaque devise
+# sont calculés en SQL. Chaque paquet est écrit puis envoyé au client par une
+# StreamingHttpResponse : la mémoire reste constante quel que soit le nombre
+# de lignes, contrairement à l'export tablib (django-import-export) qui
+# construit tout le fichier en mémoire.
+
+TAILLE_PAQUET = 2000
+
+DEVISES = [code for code, _ in MONNAIE_CHOICES]
+
+
+def _totaux_reservation(modele):
+    # Pack × personnes + options, dans chaque devise (colonnes prix_* ou conversion)
+    return {
+        f"total_{code.lower()}": expression_prix(code, "pack__") * F("nb_personne")
+        + total_options(modele.champ_options, code)
+        for code in DEVISES
+    }
+
+
+def _totaux_option(modele):
+    return {f"total_{code.lower()}": expression_prix(code) * F("quantite") for code in DEVISES}
+
+
+def _colonnes_totaux():
+    return [(f"Total {code}", f"total_{code.lower()}") for code in DEVISES]
+
+
+# modèle : ([(entête, champ ou annotation)], annotations)
+EXPORTS = {
+    ReservationPackJour: (
+        [
+            ("ID", "id"),
+            ("Pack", "pack__nom"),
+            ("Client", "user__email"),
+            ("Date", "date"),
+            ("Personnes", "nb_personne"),
+            ("Devise", "devise"),
+            ("Montant total", "montant_total"),
+            *_colonnes_totaux(),
+            ("Réservée le", "date_reservation"),
+        ],
+        _totaux_reservation,
+    ),
+    ReservationPackComplet: (
+        [
+            ("ID", "id"),
+            ("Pack", "pack__nom"),
+            ("Client", "user__email"),
+            ("Début", "date_debut"),
+            ("Fin", "date_fin"),
+            ("Personnes", "nb_personne"),
+            ("Devise", "devise"),
+            ("Statut", "statut"),
+            ("Montant total", "montant_total"),
+            *_colonnes_totaux(),
+            ("Réservée le", "date_reservation"),
+        ],
+        _totaux_reservation,
+    ),
+    OptionReservation: (
+        [
+            ("ID", "id"),
+            ("Option", "nom_option"),
+            ("Type", "type_option"),
+            ("Quantité", "quantite"),
+            *[(f"Prix {code}", f"prix_{code.lower()}") for code in DEVISES],
+            *_colonnes_totaux(),
+            ("Réservation jour", "reservation_jour_id"),
+            ("Pack jour", "reservation_jour__pack__nom"),
+            ("Réservation complet", "reservation_complet_id"),
+            ("Pack complet", "reservation_complet__pack__nom"),
+        ],
+        _totaux_option,
+    ),
+}
+
+
+def entetes(modele):
+    return [entete for entete, _ in EXPORTS[modele][0]]
+
+
+def lignes(queryset, taille_paquet=TAILLE_PAQUET):
+    """Tuples des colonnes d'export de `queryset`, lus par paquets de `taille_paquet`."""
+    colonnes, annotations = EXPORTS[queryset.model]
+    queryset = queryset.annotate(**annotations(queryset.model))
+    return queryset.values_list(*[champ for _, champ in colonnes]).iterator(chunk_size=taille_paquet)
+
+
+def _texte(valeur):
+    if valeur is None:
+        return ""
+    if isinstance(valeur, datetime):
+        if timezone.is_aware(valeur):
+            valeur = timezone.localtime(valeur)
+        return valeur.strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(valeur, date):
+        return valeur.isoformat()
+    return str(valeur)
+
+
+def _paquets(iterable, taille):
+    paquet = []
+    for element in iterable:
+        paquet.append(element)
+        if len(paquet) >= taille:
+            yield paquet
+            paquet = []
+    if paquet:
+        yield paquet
+
+
+# -----------------------------
+# CSV
+# -----------------------------
+
+def flux_csv(queryset, taille_paquet=TAILLE_PAQUET):
+    """Fichier CSV (UTF-8 avec BOM pour Excel) produit paquet par paquet."""
+    tampon = io.StringIO()
+    ecrivain = csv.writer(tampon)
+    ecrivain.writerow(entetes(queryset.model))
+    yield ("\ufeff" + tampon.getvalue()).encode()
+
+    for paquet in _paquets(lignes(queryset, taille_paquet), taille_paquet):
+        tampon.seek(0)
+        tampon.truncate()
+        ecrivain.writerows([_texte(valeur) for valeur in ligne] for ligne in paquet)
+        yield tampon.getvalue().encode()
+
+
+# -----------------------------
+# XLSX
+# -----------------------------
+# Classeur minimal écrit à la main (une feuille, chaînes en ligne) : l'archive
+# est produite au fil de l'eau, ce que ne permettent pas openpyxl ni tablib.
+
+XLSX_FICHIERS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    "xl/workbook.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Export" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+# Caractères de contrôle interdits en XML 1.0
+CARACTERES_INTERDITS = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+class _Sortie:
+    """Fichier en écriture seule dont le contenu est repris par morceaux (archive non adressable)."""
+
+    def __init__(self):
+        self.morceaux = []
+
+    def write(self, donnees):
+        self.morceaux.append(bytes(donnees))
+        return len(donnees)
+
+    def flush(self):
+        pass
+
+    def vider(self):
+        donnees = b"".join(self.morceaux)
+        self.morceaux = []
+        return donnees
+
+
+def _cellule(valeur):
+    if isinstance(valeur, (int, float, Decimal)) and not isinstance(valeur, bool):
+        return f"<c><v>{valeur}</v></c>"
+    texte = escape(CARACTERES_INTERDITS.sub("", _texte(valeur)))
+    return f'<c t="inlineStr"><is><t>{texte}</t></is></c>'
+
+
+def _ligne_xml(ligne):
+    return "<row>" + "".join(_cellule(valeur) if valeur is not None else "<c/>" for valeur in ligne) + "</row>"
+
+
+def flux_xlsx(queryset, taille_paquet=TAILLE_PAQUET):
+    """Classeur XLSX produit paquet par paquet (archive ZIP en flux)."""
+    sortie = _Sortie()
+    with zipfile.ZipFile(sortie, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for nom, contenu in XLSX_FICHIERS.items():
+            archive.writestr(nom, contenu)
+        with archive.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as feuille:
+            feuille.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+                + _ligne_xml(entetes(queryset.model))
+            ).encode())
+            for paquet in _paquets(lignes(queryset, taille_paquet), taille_paquet):
+                feuille.write("".join(_ligne_xml(ligne) for ligne in paquet).encode())
+                yield sortie.vider()
+            feuille.write(b"</sheetData></worksheet>")
+    yield sortie.vider()
+
+
+# -----------------------------
+# RÉPONSE
+# -----------------------------
+
+FORMATS = {
+    "csv": (flux_csv, "text/csv; charset=utf-8"),
+    "xlsx": (flux_xlsx, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+}
+
+
+def reponse_export(queryset, format_fichier, taille_paquet=TAILLE_PAQUET):
+    """StreamingHttpResponse en pièce jointe : <table>_<AAAAMMJJ-HHMM>.<format>."""
+    flux, type_contenu = FORMATS[format_fichier]
+    nom = f"{queryset.model._meta.model_name}_{timezone.localtime():%Y%m%d-%H%M}.{format_fichier}"
+    reponse = StreamingHttpResponse(flux(queryset, taille_paquet), content_type=type_contenu)
+    reponse["Content-Disposition"] = f'attachment; filename="{nom}"'
+    return reponse
@@ -1,5 +1,7 @@
 from django import forms
+from django.urls import reverse
 from django.utils import timezone
+from .disponibilites import PlacesInsuffisantes, plage, verifier_places
 from .models import (
     PackJour,
     PackComplet,
@@ -8,12 +10,52 @@ from .models import (
     MONNAIE_CHOICES
 )
 
+# ----------------------------------------------------
+# AUTOCOMPLÉTION DU PACK
+# ----------------------------------------------------
+
+class AutocompletePack(forms.Widget):
+    """
+    Saisie du nom avec suggestions lues sur /api/packs/<type>/?q=… et
+    identifiant du pack dans un champ caché. Contrairement à un <select>,
+    le rendu ne charge pas tous les packs : seul le nom du pack
+    sélectionné est lu (une requête).
+    """
+    template_name = "widgets/autocomplete_pack.html"
+
+    class Media:
+        js = ("js/autocomplete_pack.js",)
+
+    def __init__(self, type_pack, attrs=None):
+        super().__init__(attrs)
+        self.type_pack = type_pack
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context["widget"]["url"] = reverse("api_liste_packs", args=[self.type_pack])
+        context["widget"]["libelle"] = self._libelle(value)
+        return context
+
+    def _libelle(self, value):
+        # `choices` est renseigné par le ModelChoiceField (ModelChoiceIterator)
+        queryset = getattr(getattr(self, "choices", None), "queryset", None)
+        if queryset is None or value in (None, ""):
+            return ""
+        try:
+            return queryset.filter(pk=int(value)).values_list("nom", flat=True).first() or ""
+        except (TypeError, ValueError):
+            return ""
+
+
 # ----------------------------------------------------
 # WIDGETS ET LABELS COMMUNS
 # ----------------------------------------------------
 
+ATTRS_PACK = {"class": "form-control rounded-3 shadow-sm", "placeholder": "Rechercher un pack…"}
+
 COMMON_WIDGETS = {
-    'pack': forms.Select(attrs={"class": "form-select rounded-3 shadow-sm"}),
+    'pack_jour': AutocompletePack("jour", attrs=ATTRS_PACK),
+    'pack_complet': AutocompletePack("complet", attrs=ATTRS_PACK),
     'nb_personne': forms.NumberInput(attrs={
         "class": "form-control rounded-3 shadow-sm",
         "min": 1
@@ -42,11 +84,21 @@ COMMON_LABELS = {
 }
 
 
+class ControlePlacesMixin:
+    """
+    Contrôle des places restantes appelé par clean(). L'import en lot
+    (import_reservations.py) le redéfinit : il contrôle tout le lot à la fois.
+    """
+
+    def controler_places(self, pack, dates, nb_personne):
+        verifier_places(pack, dates, nb_personne)
+
+
 # =========================================================================
 # FORMULAIRE POUR LES PACKS D’UNE JOURNÉE
 # =========================================================================
 
-class ReservationPackJourForm(forms.ModelForm):
+class ReservationPackJourForm(ControlePlacesMixin, forms.ModelForm):
     """Formulaire pour la réservation de packs d'une journée."""
 
     class Meta:
@@ -59,7 +111,7 @@ class ReservationPackJourForm(forms.ModelForm):
         ]
 
         widgets = {
-            'pack': COMMON_WIDGETS['pack'],
+            'pack': COMMON_WIDGETS['pack_jour'],
             'nb_personne': COMMON_WIDGETS['nb_personne'],
             'devise': COMMON_WIDGETS['devise'],
             'date': COMMON_WIDGETS['date'],
@@ -84,12 +136,26 @@ class ReservationPackJourForm(forms.ModelForm):
             raise forms.ValidationError("La date de l’activité ne peut pas être antérieure à aujourd’hui.")
         return date
 
+    def clean(self):
+        cleaned_data = super().clean()
+        pack = cleaned_data.get("pack")
+        date = cleaned_data.get("date")
+        nb_personne = cleaned_data.get("nb_personne")
+
+        if pack and date and nb_personne:
+            try:
+                self.controler_places(pack, [date], nb_personne)
+            except PlacesInsuffisantes as exc:
+                self.add_error(None, exc)
+
+        return cleaned_data
+
 
 # =========================================================================
 # FORMULAIRE POUR LES PACKS COMPLETS
 # =========================================================================
 
-class ReservationPackCompletForm(forms.ModelForm):
+class ReservationPackCompletForm(ControlePlacesMixin, forms.ModelForm):
     """Formulaire pour la réservation de packs complets (plusieurs jours)."""
 
     class Meta:
@@ -103,7 +169,7 @@ class ReservationPackCompletForm(forms.ModelForm):
         ]
 
         widgets = {
-            'pack': COMMON_WIDGETS['pack'],
+            'pack': COMMON_WIDGETS['pack_complet'],
             'nb_personne': COMMON_WIDGETS['nb_personne'],
             'devise': COMMON_WIDGETS['devise'],
             'date_debut': COMMON_WIDGETS['date_debut'],
@@ -136,4 +202,12 @@ class ReservationPackCompletForm(forms.ModelForm):
         if date_debut and date_fin and date_fin <= date_debut:
             self.add_error("date_fin", "La date de fin doit être strictement postérieure à la date de début.")
 
+        pack = cleaned_data.get("pack")
+        nb_personne = cleaned_data.get("nb_personne")
+        if pack and nb_personne and not self.errors:
+            try:
+                self.controler_places(pack, plage(date_debut, date_fin), nb_personne)
+            except PlacesInsuffisantes as exc:
+                self.add_error(None, exc)
+
         return cleaned_data
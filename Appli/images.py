@@ -0,0 +1,215 @@
+import hashlib
+from datetime import timedelta
+from io import BytesIO
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection as db_connection, transaction
+from django.db.models.signals import post_save
+from django.utils import timezone
+
+from .models import (
+    Ville,
+    ActiviteJour,
+    PackJour,
+    ActiviteComplet,
+    PackComplet,
+    DerivesImage,
+)
+
+# -----------------------------
+# DÉRIVÉS D'IMAGES DU CATALOGUE
+# -----------------------------
+# Chaque image envoyée est mise en file ; le worker génère des versions
+# redimensionnées (WebP + format d'origine JPEG/PNG) nommées d'après
+# l'empreinte du contenu, à côté des originaux dans le stockage par défaut.
+# Le gabarit les sert via {% image_responsive %} (Appli/templatetags/images.py).
+
+MODELES_AVEC_IMAGE = (Ville, ActiviteJour, PackJour, ActiviteComplet, PackComplet)
+
+CLE_DERIVES = "images:derives:{empreinte}"
+
+QUALITE = {"webp": 80, "jpeg": 82}
+
+# Une tâche réservée par un worker arrêté en cours de route redevient disponible
+DUREE_BAIL = timedelta(minutes=5)
+
+# Image pas encore traitée : réponse négative gardée peu de temps, le worker
+# (autre processus) ne peut pas invalider un cache local
+DUREE_CACHE_ABSENT = 60
+
+CHAMPS_RESULTAT = ["statut", "empreinte", "derives", "tentatives", "derniere_erreur"]
+
+
+def _cle(nom):
+    # Noms de fichiers arbitraires : la clé de cache reste courte et sans espace
+    return CLE_DERIVES.format(empreinte=hashlib.sha1(nom.encode()).hexdigest())
+
+
+def largeurs():
+    return getattr(settings, "IMAGES_LARGEURS", (320, 640, 1024, 1600))
+
+
+# -----------------------------
+# MISE EN FILE
+# -----------------------------
+
+def mettre_en_file(noms):
+    """Crée les tâches des images `noms` qui n'en ont pas encore (une requête)."""
+    noms = {nom for nom in noms if nom}
+    if noms:
+        DerivesImage.objects.bulk_create(
+            [DerivesImage(original=nom) for nom in noms],
+            ignore_conflicts=True,
+        )
+
+
+def _image_enregistree(sender, instance, **kwargs):
+    nom = instance.image.name if instance.image else ""
+    if nom:
+        transaction.on_commit(lambda: mettre_en_file([nom]))
+
+
+for _modele in MODELES_AVEC_IMAGE:
+    post_save.connect(_image_enregistree, sender=_modele, dispatch_uid=f"images_{_modele.__name__}")
+
+
+# -----------------------------
+# GÉNÉRATION
+# -----------------------------
+
+def nom_derive(original, empreinte, largeur, extension):
+    """derives/<dossier de l'original>/<nom>.<empreinte>.<largeur>.<extension>"""
+    chemin = PurePosixPath(original)
+    return str(PurePosixPath("derives") / chemin.parent / f"{chemin.stem}.{empreinte}.{largeur}.{extension}")
+
+
+def generer_derives(original, stockage=None):
+    """
+    Génère les dérivés d'une image du stockage. Retourne (empreinte, derives).
+    Un dérivé déjà présent (même empreinte, donc même contenu) n'est pas réécrit.
+    """
+    from PIL import Image, ImageOps
+
+    stockage = stockage or default_storage
+    with stockage.open(original, "rb") as fichier:
+        contenu = fichier.read()
+    empreinte = hashlib.sha256(contenu).hexdigest()[:16]
+
+    with Image.open(BytesIO(contenu)) as source:
+        image = ImageOps.exif_transpose(source)
+        image.load()
+
+    transparente = image.mode in ("RGBA", "LA") or "transparency" in image.info
+    format_repli = ("png", "PNG") if transparente else ("jpeg", "JPEG")
+
+    # Pas d'agrandissement : la plus grande variante est l'image d'origine
+    tailles = sorted({l for l in largeurs() if l < image.width} | {min(image.width, max(largeurs()))})
+
+    derives = []
+    for largeur in tailles:
+        hauteur = max(1, round(image.height * largeur / image.width))
+        variante = image.resize((largeur, hauteur), Image.LANCZOS) if largeur != image.width else image
+        for extension, format_pil in (("webp", "WEBP"), format_repli):
+            nom = nom_derive(original, empreinte, largeur, extension)
+            if not stockage.exists(nom):
+                sortie = BytesIO()
+                a_enregistrer = variante if transparente or format_pil == "WEBP" else variante.convert("RGB")
+                options = {"quality": QUALITE[extension]} if extension in QUALITE else {"optimize": True}
+                if format_pil == "JPEG":
+                    options["progressive"] = True
+                a_enregistrer.save(sortie, format_pil, **options)
+                stockage.save(nom, ContentFile(sortie.getvalue()))
+            derives.append({"largeur": largeur, "format": extension, "nom": nom})
+    return empreinte, derives
+
+
+def reserver_taches(taille_lot, maintenant):
+    """
+    Réserve jusqu'à `taille_lot` images en attente en datant leur traitement,
+    dans une transaction courte (SKIP LOCKED si la base le permet) : la
+    génération se fait ensuite hors transaction, sans tenir de verrou.
+    """
+    disponibles = DerivesImage.objects.filter(statut="en_attente").exclude(
+        date_traitement__gt=maintenant - DUREE_BAIL
+    )
+    with transaction.atomic():
+        taches = disponibles.order_by("date_creation", "id")
+        if db_connection.features.has_select_for_update_skip_locked:
+            taches = taches.select_for_update(skip_locked=True)
+        ids = list(taches.values_list("id", flat=True)[:taille_lot])
+        if not ids:
+            return []
+        # Conditionnelle : une tâche réservée entre-temps par un autre worker porte une autre date
+        disponibles.filter(pk__in=ids).update(date_traitement=maintenant)
+    return list(
+        DerivesImage.objects.filter(pk__in=ids, date_traitement=maintenant).order_by("date_creation", "id")
+    )
+
+
+def traiter_lot(taille_lot=20, max_tentatives=3):
+    """
+    Traite jusqu'à `taille_lot` images en attente ; plusieurs workers peuvent
+    tourner. Une image en échec est retentée une fois le bail écoulé.
+    Retourne le nombre d'images traitées avec succès.
+    """
+    from .catalogue import cache_catalogue
+
+    taches = reserver_taches(taille_lot, timezone.now())
+
+    reussies = 0
+    for tache in taches:
+        tache.tentatives += 1
+        try:
+            tache.empreinte, tache.derives = generer_derives(tache.original)
+        except Exception as exc:
+            tache.derniere_erreur = str(exc)
+            if tache.tentatives >= max_tentatives:
+                tache.statut = "echec"
+        else:
+            tache.statut = "pret"
+            tache.derniere_erreur = ""
+            reussies += 1
+
+    with transaction.atomic():
+        DerivesImage.objects.bulk_update(taches, CHAMPS_RESULTAT)
+        for tache in taches:
+            if tache.statut == "pret":
+                # Le cache n'est garni qu'une fois le résultat visible en base
+                transaction.on_commit(
+                    lambda cle=_cle(tache.original), derives=tache.derives: cache_catalogue().set(
+                        cle, derives, timeout=None
+                    )
+                )
+    return reussies
+
+
+# -----------------------------
+# LECTURE (GABARITS)
+# -----------------------------
+
+def derives_de(nom):
+    """Dérivés prêts de l'image `nom` (liste vide sinon), servis depuis le cache."""
+    from .catalogue import cache_catalogue
+
+    if not nom:
+        return []
+    cle = _cle(nom)
+    derives = cache_catalogue().get(cle)
+    if derives is None:
+        derives = (
+            DerivesImage.objects.filter(original=nom, statut="pret")
+            .values_list("derives", flat=True).first()
+        ) or []
+        cache_catalogue().set(cle, derives, timeout=None if derives else DUREE_CACHE_ABSENT)
+    return derives
+
+
+def srcset(derives, format_image, stockage=None):
+    """Valeur d'attribut srcset ("url 320w, url 640w") pour un format donné."""
+    stockage = stockage or default_storage
+    return ", ".join(
+        f"{stockage.url(d['nom'])} {d['largeur']}w" for d in derives if d["format"] == format_image
+    )
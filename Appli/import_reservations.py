@@ -0,0 +1,431 @@
+import copy
+import csv
+import json
+from decimal import InvalidOperation
+from itertools import islice
+
+from django import forms
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .disponibilites import PlacesInsuffisantes, disponibilites, plage, reserver_places_lot
+from .forms import ReservationPackJourForm, ReservationPackCompletForm
+from .models import (
+    PackJour,
+    PackComplet,
+    ReservationPackJour,
+    ReservationPackComplet,
+    OptionReservation,
+)
+from .prix import deriver_prix, prix_par_devise, taux_de_change
+from .rapports import (
+    TYPES_RESERVATION,
+    appliquer_deltas,
+    contribution,
+    cumuler,
+    etat_reservation,
+    nouveaux_deltas,
+)
+
+User = get_user_model()
+
+# -----------------------------
+# IMPORT DE RÉSERVATIONS EN LOT
+# -----------------------------
+# Lots envoyés par les agences partenaires (JSONL ou CSV). Chaque réservation
+# est validée par le formulaire du site (mêmes règles de dates et de champs),
+# mais sans requête par ligne : packs et clients sont préchargés pour tout le
+# paquet, les places sont contrôlées puis réservées pack par pack en une
+# UPDATE. Les réservations et leurs options sont insérées par bulk_create,
+# une transaction par paquet de `taille_lot` réservations ; les statistiques
+# des jours concernés sont recalculées une fois par paquet. Les e-mails ne
+# sont pas envoyés pendant l'import : voir notifier_import_reservations().
+#
+# JSONL, une réservation par ligne :
+#   {"type": "complet", "reference": "AG-12", "client": "a@b.ma", "pack": 3,
+#    "nb_personne": 2, "devise": "EUR", "date_debut": "2026-11-02",
+#    "date_fin": "2026-11-05", "options": [{"nom_option": "Dîner", "prix_mad": "350", "quantite": 2}]}
+# CSV : mêmes colonnes à plat ; les lignes consécutives d'une même
+# `reference` ajoutent chacune une option (colonnes option_*).
+#
+# La référence est enregistrée avec la source de l'import (agence, compte
+# staff) : renvoyer un fichier, même en partie, ne réserve pas deux fois, les
+# références déjà importées sont rapportées parmi les lignes rejetées.
+
+TAILLE_LOT = 1000
+# Réservations détaillées dans le récapitulatif des administrateurs (le nombre total y figure)
+ECHANTILLON_ADMIN = 20
+
+MODELES_PACK = {
+    "jour": PackJour,
+    "complet": PackComplet,
+}
+CHAMPS_OPTION = ("nom_option", "type_option", "prix_mad", "quantite")
+
+
+# -----------------------------
+# LECTURE DES FICHIERS
+# -----------------------------
+
+def lire_jsonl(lignes):
+    """(numéro de ligne, enregistrement) ; un enregistrement illisible est une chaîne d'erreur."""
+    for numero, ligne in enumerate(lignes, 1):
+        if not ligne.strip():
+            continue
+        try:
+            enregistrement = json.loads(ligne)
+        except ValueError as exc:
+            yield numero, f"JSON invalide : {exc}"
+            continue
+        yield numero, enregistrement if isinstance(enregistrement, dict) else "Objet JSON attendu."
+
+
+def lire_csv(lignes):
+    """(numéro de ligne, enregistrement) ; les options des lignes suivantes de même référence sont regroupées."""
+    courant = None
+    for numero, ligne in enumerate(csv.DictReader(lignes), 2):
+        ligne = {cle.strip(): (valeur or "").strip() for cle, valeur in ligne.items() if cle}
+        option = {champ: ligne.pop(f"option_{champ}", "") for champ in CHAMPS_OPTION}
+        reference = ligne.get("reference")
+        if courant is None or not reference or reference != courant[1].get("reference"):
+            if courant is not None:
+                yield courant
+            courant = (numero, dict(ligne, options=[]))
+        if option["nom_option"]:
+            courant[1]["options"].append({champ: valeur for champ, valeur in option.items() if valeur})
+    if courant is not None:
+        yield courant
+
+
+LECTEURS = {
+    "jsonl": lire_jsonl,
+    "csv": lire_csv,
+}
+
+
+# -----------------------------
+# VALIDATION
+# -----------------------------
+
+class PackDuLot(forms.Field):
+    """Pack résolu parmi les packs préchargés du paquet : aucune requête par ligne."""
+
+    def __init__(self, packs, **kwargs):
+        super().__init__(**kwargs)
+        self.packs = packs
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        try:
+            return self.packs[int(value)]
+        except (KeyError, TypeError, ValueError):
+            raise ValidationError("Pack inconnu.", code="invalid_choice")
+
+
+class ImportMixin:
+    """
+    Formulaire du site avec les packs du paquet ; les places sont contrôlées
+    pour tout le paquet. Un formulaire est construit par paquet puis lié à
+    chaque ligne (lier) : les champs ne sont pas recopiés ligne par ligne.
+    """
+
+    def __init__(self, *args, packs, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["pack"] = PackDuLot(packs, label=self.fields["pack"].label)
+
+    def lier(self, data):
+        """Copie du formulaire liée à `data`, sur une nouvelle réservation (champs partagés, sans état)."""
+        form = copy.copy(self)
+        form.data = data
+        form.is_bound = True
+        form._errors = None
+        form._bound_fields_cache = {}
+        # pack_id renseigné : le pack par défaut (lu dans le cache du catalogue) est inutile ici
+        form.instance = self._meta.model(pack_id=None)
+        return form
+
+    def controler_places(self, pack, dates, nb_personne):
+        pass
+
+    def _get_validation_exclusions(self):
+        # Le pack vient déjà de la base : pas de vérification d'existence par ligne
+        return super()._get_validation_exclusions() | {"pack"}
+
+
+class ImportReservationPackJourForm(ImportMixin, ReservationPackJourForm):
+    pass
+
+
+class ImportReservationPackCompletForm(ImportMixin, ReservationPackCompletForm):
+    pass
+
+
+FORMULAIRES_IMPORT = {
+    "jour": ImportReservationPackJourForm,
+    "complet": ImportReservationPackCompletForm,
+}
+
+
+def _erreurs_formulaire(form):
+    return {champ: [str(message) for message in messages] for champ, messages in form.errors.items()}
+
+
+def _option(donnees, taux):
+    """OptionReservation validée (hors lien vers la réservation), prix dérivés comme à l'enregistrement."""
+    if not isinstance(donnees, dict):
+        raise ValidationError("Option invalide.")
+    inconnus = set(donnees) - set(CHAMPS_OPTION)
+    if inconnus:
+        raise ValidationError(f"Champs d'option inconnus : {', '.join(sorted(inconnus))}.")
+    option = OptionReservation(**donnees)
+    option.full_clean(exclude=["reservation_jour", "reservation_complet"])
+    deriver_prix(option, taux)
+    return option
+
+
+REFERENCE_MAX = ReservationPackJour._meta.get_field("reference_import").max_length
+
+
+def _reference(enregistrement):
+    return str(enregistrement.get("reference") or "").strip() if isinstance(enregistrement, dict) else ""
+
+
+def _dates(reservation):
+    if isinstance(reservation, ReservationPackJour):
+        return [reservation.date]
+    return plage(reservation.date_debut, reservation.date_fin)
+
+
+# -----------------------------
+# IMPORT
+# -----------------------------
+
+class ImportReservations:
+    """
+    Importe des enregistrements (numéro, dict) par paquets ; les lignes
+    invalides sont écartées et rapportées, les autres enregistrées.
+
+        rapport = ImportReservations().importer(lire_jsonl(fichier))
+
+    Avec `clients_autorises=False` (jetons d'agence), la colonne `client` est
+    refusée : seul le staff rattache des réservations à un compte existant.
+    Une `reference` n'est importée qu'une fois par `source`.
+
+    Les réservations créées ne sont pas toutes gardées en mémoire : seules
+    celles des clients (par_client, pour leur récapitulatif) et les
+    ECHANTILLON_ADMIN premières (echantillon) le sont.
+    """
+
+    def __init__(self, taille_lot=TAILLE_LOT, clients_autorises=True, source=""):
+        self.taille_lot = taille_lot
+        self.clients_autorises = clients_autorises
+        self.source = source[:255]
+        self.nb_reservations = 0
+        self.par_client = {}
+        self.echantillon = []
+        self.nb_options = 0
+        self.erreurs = []
+        self.nb_lignes = 0
+
+    def importer(self, enregistrements):
+        enregistrements = iter(enregistrements)
+        while True:
+            paquet = list(islice(enregistrements, self.taille_lot))
+            if not paquet:
+                break
+            self.nb_lignes += len(paquet)
+            self._importer_paquet(paquet)
+        return self.rapport()
+
+    def rapport(self):
+        return {
+            "lignes": self.nb_lignes,
+            "reservations": self.nb_reservations,
+            "options": self.nb_options,
+            "erreurs": sorted(self.erreurs, key=lambda erreur: erreur["ligne"]),
+        }
+
+    def _erreur(self, numero, enregistrement, erreurs):
+        reference = enregistrement.get("reference", "") if isinstance(enregistrement, dict) else ""
+        self.erreurs.append({"ligne": numero, "reference": reference, "erreurs": erreurs})
+
+    def _precharger(self, paquet):
+        ids = {type_pack: set() for type_pack in MODELES_PACK}
+        emails = set()
+        references = set()
+        for _, enregistrement in paquet:
+            if not isinstance(enregistrement, dict):
+                continue
+            if enregistrement.get("type") in ids and str(enregistrement.get("pack", "")).isdigit():
+                ids[enregistrement["type"]].add(int(enregistrement["pack"]))
+            if self.clients_autorises and enregistrement.get("client"):
+                emails.add(str(enregistrement["client"]).strip().lower())
+            references.add(_reference(enregistrement))
+        packs = {type_pack: MODELES_PACK[type_pack].objects.in_bulk(ids[type_pack]) for type_pack in MODELES_PACK}
+        clients = {user.email.lower(): user for user in User.objects.filter(email__in=emails)}
+        # Références de cette source déjà importées (paquets précédents ou imports antérieurs)
+        importees = set()
+        references.discard("")
+        if references:
+            for modele in (ReservationPackJour, ReservationPackComplet):
+                importees.update(modele.objects.filter(
+                    source_import=self.source, reference_import__in=references
+                ).values_list("reference_import", flat=True))
+        return packs, clients, importees
+
+    def _valider(self, numero, enregistrement, formulaires, clients, importees, taux):
+        """
+        (réservation non enregistrée, options) ou None si l'enregistrement est
+        rejeté. `importees` : références déjà prises, complété par celle-ci.
+        """
+        if not isinstance(enregistrement, dict):
+            self._erreur(numero, enregistrement, {"__all__": [enregistrement]})
+            return None
+        type_reservation = enregistrement.get("type")
+        if type_reservation not in FORMULAIRES_IMPORT:
+            self._erreur(numero, enregistrement, {"type": ["Type attendu : jour ou complet."]})
+            return None
+
+        erreurs = {}
+        reference = _reference(enregistrement)
+        if len(reference) > REFERENCE_MAX:
+            erreurs["reference"] = [f"{REFERENCE_MAX} caractères au plus."]
+        elif reference in importees:
+            erreurs["reference"] = ["Référence déjà importée."]
+        user = None
+        if enregistrement.get("client") and not self.clients_autorises:
+            erreurs["client"] = ["Rattachement à un compte client réservé au staff."]
+        elif enregistrement.get("client"):
+            user = clients.get(str(enregistrement["client"]).strip().lower())
+            if user is None:
+                erreurs["client"] = ["Aucun compte client avec cet e-mail."]
+
+        form = formulaires[type_reservation].lier(enregistrement)
+        if not form.is_valid():
+            erreurs.update(_erreurs_formulaire(form))
+
+        options = []
+        for i, donnees in enumerate(enregistrement.get("options") or []):
+            try:
+                options.append(_option(donnees, taux))
+            except (ValidationError, TypeError, InvalidOperation) as exc:
+                messages = exc.messages if isinstance(exc, ValidationError) else [str(exc)]
+                erreurs[f"options.{i}"] = messages
+
+        if erreurs:
+            self._erreur(numero, enregistrement, erreurs)
+            return None
+
+        reservation = form.instance
+        reservation.user = user
+        reservation.date_reservation = timezone.now()
+        if reference:
+            importees.add(reference)
+            reservation.source_import = self.source
+            reservation.reference_import = reference
+        return reservation, options
+
+    def _controler_places(self, valides):
+        """
+        Décompte les places ligne par ligne (les réservations d'un même lot se
+        partagent les places) ; retourne {pack: {date: personnes}} à réserver.
+        Les places restantes sont lues une fois par pack, sur toute la période du lot.
+        """
+        periodes = {}
+        for _, _, reservation, _ in valides:
+            if reservation.pack.capacite_journaliere is not None:
+                dates = _dates(reservation)
+                debut, fin = periodes.get(reservation.pack, (dates[0], dates[-1]))
+                periodes[reservation.pack] = (min(debut, dates[0]), max(fin, dates[-1]))
+        restantes = {pack: disponibilites(pack, debut, fin) for pack, (debut, fin) in periodes.items()}
+
+        demandes = {}
+        acceptees = []
+        for numero, enregistrement, reservation, options in valides:
+            pack = reservation.pack
+            if pack in restantes:
+                dates = _dates(reservation)
+                completes = [jour for jour in dates if restantes[pack][jour] < reservation.nb_personne]
+                if completes:
+                    self._erreur(numero, enregistrement, {"__all__": [
+                        "Plus assez de places pour le " + ", ".join(j.strftime("%d/%m/%Y") for j in completes) + "."
+                    ]})
+                    continue
+                places = demandes.setdefault(pack, {})
+                for jour in dates:
+                    restantes[pack][jour] -= reservation.nb_personne
+                    places[jour] = places.get(jour, 0) + reservation.nb_personne
+            acceptees.append((reservation, options))
+        return acceptees, demandes
+
+    def _importer_paquet(self, paquet):
+        packs, clients, importees = self._precharger(paquet)
+        formulaires = {
+            type_reservation: formulaire(packs=packs[type_reservation])
+            for type_reservation, formulaire in FORMULAIRES_IMPORT.items()
+        }
+        taux = taux_de_change()
+
+        valides = []
+        for numero, enregistrement in paquet:
+            resultat = self._valider(numero, enregistrement, formulaires, clients, importees, taux)
+            if resultat is not None:
+                valides.append((numero, enregistrement, *resultat))
+
+        try:
+            with transaction.atomic():
+                acceptees, demandes = self._controler_places(valides)
+                for pack, places in demandes.items():
+                    reserver_places_lot(pack, places)
+                crees = self._inserer(acceptees, taux)
+        except PlacesInsuffisantes as exc:
+            # Places prises par une réservation concurrente pendant l'import : le paquet est annulé
+            for numero, enregistrement, _, _ in valides:
+                self._erreur(numero, enregistrement, {"__all__": exc.messages})
+            return
+        except IntegrityError:
+            # Même référence importée au même moment par un autre envoi : le paquet est annulé
+            for numero, enregistrement, _, _ in valides:
+                self._erreur(numero, enregistrement, {"reference": ["Import concurrent de ces références, à renvoyer."]})
+            return
+        self._retenir(crees)
+
+    def _retenir(self, crees):
+        self.nb_reservations += len(crees)
+        self.echantillon += crees[:ECHANTILLON_ADMIN - len(self.echantillon)]
+        for reservation in crees:
+            if reservation.user is not None:
+                self.par_client.setdefault(reservation.user.pk, (reservation.user, []))[1].append(reservation)
+
+    def _inserer(self, acceptees, taux):
+        crees = []
+        options_creees = []
+        deltas = nouveaux_deltas()
+        for modele in (ReservationPackJour, ReservationPackComplet):
+            lignes = [(r, o) for r, o in acceptees if isinstance(r, modele)]
+            if not lignes:
+                continue
+            for reservation, options in lignes:
+                # Total calculé comme MontantTotalMixin.save(), options comprises
+                devise = reservation.devise
+                reservation.montant_pack = prix_par_devise(reservation.pack, devise, taux) * reservation.nb_personne
+                reservation.montant_total = sum(
+                    (prix_par_devise(option, devise, taux) * option.quantite for option in options),
+                    reservation.montant_pack,
+                )
+            reservations = modele.objects.bulk_create([reservation for reservation, _ in lignes])
+            for reservation, (_, options) in zip(reservations, lignes):
+                for option in options:
+                    setattr(option, modele.champ_options + "_id", reservation.pk)
+                    options_creees.append(option)
+                cumuler(deltas, contribution(TYPES_RESERVATION[modele], etat_reservation(reservation)))
+            crees += reservations
+
+        OptionReservation.objects.bulk_create(options_creees)
+        self.nb_options += len(options_creees)
+        # bulk_create n'émet pas post_save : variations des statistiques cumulées sur le lot
+        appliquer_deltas(deltas)
+        return crees
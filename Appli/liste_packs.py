@@ -0,0 +1,119 @@
+from django.db.models import Exists, OuterRef, Q
+
+from .models import (
+    ActiviteJour,
+    ActiviteComplet,
+    PackJour,
+    PackComplet,
+)
+from .recherche import TRANCHES_PRIX
+
+# -----------------------------
+# LISTE DES PACKS : FILTRES ET PAGINATION PAR CURSEUR
+# -----------------------------
+# Les filtres (ville, type, durée, tranche de prix, saisie dans le nom) sont
+# appliqués en SQL ; la page suivante se lit après le dernier (nom, id) de la
+# page courante (index pack_*_nom_id_idx), sans OFFSET. Seules les colonnes
+# affichées par les cartes et l'autocomplétion sont chargées.
+
+TAILLE_PAGE = 24
+TAILLE_PAGE_MAX = 100
+
+COLONNES = {
+    PackJour: ("id", "nom", "description", "prix_mad", "image"),
+    PackComplet: ("id", "nom", "description", "prix_mad", "image", "type_pack", "duree_jours", "duree_nuits"),
+}
+
+BORNES_TRANCHE = {code: (minimum, maximum) for code, minimum, maximum, _ in TRANCHES_PRIX}
+
+
+def filtres_requete(parametres):
+    """
+    Filtres de filtrer_packs() lus dans les paramètres GET
+    (ville, type_pack, duree, prix, q). ValueError si l'un d'eux est invalide.
+    """
+    def entier(nom):
+        valeur = parametres.get(nom)
+        if not valeur:
+            return None
+        try:
+            return int(valeur)
+        except ValueError:
+            raise ValueError(f"`{nom}` doit être un entier.")
+
+    tranche = parametres.get("prix") or None
+    if tranche is not None and tranche not in BORNES_TRANCHE:
+        raise ValueError("Tranche de prix inconnue.")
+    return {
+        "ville": entier("ville"),
+        "type_pack": parametres.get("type_pack") or None,
+        "duree": entier("duree"),
+        "tranche": tranche,
+        "q": parametres.get("q", "")[:100],
+    }
+
+
+def encoder_curseur(pack):
+    return f"{pack.nom}~{pack.pk}"
+
+
+def decoder_curseur(curseur):
+    """Retourne (nom, id) ou None si le curseur est invalide. Le nom peut contenir « ~ »."""
+    try:
+        nom, pk = curseur.rsplit("~", 1)
+        return nom, int(pk)
+    except (AttributeError, ValueError):
+        return None
+
+
+def _dans_la_ville(modele, ville):
+    # EXISTS plutôt qu'une jointure : un pack n'apparaît qu'une fois et le tri reste sur l'index
+    if modele is PackJour:
+        return Exists(ActiviteJour.objects.filter(packs_jour=OuterRef("pk"), ville=ville))
+    return Exists(ActiviteComplet.objects.filter(pack=OuterRef("pk"), villes=ville))
+
+
+def filtrer_packs(modele, ville=None, type_pack=None, duree=None, tranche=None, q=None):
+    """
+    Packs de `modele` correspondant aux filtres (None : filtre ignoré).
+    Un pack jour dure un jour et n'a pas de type_pack : ces filtres ne gardent
+    que les packs jour compatibles (aucun pour un type_pack).
+    """
+    packs = modele.objects.all()
+    if q:
+        packs = packs.filter(nom__icontains=q)
+    if ville:
+        packs = packs.filter(_dans_la_ville(modele, ville))
+    if type_pack:
+        packs = packs.filter(type_pack=type_pack) if modele is PackComplet else packs.none()
+    if duree:
+        if modele is PackComplet:
+            packs = packs.filter(duree_jours=duree)
+        elif duree != 1:
+            packs = packs.none()
+    if tranche:
+        minimum, maximum = BORNES_TRANCHE[tranche]
+        packs = packs.filter(prix_mad__gte=minimum)
+        if maximum is not None:
+            packs = packs.filter(prix_mad__lt=maximum)
+    return packs
+
+
+def page_packs(modele, apres=None, taille=TAILLE_PAGE, **filtres):
+    """
+    Page de packs triés par (nom, id) à partir du curseur `apres`, en une requête.
+    Retourne (packs, curseur_suivant) ; curseur_suivant vaut None en fin de liste.
+    """
+    packs = filtrer_packs(modele, **filtres).only(*COLONNES[modele]).order_by("nom", "id")
+    curseur = decoder_curseur(apres) if apres else None
+    if curseur is not None:
+        nom, pk = curseur
+        packs = packs.filter(Q(nom__gt=nom) | Q(nom=nom, id__gt=pk))
+
+    taille = max(1, min(taille, TAILLE_PAGE_MAX))
+    packs = list(packs[:taille + 1])
+    curseur_suivant = None
+    if len(packs) > taille:
+        packs = packs[:taille]
+        curseur_suivant = encoder_curseur(packs[-1])
+    return packs, curseur_suivant
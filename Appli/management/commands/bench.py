@@ -0,0 +1,97 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from Appli.bench import comparer, executer, executer_export, executer_import, executer_recherche
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure latences (p50/p95/p99) et requêtes SQL du parcours de réservation "
+        "sur un catalogue synthétique, dans une base de test jetable."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--villes', type=int, default=10)
+        parser.add_argument('--packs', type=int, default=20, help="Packs de chaque type.")
+        parser.add_argument('--activites', type=int, default=5, help="Activités par pack.")
+        parser.add_argument('--utilisateurs', type=int, default=10)
+        parser.add_argument('--reservations', type=int, default=5, help="Réservations existantes par utilisateur et par type.")
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--echauffement', type=int, default=5)
+        parser.add_argument(
+            '--recherche', type=int, metavar='DOCUMENTS',
+            help="Mesure plutôt la recherche (/recherche/) sur un catalogue d'environ DOCUMENTS documents.",
+        )
+        parser.add_argument(
+            '--import-reservations', type=int, metavar='PAQUETS',
+            help="Mesure plutôt l'import en lot : PAQUETS paquets de 1000 réservations.",
+        )
+        parser.add_argument(
+            '--export', type=int, metavar='RESERVATIONS',
+            help="Mesure plutôt l'export CSV en flux contre tablib sur RESERVATIONS réservations.",
+        )
+        parser.add_argument('--sortie', help="Fichier JSON des résultats (sinon sortie standard).")
+        parser.add_argument('--reference', help="Résultats JSON d'une exécution précédente à comparer.")
+        parser.add_argument('--seuil', type=float, default=0.10, help="Hausse du p95 tolérée avant régression.")
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError("--iterations doit être supérieur ou égal à 1.")
+
+        # Base de test (comme `manage.py test`) : e-mails en mémoire, données réelles intactes
+        setup_test_environment()
+        ancienne_base = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            if options['export']:
+                resultats = executer_export(
+                    reservations=options['export'],
+                    iterations=options['iterations'],
+                    echauffement=options['echauffement'],
+                )
+            elif options['import_reservations']:
+                resultats = executer_import(
+                    paquets=options['import_reservations'],
+                    echauffement=min(options['echauffement'], 2),
+                )
+            elif options['recherche']:
+                resultats = executer_recherche(
+                    documents=options['recherche'],
+                    iterations=options['iterations'],
+                    echauffement=options['echauffement'],
+                )
+            else:
+                resultats = executer(
+                    iterations=options['iterations'],
+                    echauffement=options['echauffement'],
+                    villes=options['villes'],
+                    packs=options['packs'],
+                    activites=options['activites'],
+                    utilisateurs=options['utilisateurs'],
+                    reservations=options['reservations'],
+                )
+        finally:
+            connection.creation.destroy_test_db(ancienne_base, verbosity=0)
+            teardown_test_environment()
+
+        contenu = json.dumps(resultats, indent=2, ensure_ascii=False)
+        if options['sortie']:
+            with open(options['sortie'], 'w', encoding='utf-8') as fichier:
+                fichier.write(contenu)
+        else:
+            self.stdout.write(contenu)
+
+        if options['reference']:
+            with open(options['reference'], encoding='utf-8') as fichier:
+                reference = json.load(fichier)
+            lignes = comparer(reference, resultats, seuil=options['seuil'])
+            for ligne in lignes:
+                message = (
+                    f"{ligne['scenario']}: p95 {ligne['variation_p95']:+.1%}, "
+                    f"requêtes {ligne['variation_requetes']:+g}"
+                )
+                self.stdout.write(self.style.ERROR(message) if ligne['regression'] else message)
+            if any(ligne['regression'] for ligne in lignes):
+                raise CommandError("Régression détectée par rapport à la référence.")
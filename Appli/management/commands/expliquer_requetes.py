@@ -0,0 +1,99 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Sum
+from django.utils import timezone
+
+from Appli.chronologie import requete_chronologie
+from Appli.models import (
+    ReservationPackJour,
+    ReservationPackComplet,
+    EmailSortant,
+    Disponibilite,
+    StatistiqueJournaliere,
+)
+from Appli.rapports import filtre_jours
+
+
+def requetes_cles():
+    """(nom, queryset) des requêtes chaudes du site, avec des valeurs factices."""
+    User = get_user_model()
+    aujourd_hui = timezone.localdate()
+    user = User(pk=0)
+
+    return [
+        ("mon_activite (chronologie)", requete_chronologie(user)[:21]),
+        ("places occupées pack jour", (
+            ReservationPackJour.objects.filter(pack_id=0, date__in=[aujourd_hui])
+            .values("date").annotate(personnes=Sum("nb_personne"))
+        )),
+        ("places occupées pack complet", (
+            ReservationPackComplet.objects.filter(pack_id=0, date_debut__lte=aujourd_hui, date_fin__gte=aujourd_hui)
+            .exclude(statut="annulé").values_list("date_debut", "date_fin", "nb_personne")
+        )),
+        ("index des disponibilités", Disponibilite.objects.filter(
+            pack_jour_id=0, date__gte=aujourd_hui, date__lte=aujourd_hui + timedelta(days=30)
+        )),
+        ("statistiques : réservations d'un jour", ReservationPackJour.objects.filter(filtre_jours([aujourd_hui]))),
+        ("rapport chiffre d'affaires", StatistiqueJournaliere.objects.filter(
+            jour__gte=aujourd_hui.replace(day=1), jour__lte=aujourd_hui
+        )),
+        ("admin : réservations jour", ReservationPackJour.objects.select_related("pack", "user").order_by("-date_reservation")[:100]),
+        ("admin : réservations complet par statut", (
+            ReservationPackComplet.objects.select_related("pack", "user")
+            .filter(statut="demande").order_by("-date_reservation")[:100]
+        )),
+        ("file d'envoi des e-mails", (
+            EmailSortant.objects.filter(statut="en_attente", prochaine_tentative__lte=timezone.now())
+            .order_by("prochaine_tentative", "id")[:50]
+        )),
+        ("inscription : téléphone déjà utilisé", User.objects.filter(tel="0600000000")),
+    ]
+
+
+def parcours_complets(plan, vendor):
+    """Lignes du plan qui lisent une table entière (hors petites tables de jointure)."""
+    lignes = []
+    for ligne in plan.splitlines():
+        if vendor == "postgresql" and "Seq Scan" in ligne:
+            lignes.append(ligne.strip())
+        elif vendor == "sqlite" and "SCAN " in ligne and "USING" not in ligne and "SUBQUERY" not in ligne:
+            lignes.append(ligne.strip())
+    return lignes
+
+
+class Command(BaseCommand):
+    help = (
+        "Exécute EXPLAIN sur les requêtes clés du site et signale celles qui parcourent "
+        "une table entière. Sous PostgreSQL, lancer ANALYZE au préalable : sur une petite "
+        "table, un Seq Scan reste le meilleur plan."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--plans', action='store_true', help="Affiche le plan complet de chaque requête.")
+        parser.add_argument('--echec', action='store_true', help="Code de sortie non nul si un parcours complet est trouvé.")
+
+    def handle(self, *args, **options):
+        vendor = connection.vendor
+        if vendor not in ("sqlite", "postgresql"):
+            raise CommandError(f"Base « {vendor} » non prise en charge (SQLite ou PostgreSQL).")
+
+        alertes = 0
+        for nom, queryset in requetes_cles():
+            plan = queryset.explain()
+            scans = parcours_complets(plan, vendor)
+            if scans:
+                alertes += 1
+                self.stdout.write(self.style.WARNING(f"PARCOURS COMPLET  {nom}"))
+                for ligne in scans:
+                    self.stdout.write(f"    {ligne}")
+            else:
+                self.stdout.write(self.style.SUCCESS(f"index            {nom}"))
+            if options['plans']:
+                self.stdout.write("\n".join(f"    | {ligne}" for ligne in plan.splitlines()))
+
+        self.stdout.write(f"{alertes} requête(s) en parcours complet.")
+        if alertes and options['echec']:
+            raise CommandError("Des requêtes clés parcourent une table entière.")
@@ -0,0 +1,51 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from Appli.import_reservations import ImportReservations, LECTEURS, TAILLE_LOT
+from Appli.notification.email import notifier_import_reservations
+
+
+class Command(BaseCommand):
+    help = (
+        "Importe des réservations (packs jour et complets, avec leurs options) depuis un fichier "
+        "JSONL ou CSV, par paquets insérés en bulk_create ; les e-mails sont mis en file à la fin."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('fichier', help='Fichier .jsonl ou .csv (UTF-8).')
+        parser.add_argument('--format', choices=sorted(LECTEURS), help='Par défaut : extension du fichier.')
+        parser.add_argument('--taille-lot', type=int, default=TAILLE_LOT, help='Réservations par transaction.')
+        parser.add_argument('--sans-notification', action='store_true', help="N'envoie aucun e-mail.")
+        parser.add_argument(
+            '--source', default='',
+            help="Agence d'origine : ses références déjà importées sont rejetées (par défaut : nom du fichier).",
+        )
+
+    def handle(self, *args, **options):
+        fichier = options['fichier']
+        format_fichier = options['format'] or fichier.rsplit('.', 1)[-1].lower()
+        if format_fichier not in LECTEURS:
+            raise CommandError("Format inconnu : utilisez --format jsonl ou --format csv.")
+
+        source = options['source'] or os.path.basename(fichier)
+        importeur = ImportReservations(taille_lot=max(1, options['taille_lot']), source=source)
+        debut = time.perf_counter()
+        try:
+            with open(fichier, encoding='utf-8-sig', newline='') as lignes:
+                rapport = importeur.importer(LECTEURS[format_fichier](lignes))
+        except (OSError, UnicodeDecodeError) as exc:
+            raise CommandError(f"Fichier illisible : {exc}")
+        duree = time.perf_counter() - debut
+
+        for erreur in rapport['erreurs']:
+            self.stderr.write(f"Ligne {erreur['ligne']} {erreur['reference']} : {erreur['erreurs']}")
+        if not options['sans_notification']:
+            notifier_import_reservations(importeur, source=source)
+
+        self.stdout.write(
+            f"{rapport['reservations']} réservation(s) et {rapport['options']} option(s) importée(s), "
+            f"{len(rapport['erreurs'])} rejet(s), {rapport['reservations'] / max(duree, 1e-6):.0f} réservations/s."
+        )
+        self.stdout.write(self.style.SUCCESS("Import terminé."))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from Appli.prix import enregistrer_taux, lire_fichier_taux, recalculer_prix
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-tarifie packs et options (prix_eur, prix_usd...) à partir de prix_mad et des taux "
+        "de change, après avoir éventuellement chargé les taux depuis un fichier JSON ou CSV."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fichier', help='Taux à charger : JSON {"EUR": "0.092"} ou CSV devise,taux.')
+
+    def handle(self, *args, **options):
+        if options['fichier']:
+            try:
+                taux = lire_fichier_taux(options['fichier'])
+            except (OSError, ValueError, KeyError, ArithmeticError) as exc:
+                raise CommandError(f"Fichier de taux illisible : {exc}")
+            enregistrer_taux(taux)
+            self.stdout.write(f"{len(taux)} taux chargé(s).")
+
+        for modele, lignes in recalculer_prix().items():
+            self.stdout.write(f"{modele} : {lignes} ligne(s) re-tarifée(s).")
+        self.stdout.write(self.style.SUCCESS("Prix recalculés."))
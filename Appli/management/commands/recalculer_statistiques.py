@@ -0,0 +1,33 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.db.models.functions import TruncDate
+
+from Appli.models import ReservationPackJour, ReservationPackComplet
+from Appli.rapports import recalculer_jours
+
+
+class Command(BaseCommand):
+    help = "Reconstruit les statistiques journalières à partir des réservations (rattrapage, import)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--debut', type=date.fromisoformat, help="AAAA-MM-JJ")
+        parser.add_argument('--fin', type=date.fromisoformat, help="AAAA-MM-JJ")
+        parser.add_argument('--taille-lot', type=int, default=31, help="Nombre de jours recalculés par transaction.")
+
+    def handle(self, *args, **options):
+        jours = set()
+        for modele in (ReservationPackJour, ReservationPackComplet):
+            queryset = modele.objects.annotate(jour=TruncDate('date_reservation'))
+            if options['debut']:
+                queryset = queryset.filter(jour__gte=options['debut'])
+            if options['fin']:
+                queryset = queryset.filter(jour__lte=options['fin'])
+            jours.update(queryset.values_list('jour', flat=True).distinct())
+
+        jours = sorted(jours)
+        taille = options['taille_lot']
+        for i in range(0, len(jours), taille):
+            recalculer_jours(jours[i:i + taille])
+
+        self.stdout.write(self.style.SUCCESS(f"{len(jours)} jour(s) recalculé(s)."))
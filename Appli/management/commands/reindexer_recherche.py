@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from Appli.recherche import MOTEURS, reindexer
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruit l'index de recherche (villes, activités, packs). À lancer après la "
+        "migration 0012 ou un import en masse ; ensuite, les signaux tiennent l'index à jour."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--taille-lot', type=int, default=500, help="Objets indexés par transaction.")
+
+    def handle(self, *args, **options):
+        if options['taille_lot'] < 1:
+            raise CommandError("--taille-lot doit être supérieur ou égal à 1.")
+        totaux = reindexer(taille_lot=options['taille_lot'])
+        for type_objet, nombre in totaux.items():
+            self.stdout.write(f"{type_objet} : {nombre} document(s).")
+        if connection.vendor not in MOTEURS:
+            # Documents reconstruits (facettes, parcours du catalogue) mais pas d'index plein texte
+            self.stdout.write(self.style.WARNING(
+                f"Aucun moteur plein texte pour « {connection.vendor} » : la recherche par mots restera vide."
+            ))
+            return
+        self.stdout.write(self.style.SUCCESS("Index de recherche reconstruit."))
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from Appli.images import traiter_lot
+
+
+class Command(BaseCommand):
+    help = "Génère les dérivés (tailles réduites, WebP) des images du catalogue mises en file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--taille-lot', type=int, default=20)
+        parser.add_argument('--max-tentatives', type=int, default=3)
+        parser.add_argument('--intervalle', type=float, default=10.0,
+                            help="Attente (s) entre deux scrutations quand la file est vide.")
+        parser.add_argument('--une-fois', action='store_true',
+                            help="Vide la file puis s'arrête (cron, tests).")
+        parser.add_argument('--rattrapage', action='store_true',
+                            help="Met d'abord en file les images existantes sans dérivés.")
+
+    def handle(self, *args, **options):
+        if options['rattrapage']:
+            from Appli.images import MODELES_AVEC_IMAGE, mettre_en_file
+            for modele in MODELES_AVEC_IMAGE:
+                mettre_en_file(modele.objects.exclude(image="").exclude(image=None).values_list('image', flat=True))
+
+        total = 0
+        try:
+            while True:
+                traitees = traiter_lot(taille_lot=options['taille_lot'], max_tentatives=options['max_tentatives'])
+                total += traitees
+                if traitees:
+                    continue
+                if options['une_fois']:
+                    break
+                time.sleep(options['intervalle'])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(f"{total} image(s) traitée(s)."))
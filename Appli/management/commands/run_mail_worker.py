@@ -0,0 +1,47 @@
+import time
+
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+
+from Appli.notification.file_envoi import envoyer_lot
+
+
+class Command(BaseCommand):
+    help = "Vide la file d'envoi des e-mails par lots, sur une connexion SMTP réutilisée."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--taille-lot', type=int, default=50)
+        parser.add_argument('--max-tentatives', type=int, default=5)
+        parser.add_argument('--delai-base', type=int, default=60,
+                            help="Délai (s) avant la première nouvelle tentative, doublé ensuite.")
+        parser.add_argument('--intervalle', type=float, default=5.0,
+                            help="Attente (s) entre deux scrutations quand la file est vide.")
+        parser.add_argument('--une-fois', action='store_true',
+                            help="Vide la file puis s'arrête (cron, tests).")
+
+    def handle(self, *args, **options):
+        connexion = get_connection(fail_silently=False)
+        total = 0
+        try:
+            while True:
+                envoyes = envoyer_lot(
+                    taille_lot=options['taille_lot'],
+                    connexion=connexion,
+                    max_tentatives=options['max_tentatives'],
+                    delai_base=options['delai_base'],
+                )
+                total += envoyes
+
+                if envoyes:
+                    continue
+                if options['une_fois']:
+                    break
+                # File vide (ou seulement des e-mails replanifiés) : on libère le relais
+                connexion.close()
+                time.sleep(options['intervalle'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            connexion.close()
+
+        self.stdout.write(self.style.SUCCESS(f"{total} e-mail(s) envoyé(s)."))
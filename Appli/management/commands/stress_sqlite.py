@@ -0,0 +1,80 @@
+import json
+import os
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from Appli.bench import reserver_en_parallele
+from Appli.disponibilites import disponibilites
+from Appli.models import PackJour
+
+# Réglages SQLite par défaut (journal en rollback, transactions différées)
+OPTIONS_ORIGINE = {'init_command': 'PRAGMA journal_mode=DELETE;'}
+
+
+class Command(BaseCommand):
+    help = (
+        "Réservations concurrentes depuis plusieurs threads sur une base SQLite "
+        "temporaire : compare les réglages d'origine au mode concurrence (WAL compris) "
+        "(erreurs « database is locked » et débit)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--par-thread', type=int, default=25, help="Réservations par thread.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("Ce test ne concerne que SQLite.")
+
+        setup_test_environment()
+        dossier = tempfile.mkdtemp(prefix='estamira-stress-')
+        # Base de test dans un fichier : la base en mémoire ne reproduit pas le verrouillage
+        connection.settings_dict['TEST'] = {**connection.settings_dict.get('TEST', {}), 'NAME': os.path.join(dossier, 'stress.sqlite3')}
+        options_projet = connection.settings_dict.get('OPTIONS', {})
+        ancienne_base = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+
+        try:
+            resultats = {}
+            for mode, options_sqlite in (
+                ('origine', OPTIONS_ORIGINE),
+                ('concurrence', {**settings.SQLITE_OPTIONS_CONCURRENCE, 'init_command': settings.SQLITE_PRAGMAS_WAL}),
+            ):
+                connections.close_all()
+                connection.settings_dict['OPTIONS'] = options_sqlite
+                resultats[mode] = self.executer(mode, options['threads'], options['par_thread'])
+        finally:
+            connections.close_all()
+            connection.settings_dict['OPTIONS'] = options_projet
+            connection.creation.destroy_test_db(ancienne_base, verbosity=0)
+            teardown_test_environment()
+
+        origine, concurrence = resultats['origine'], resultats['concurrence']
+        if origine['reservations_par_s']:
+            resultats['gain_debit'] = round(concurrence['reservations_par_s'] / origine['reservations_par_s'], 2)
+        self.stdout.write(json.dumps(resultats, indent=2, ensure_ascii=False))
+
+        if concurrence['erreurs_verrou'] or concurrence['autres_erreurs']:
+            raise CommandError("Erreurs de verrouillage en mode concurrence.")
+        if not concurrence['places_coherentes']:
+            raise CommandError("Places restantes incohérentes avec les réservations enregistrées.")
+
+    def executer(self, mode, threads, par_thread):
+        user = get_user_model().objects.create_user(
+            email=f"stress-{mode}@bench.local", password="stress", prenom="Stress", nom="Test", tel="0600000000",
+        )
+        capacite = threads * par_thread
+        pack = PackJour.objects.create(nom=f"Stress {mode}", prix_mad=100, capacite_journaliere=capacite)
+        jour = timezone.localdate()
+        connections.close_all()
+
+        resultats = reserver_en_parallele(pack, user, jour, threads=threads, par_thread=par_thread)
+
+        restantes = disponibilites(pack, jour, jour)[jour]
+        resultats['places_coherentes'] = restantes == capacite - resultats['reservations']
+        return resultats
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.6 on 2026-10-18 08:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Appli', '0005_reservation_montant_total'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatistiqueJournaliere',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jour', models.DateField()),
+                ('type_reservation', models.CharField(choices=[('jour', 'Pack 1 Jour'), ('complet', 'Pack Complet')], max_length=10)),
+                ('pack_nom', models.CharField(max_length=200)),
+                ('type_pack', models.CharField(blank=True, choices=[('AVENTURE', 'Aventure & Exploration'), ('LUXE', 'Séjour Luxe & Exclusif'), ('IMMERSION', 'Immersion Culturelle & Tradition'), ('DETENTE', 'Détente & Bien-être'), ('SUR_MESURE', 'Pack Sur Mesure')], default='', max_length=20)),
+                ('devise', models.CharField(choices=[('MAD', 'Dirham marocain'), ('EUR', 'Euro'), ('USD', 'Dollar américain')], max_length=10)),
+                ('nb_reservations', models.PositiveIntegerField(default=0)),
+                ('nb_personnes', models.PositiveIntegerField(default=0)),
+                ('chiffre_affaires', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('pack_complet', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='Appli.packcomplet')),
+                ('pack_jour', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='Appli.packjour')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['jour'], name='stat_jour_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StatistiqueVilleJournaliere',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jour', models.DateField()),
+                ('devise', models.CharField(choices=[('MAD', 'Dirham marocain'), ('EUR', 'Euro'), ('USD', 'Dollar américain')], max_length=10)),
+                ('nb_reservations', models.PositiveIntegerField(default=0)),
+                ('nb_personnes', models.PositiveIntegerField(default=0)),
+                ('chiffre_affaires', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('ville', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='statistiques', to='Appli.ville')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['jour'], name='stat_ville_jour_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.6 on 2026-10-18 08:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Appli', '0006_statistiques'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='packcomplet',
+            name='capacite_journaliere',
+            field=models.PositiveIntegerField(blank=True, help_text='Places disponibles par jour de séjour (vide : illimité).', null=True),
+        ),
+        migrations.AddField(
+            model_name='packjour',
+            name='capacite_journaliere',
+            field=models.PositiveIntegerField(blank=True, help_text='Places disponibles par jour (vide : illimité).', null=True),
+        ),
+        migrations.CreateModel(
+            name='Disponibilite',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('places_restantes', models.IntegerField()),
+                ('pack_complet', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='disponibilites', to='Appli.packcomplet')),
+                ('pack_jour', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='disponibilites', to='Appli.packjour')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('pack_jour', 'date'), name='disponibilite_pack_jour_date_uniq'), models.UniqueConstraint(fields=('pack_complet', 'date'), name='disponibilite_pack_complet_date_uniq'), models.CheckConstraint(condition=models.Q(('places_restantes__gte', 0)), name='disponibilite_places_positives')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-18 08:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Appli', '0007_disponibilites'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='packcomplet',
+            name='version_disponibilite',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='packjour',
+            name='version_disponibilite',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
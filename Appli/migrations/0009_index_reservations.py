@@ -0,0 +1,43 @@
+# Generated by Django 5.2.6 on 2026-10-18 08:37
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Appli', '0008_version_disponibilite'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reservationpackcomplet',
+            index=models.Index(fields=['user', '-date_reservation'], name='resa_complet_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservationpackcomplet',
+            index=models.Index(condition=models.Q(('statut', 'annulé'), _negated=True), fields=['pack', 'date_debut', 'date_fin'], name='resa_complet_pack_actif_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservationpackcomplet',
+            index=models.Index(fields=['statut', '-date_reservation'], name='resa_complet_statut_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservationpackcomplet',
+            index=models.Index(fields=['-date_reservation'], name='resa_complet_date_resa_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservationpackjour',
+            index=models.Index(fields=['user', '-date_reservation'], name='resa_jour_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservationpackjour',
+            index=models.Index(fields=['pack', 'date'], name='resa_jour_pack_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservationpackjour',
+            index=models.Index(fields=['-date_reservation'], name='resa_jour_date_resa_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.6 on 2026-10-18 08:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Appli', '0009_index_reservations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TauxChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('devise', models.CharField(max_length=10, unique=True)),
+                ('taux', models.DecimalField(decimal_places=6, max_digits=12)),
+                ('date_maj', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
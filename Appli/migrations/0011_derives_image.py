@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-18 08:46
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Appli', '0010_taux_change'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DerivesImage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original', models.CharField(max_length=255, unique=True)),
+                ('statut', models.CharField(choices=[('en_attente', 'En attente'), ('pret', 'Dérivés générés'), ('echec', 'Échec')], default='en_attente', max_length=20)),
+                ('empreinte', models.CharField(blank=True, default='', max_length=16)),
+                ('derives', models.JSONField(blank=True, default=list)),
+                ('tentatives', models.PositiveIntegerField(default=0)),
+                ('derniere_erreur', models.TextField(blank=True, default='')),
+                ('date_creation', models.DateTimeField(default=django.utils.timezone.now)),
+                ('date_traitement', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['statut', 'date_creation'], name='image_a_traiter_idx')],
+            },
+        ),
+    ]
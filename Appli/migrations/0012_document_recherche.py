@@ -0,0 +1,75 @@
+# Generated by Django 5.2.6 on 2026-10-18 08:57
+
+from django.db import migrations, models
+
+# Index plein texte propre au moteur (voir Appli/recherche.py). Le texte est
+# déjà normalisé en Python : le tokenizer / la configuration « simple » se
+# contentent de découper les mots.
+
+SQLITE_CREER = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS appli_recherche_fts USING fts5("
+    "titre_index, contenu_index, tokenize = 'unicode61 remove_diacritics 2')"
+)
+SQLITE_SUPPRIMER = "DROP TABLE IF EXISTS appli_recherche_fts"
+
+POSTGRES_CREER = [
+    'ALTER TABLE "Appli_documentrecherche" ADD COLUMN vecteur tsvector GENERATED ALWAYS AS ('
+    "setweight(to_tsvector('simple'::regconfig, titre_index), 'A') || "
+    "setweight(to_tsvector('simple'::regconfig, contenu_index), 'B')) STORED",
+    'CREATE INDEX recherche_vecteur_idx ON "Appli_documentrecherche" USING gin (vecteur)',
+]
+POSTGRES_SUPPRIMER = [
+    'DROP INDEX IF EXISTS recherche_vecteur_idx',
+    'ALTER TABLE "Appli_documentrecherche" DROP COLUMN IF EXISTS vecteur',
+]
+
+
+def creer_index_plein_texte(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        schema_editor.execute(SQLITE_CREER)
+    elif vendor == "postgresql":
+        for sql in POSTGRES_CREER:
+            schema_editor.execute(sql)
+
+
+def supprimer_index_plein_texte(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        schema_editor.execute(SQLITE_SUPPRIMER)
+    elif vendor == "postgresql":
+        for sql in POSTGRES_SUPPRIMER:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Appli', '0011_derives_image'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentRecherche',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type_objet', models.CharField(choices=[('ville', 'Ville'), ('activite_jour', 'Activité (pack 1 jour)'), ('pack_jour', 'Pack 1 Jour'), ('activite_complet', 'Activité (pack complet)'), ('pack_complet', 'Pack Complet')], max_length=20)),
+                ('objet_id', models.PositiveBigIntegerField()),
+                ('titre', models.CharField(max_length=200)),
+                ('resume', models.CharField(blank=True, default='', max_length=300)),
+                ('url', models.CharField(blank=True, default='', max_length=200)),
+                ('titre_index', models.TextField(blank=True, default='')),
+                ('contenu_index', models.TextField(blank=True, default='')),
+                ('type_pack', models.CharField(blank=True, choices=[('AVENTURE', 'Aventure & Exploration'), ('LUXE', 'Séjour Luxe & Exclusif'), ('IMMERSION', 'Immersion Culturelle & Tradition'), ('DETENTE', 'Détente & Bien-être'), ('SUR_MESURE', 'Pack Sur Mesure')], default='', max_length=20)),
+                ('duree_jours', models.PositiveIntegerField(blank=True, null=True)),
+                ('prix_mad', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('tranche_prix', models.CharField(blank=True, default='', max_length=20)),
+                ('villes', models.ManyToManyField(blank=True, related_name='+', to='Appli.ville')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['type_pack'], name='recherche_type_pack_idx'), models.Index(fields=['duree_jours'], name='recherche_duree_idx'), models.Index(fields=['tranche_prix'], name='recherche_tranche_prix_idx')],
+                'constraints': [models.UniqueConstraint(fields=('type_objet', 'objet_id'), name='document_recherche_objet_unique')],
+            },
+        ),
+        migrations.RunPython(creer_index_plein_texte, supprimer_index_plein_texte),
+    ]
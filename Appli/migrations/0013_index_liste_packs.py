@@ -0,0 +1,21 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Appli', '0012_document_recherche'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='packcomplet',
+            index=models.Index(fields=['nom', 'id'], name='pack_complet_nom_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='packjour',
+            index=models.Index(fields=['nom', 'id'], name='pack_jour_nom_id_idx'),
+        ),
+    ]
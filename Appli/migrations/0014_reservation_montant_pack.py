@@ -0,0 +1,45 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:02
+
+from django.db import migrations, models
+
+
+def prix(objet, devise):
+    return {
+        "MAD": objet.prix_mad,
+        "EUR": objet.prix_eur,
+        "USD": objet.prix_usd,
+    }.get(devise, objet.prix_mad)
+
+
+def calculer_montants_pack(apps, schema_editor):
+    # Part du pack déduite du total stocké : les totaux existants restent inchangés
+    for nom_modele in ('ReservationPackJour', 'ReservationPackComplet'):
+        modele = apps.get_model('Appli', nom_modele)
+        reservations = []
+        for reservation in modele.objects.prefetch_related('options').iterator(chunk_size=500):
+            reservation.montant_pack = reservation.montant_total - sum(
+                (prix(option, reservation.devise) * option.quantite for option in reservation.options.all()), 0
+            )
+            reservations.append(reservation)
+        modele.objects.bulk_update(reservations, ['montant_pack'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Appli', '0013_index_liste_packs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reservationpackcomplet',
+            name='montant_pack',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='reservationpackjour',
+            name='montant_pack',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12),
+        ),
+        migrations.RunPython(calculer_montants_pack, migrations.RunPython.noop),
+    ]
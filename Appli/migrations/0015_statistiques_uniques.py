@@ -0,0 +1,25 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Appli', '0014_reservation_montant_pack'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='statistiquejournaliere',
+            constraint=models.UniqueConstraint(condition=models.Q(('type_reservation', 'jour')), fields=('jour', 'pack_jour', 'devise'), name='stat_jour_pack_jour_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='statistiquejournaliere',
+            constraint=models.UniqueConstraint(condition=models.Q(('type_reservation', 'complet')), fields=('jour', 'pack_complet', 'devise'), name='stat_jour_pack_complet_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='statistiquevillejournaliere',
+            constraint=models.UniqueConstraint(fields=('jour', 'ville', 'devise'), name='stat_ville_jour_unique'),
+        ),
+    ]
@@ -0,0 +1,78 @@
+from django.db import migrations
+
+# Table FTS5 reconstruite (voir MoteurSQLite dans Appli/recherche.py) :
+# - rowid = (rang du type × 2²⁴ + longueur indexée) × 2³² + id du document,
+#   pour que FTS5 parcoure les correspondances dans l'ordre villes, packs,
+#   activités, chaque type du plus court au plus long document ;
+# - colonne filtres_index : jetons des facettes (« pack_aventure »,
+#   « prix_1500_5000 », « ville_3 »…), d'où tokenchars '_' ;
+# - index de préfixes de 2 à 6 caractères pour le terme en cours de saisie.
+# Les clés et jetons calculés ici sont ceux de MoteurSQLite.cle() et
+# MoteurSQLite.jetons_filtres(). Sans effet sous PostgreSQL.
+
+SQLITE_CREER = (
+    "CREATE VIRTUAL TABLE appli_recherche_fts USING fts5("
+    "titre_index, contenu_index, filtres_index, "
+    "tokenize = \"unicode61 remove_diacritics 2 tokenchars '_'\", prefix = '2 3 4 5 6')"
+)
+SQLITE_REMPLIR = """
+INSERT INTO appli_recherche_fts (rowid, titre_index, contenu_index, filtres_index)
+SELECT
+    (
+        CASE d.type_objet
+            WHEN 'ville' THEN 0 WHEN 'pack_complet' THEN 1 WHEN 'pack_jour' THEN 2
+            WHEN 'activite_complet' THEN 3 ELSE 4
+        END * 16777216
+        + min(length(d.titre_index) + length(d.contenu_index), 16777215)
+    ) * 4294967296 + d.id,
+    d.titre_index,
+    d.contenu_index,
+    'type_' || d.type_objet
+    || CASE WHEN d.type_pack != '' THEN ' pack_' || lower(d.type_pack) ELSE '' END
+    || CASE WHEN d.duree_jours IS NOT NULL THEN ' duree_' || d.duree_jours ELSE '' END
+    || CASE WHEN d.tranche_prix != '' THEN ' prix_' || replace(replace(d.tranche_prix, '-', '_'), '+', '_') ELSE '' END
+    || ifnull((
+        SELECT ' ' || group_concat('ville_' || ville_id, ' ')
+        FROM (
+            SELECT ville_id FROM "Appli_documentrecherche_villes"
+            WHERE documentrecherche_id = d.id ORDER BY ville_id
+        )
+    ), '')
+FROM "Appli_documentrecherche" d
+"""
+
+ANCIENNE_CREER = (
+    "CREATE VIRTUAL TABLE appli_recherche_fts USING fts5("
+    "titre_index, contenu_index, tokenize = 'unicode61 remove_diacritics 2')"
+)
+ANCIENNE_REMPLIR = (
+    "INSERT INTO appli_recherche_fts (rowid, titre_index, contenu_index) "
+    'SELECT id, titre_index, contenu_index FROM "Appli_documentrecherche"'
+)
+
+
+def _reconstruire(schema_editor, creer, remplir):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS appli_recherche_fts")
+    schema_editor.execute(creer)
+    schema_editor.execute(remplir)
+
+
+def reconstruire_index(apps, schema_editor):
+    _reconstruire(schema_editor, SQLITE_CREER, SQLITE_REMPLIR)
+
+
+def restaurer_index(apps, schema_editor):
+    _reconstruire(schema_editor, ANCIENNE_CREER, ANCIENNE_REMPLIR)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Appli', '0015_statistiques_uniques'),
+    ]
+
+    operations = [
+        migrations.RunPython(reconstruire_index, restaurer_index),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Appli', '0016_recherche_fts_facettes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reservationpackcomplet',
+            name='reference_import',
+            field=models.CharField(blank=True, default='', editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='reservationpackcomplet',
+            name='source_import',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='reservationpackjour',
+            name='reference_import',
+            field=models.CharField(blank=True, default='', editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='reservationpackjour',
+            name='source_import',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddConstraint(
+            model_name='reservationpackcomplet',
+            constraint=models.UniqueConstraint(condition=models.Q(('reference_import', ''), _negated=True), fields=('source_import', 'reference_import'), name='resa_complet_import_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='reservationpackjour',
+            constraint=models.UniqueConstraint(condition=models.Q(('reference_import', ''), _negated=True), fields=('source_import', 'reference_import'), name='resa_jour_import_uniq'),
+        ),
+    ]
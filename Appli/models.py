@@ -1,8 +1,15 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, When, F, Sum, Value, OuterRef, Subquery, DecimalField
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.db.models.functions import Coalesce
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from datetime import datetime, timedelta
 
+from .signals import statuts_modifies, totaux_modifies
+from .prix import deriver_prix, expression_prix, prix_par_devise
+
 User = get_user_model()
 
 # -----------------------------
@@ -38,9 +45,257 @@ STATUT = [
     ('validée', 'Validée'),
 ]
 
+TYPE_RESERVATION_CHOICES = [
+    ('jour', 'Pack 1 Jour'),
+    ('complet', 'Pack Complet'),
+]
+
+STATUT_EMAIL = [
+    ('en_attente', 'En attente'),
+    ('envoye', 'Envoyé'),
+    ('echec', 'Échec définitif'),
+]
+
+TYPE_DOCUMENT_CHOICES = [
+    ('ville', 'Ville'),
+    ('activite_jour', 'Activité (pack 1 jour)'),
+    ('pack_jour', 'Pack 1 Jour'),
+    ('activite_complet', 'Activité (pack complet)'),
+    ('pack_complet', 'Pack Complet'),
+]
+
+STATUT_IMAGE = [
+    ('en_attente', 'En attente'),
+    ('pret', 'Dérivés générés'),
+    ('echec', 'Échec'),
+]
+
 def default_end_date():
     return datetime.now().date() + timedelta(days=3)
 
+# -----------------------------
+# SUIVI DES CHAMPS
+# -----------------------------
+
+INCONNU = object()
+
+
+class ChampsSuivisMixin:
+    """
+    Mémorise, au chargement depuis la base, la valeur des champs listés dans
+    `champs_suivis` afin de détecter un changement sans relire la base.
+    """
+    champs_suivis = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._memoriser_valeurs_initiales()
+        return instance
+
+    def _memoriser_valeurs_initiales(self):
+        differes = self.get_deferred_fields()
+        self._valeurs_initiales = {
+            champ: getattr(self, self._meta.get_field(champ).attname)
+            for champ in self.champs_suivis
+            if self._meta.get_field(champ).attname not in differes
+        }
+
+    def valeur_initiale(self, champ):
+        """Valeur chargée depuis la base, ou INCONNU si elle n'a pas été mémorisée."""
+        return getattr(self, '_valeurs_initiales', {}).get(champ, INCONNU)
+
+    def champ_a_change(self, champ):
+        """True/False si la valeur initiale est connue, None sinon."""
+        initiale = self.valeur_initiale(champ)
+        if initiale is INCONNU:
+            return None
+        return initiale != getattr(self, self._meta.get_field(champ).attname)
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._memoriser_valeurs_initiales()
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._memoriser_valeurs_initiales()
+
+
+# -----------------------------
+# EXPRESSIONS SQL DE PRIX
+# -----------------------------
+
+def prix_selon_devise(prefixe="", devise="devise"):
+    """
+    Expression SQL équivalente à get_prix_par_devise : choisit la colonne prix_*
+    (préfixée, ex. 'pack__') selon la devise de la ligne, MAD par défaut.
+    """
+    return Case(
+        *[
+            When(**{devise: code}, then=expression_prix(code, prefixe))
+            for code, _ in MONNAIE_CHOICES
+            if code != "MAD"
+        ],
+        default=F(f"{prefixe}prix_mad"),
+    )
+
+
+def total_options(champ_reservation, devise=None):
+    """
+    Sous-requête : somme prix × quantité des options d'une réservation, dans la
+    devise de la réservation (ou dans `devise`). `champ_reservation` :
+    'reservation_jour' ou 'reservation_complet'.
+    """
+    if devise is None:
+        prix = prix_selon_devise(devise=f"{champ_reservation}__devise")
+    else:
+        prix = expression_prix(devise)
+    options = (
+        OptionReservation.objects
+        .filter(**{champ_reservation: OuterRef("pk")})
+        .values(champ_reservation)
+        .annotate(total=Sum(prix * F("quantite")))
+        .values("total")
+    )
+    return Coalesce(
+        Subquery(options, output_field=DecimalField(max_digits=12, decimal_places=2)),
+        Value(0, output_field=DecimalField(max_digits=12, decimal_places=2)),
+    )
+
+
+class PrixMixin:
+    """
+    Prix de base en dirhams (prix_mad) ; les colonnes des autres devises sont
+    recalculées à l'enregistrement pour chaque devise ayant un taux de change
+    (voir Appli/prix.py).
+    """
+
+    def get_prix_par_devise(self, devise):
+        return prix_par_devise(self, devise)
+
+    def prix_a_deriver(self):
+        return True
+
+    def save(self, *args, **kwargs):
+        if self.prix_a_deriver():
+            deriver_prix(self)
+        super().save(*args, **kwargs)
+
+
+class VersionDisponibiliteMixin:
+    """
+    `version_disponibilite` n'est modifiée que par UPDATE (voir disponibilites.py) :
+    une sauvegarde classique du pack (admin) n'écrase pas la valeur en base.
+    """
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                champ.name for champ in self._meta.concrete_fields
+                if not champ.primary_key and champ.name != 'version_disponibilite'
+            ]
+        super().save(*args, **kwargs)
+
+
+class ReservationQuerySet(models.QuerySet):
+
+    def update(self, **kwargs):
+        """
+        Mise à jour en masse. Si `statut` change, les réservations concernées
+        sont relevées avant la mise à jour et signalées en un seul lot
+        (signal `statuts_modifies`), pour que les actions admin notifient
+        toujours les clients.
+        """
+        if 'statut' not in kwargs:
+            return super().update(**kwargs)
+
+        # Les receveurs (places, statistiques) peuvent échouer : tout est annulé ensemble
+        with transaction.atomic(using=self.db):
+            anciens_statuts = dict(self.exclude(statut=kwargs['statut']).values_list('pk', 'statut'))
+            lignes = super().update(**kwargs)
+            if anciens_statuts:
+                statuts_modifies.send(sender=self.model, pks=list(anciens_statuts), anciens_statuts=anciens_statuts)
+        return lignes
+
+    def with_totals(self):
+        """Annote `total_calcule` (pack × personnes + options) calculé en SQL."""
+        return self.annotate(
+            total_calcule=prix_selon_devise("pack__") * F("nb_personne") + total_options(self.model.champ_options)
+        )
+
+    def recalculer_totaux(self):
+        """
+        Recalcule et enregistre montant_total des réservations en un seul
+        UPDATE : montant du pack stocké (prix au moment de la réservation) +
+        options. Un changement de tarif du pack ne modifie pas les totaux existants.
+        """
+        return self.update(montant_total=F("montant_pack") + total_options(self.model.champ_options))
+
+
+class PlacesMixin:
+    """
+    Réserve les places du pack (index Disponibilite) dans la même transaction
+    que l'enregistrement de la réservation ; un changement de pack, de dates,
+    de nombre de personnes ou une annulation ajuste les places.
+    La suppression libère les places (signal post_delete, voir disponibilites.py).
+    """
+
+    def save(self, *args, **kwargs):
+        from .disponibilites import ajuster_places
+
+        with transaction.atomic(using=kwargs.get('using')):
+            ajuster_places(self)
+            super().save(*args, **kwargs)
+
+
+class MontantTotalMixin:
+    """
+    Tient à jour les champs `montant_pack` (pack × personnes) et
+    `montant_total` (+ options) d'une réservation : recalculés à la création
+    et quand le pack, la devise ou le nombre de personnes change ; les options
+    mettent à jour le total via leurs signaux, à partir de `montant_pack`.
+    """
+    champs_montant = ('pack', 'devise', 'nb_personne')
+
+    def calculer_montant_pack(self):
+        return self.pack.get_prix_par_devise(self.devise) * self.nb_personne
+
+    def calculer_montant_total(self):
+        total = self.calculer_montant_pack()
+        if self.pk:
+            # Devise prise sur l'instance : elle peut différer de celle encore en base
+            total += OptionReservation.objects.filter(**{self.champ_options: self.pk}).aggregate(
+                total=Coalesce(
+                    Sum(expression_prix(self.devise) * F("quantite")),
+                    Value(0, output_field=DecimalField(max_digits=12, decimal_places=2)),
+                )
+            )["total"]
+        return total
+
+    def save(self, *args, **kwargs):
+        if self.pk is None or any(self.champ_a_change(champ) is not False for champ in self.champs_montant):
+            self.montant_pack = self.calculer_montant_pack()
+            self.montant_total = self.calculer_montant_total()
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'montant_pack', 'montant_total'}
+        super().save(*args, **kwargs)
+
+# -----------------------------
+# TAUX DE CHANGE
+# -----------------------------
+# 1 MAD = taux devise. Les prix des packs et options sont saisis en dirhams et
+# convertis avec ces taux (voir Appli/prix.py).
+
+class TauxChange(models.Model):
+    devise = models.CharField(max_length=10, unique=True)
+    taux = models.DecimalField(max_digits=12, decimal_places=6)
+    date_maj = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"1 MAD = {self.taux} {self.devise}"
+
+
 # -----------------------------
 # VILLE
 # -----------------------------
@@ -71,7 +326,7 @@ class ActiviteJour(models.Model):
 # PACK JOUR
 # -----------------------------
 
-class PackJour(models.Model):
+class PackJour(PrixMixin, VersionDisponibiliteMixin, ChampsSuivisMixin, models.Model):
     nom = models.CharField(max_length=200)
     description = models.TextField(blank=True, null=True)
 
@@ -79,15 +334,23 @@ class PackJour(models.Model):
     prix_eur = models.DecimalField(max_digits=8, decimal_places=2, default=0.0)
     prix_usd = models.DecimalField(max_digits=8, decimal_places=2, default=0.0)
 
+    capacite_journaliere = models.PositiveIntegerField(
+        blank=True, null=True,
+        help_text="Places disponibles par jour (vide : illimité).",
+    )
+    # Incrémenté à chaque variation des places : sert d'ETag au calendrier
+    version_disponibilite = models.PositiveIntegerField(default=0, editable=False)
+
     activites = models.ManyToManyField(ActiviteJour, related_name="packs_jour")
     image = models.ImageField(upload_to='img_packs_jour/', blank=True, null=True)
 
-    def get_prix_par_devise(self, devise):
-        return {
-            "MAD": self.prix_mad,
-            "EUR": self.prix_eur,
-            "USD": self.prix_usd,
-        }.get(devise, self.prix_mad)
+    champs_suivis = ('capacite_journaliere', 'nom')
+
+    class Meta:
+        indexes = [
+            # Liste paginée par curseur sur (nom, id)
+            models.Index(fields=['nom', 'id'], name='pack_jour_nom_id_idx'),
+        ]
 
     def __str__(self):
         return self.nom
@@ -98,19 +361,46 @@ class PackJour(models.Model):
 # -----------------------------
 
 def default_pack_jour():
-    pack = PackJour.objects.first()
-    if pack:
-        return pack.id
-    return None  # ou lève une exception personnalisée si tu veux forcer la création
+    # Résolu depuis le cache du catalogue : aucune requête par instance
+    from .catalogue import pack_par_defaut
+    return pack_par_defaut(PackJour)
 
 
-class ReservationPackJour(models.Model):
+class ReservationPackJour(PlacesMixin, MontantTotalMixin, ChampsSuivisMixin, models.Model):
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
     pack = models.ForeignKey(PackJour, on_delete=models.CASCADE, default=default_pack_jour)
     nb_personne = models.PositiveIntegerField(default=1)
     devise = models.CharField(max_length=10, choices=MONNAIE_CHOICES, default="MAD")
+    # Pack × personnes au tarif du jour de la réservation, hors options
+    montant_pack = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False)
+    montant_total = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False)
     date = models.DateField(default=datetime.now)
     date_reservation = models.DateTimeField(default=timezone.now)
+    # Import en lot : agence (ou compte staff) et sa référence, uniques ensemble (voir import_reservations.py)
+    source_import = models.CharField(max_length=255, blank=True, default="", editable=False)
+    reference_import = models.CharField(max_length=100, blank=True, default="", editable=False)
+
+    champs_suivis = ('pack', 'devise', 'nb_personne', 'date_reservation', 'date', 'montant_total')
+    champ_options = 'reservation_jour'
+
+    objects = ReservationQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Chronologie d'un client (mon_activite)
+            models.Index(fields=['user', '-date_reservation'], name='resa_jour_user_date_idx'),
+            # Places occupées d'un pack à une date
+            models.Index(fields=['pack', 'date'], name='resa_jour_pack_date_idx'),
+            # Liste admin, recalcul des statistiques d'un jour
+            models.Index(fields=['-date_reservation'], name='resa_jour_date_resa_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['source_import', 'reference_import'],
+                condition=~models.Q(reference_import=''),
+                name='resa_jour_import_uniq',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.pack.nom} - {self.date}"
@@ -135,12 +425,10 @@ class ActiviteComplet(models.Model):
 # -----------------------------
 
 def default_pack_complet():
-    pack = PackComplet.objects.first()
-    if pack:
-        return pack.id
-    return None
+    from .catalogue import pack_par_defaut
+    return pack_par_defaut(PackComplet)
 
-class PackComplet(models.Model):
+class PackComplet(PrixMixin, VersionDisponibiliteMixin, ChampsSuivisMixin, models.Model):
     nom = models.CharField(max_length=200)
     type_pack = models.CharField(max_length=20, choices=TYPE_PACK_CHOICES, default='SUR_MESURE')
     duree_jours = models.PositiveIntegerField(default=3)
@@ -150,15 +438,23 @@ class PackComplet(models.Model):
     prix_eur = models.DecimalField(max_digits=10, decimal_places=2, default=0.0)
     prix_usd = models.DecimalField(max_digits=10, decimal_places=2, default=0.0)
 
+    capacite_journaliere = models.PositiveIntegerField(
+        blank=True, null=True,
+        help_text="Places disponibles par jour de séjour (vide : illimité).",
+    )
+    # Incrémenté à chaque variation des places : sert d'ETag au calendrier
+    version_disponibilite = models.PositiveIntegerField(default=0, editable=False)
+
     description = models.TextField(blank=True, null=True)
     image = models.ImageField(upload_to='img_packs_complet/', blank=True, null=True)
 
-    def get_prix_par_devise(self, devise):
-        return {
-            "MAD": self.prix_mad,
-            "EUR": self.prix_eur,
-            "USD": self.prix_usd,
-        }.get(devise, self.prix_mad)
+    champs_suivis = ('capacite_journaliere', 'nom', 'type_pack')
+
+    class Meta:
+        indexes = [
+            # Liste paginée par curseur sur (nom, id)
+            models.Index(fields=['nom', 'id'], name='pack_complet_nom_id_idx'),
+        ]
 
     def __str__(self):
         return self.nom
@@ -168,17 +464,50 @@ class PackComplet(models.Model):
 # RÉSERVATION COMPLET
 # -----------------------------
 
-class ReservationPackComplet(models.Model):
+class ReservationPackComplet(PlacesMixin, MontantTotalMixin, ChampsSuivisMixin, models.Model):
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
     pack = models.ForeignKey(PackComplet, on_delete=models.CASCADE,default=default_pack_complet)
     nb_personne = models.PositiveIntegerField(default=1)
     devise = models.CharField(max_length=10, choices=MONNAIE_CHOICES, default="MAD")
+    # Pack × personnes au tarif du jour de la réservation, hors options
+    montant_pack = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False)
+    montant_total = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False)
     date_debut = models.DateField(default=datetime.now)
     date_fin = models.DateField(default=default_end_date)
     date_reservation = models.DateTimeField(default=timezone.now)
+    source_import = models.CharField(max_length=255, blank=True, default="", editable=False)
+    reference_import = models.CharField(max_length=100, blank=True, default="", editable=False)
 
     statut = models.CharField(max_length=20, choices=STATUT, default='demande')
 
+    champs_suivis = (
+        'statut', 'pack', 'devise', 'nb_personne', 'date_reservation', 'date_debut', 'date_fin', 'montant_total'
+    )
+    champ_options = 'reservation_complet'
+
+    objects = ReservationQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-date_reservation'], name='resa_complet_user_date_idx'),
+            # Places occupées : seules les réservations non annulées comptent
+            models.Index(
+                fields=['pack', 'date_debut', 'date_fin'],
+                condition=~models.Q(statut='annulé'),
+                name='resa_complet_pack_actif_idx',
+            ),
+            # Liste admin filtrée par statut
+            models.Index(fields=['statut', '-date_reservation'], name='resa_complet_statut_date_idx'),
+            models.Index(fields=['-date_reservation'], name='resa_complet_date_resa_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['source_import', 'reference_import'],
+                condition=~models.Q(reference_import=''),
+                name='resa_complet_import_uniq',
+            ),
+        ]
+
     def __str__(self):
         return f"{self.pack.nom} - {self.date_debut} → {self.date_fin}"
 
@@ -186,7 +515,7 @@ class ReservationPackComplet(models.Model):
 # OPTIONS
 # -----------------------------
 
-class OptionReservation(models.Model):
+class OptionReservation(PrixMixin, ChampsSuivisMixin, models.Model):
     reservation_complet = models.ForeignKey(
         ReservationPackComplet,
         on_delete=models.CASCADE,
@@ -216,13 +545,231 @@ class OptionReservation(models.Model):
 
     quantite = models.PositiveIntegerField(default=1)
 
-    def get_prix_par_devise(self, devise):
-        return {
-            "MAD": self.prix_mad,
-            "EUR": self.prix_eur,
-            "USD": self.prix_usd,
-        }.get(devise, self.prix_mad)
+    champs_suivis = ('prix_mad',)
 
     def __str__(self):
         return f"{self.nom_option} x{self.quantite}"
 
+    def prix_a_deriver(self):
+        """
+        Une option rattachée à une réservation garde le prix auquel elle a été
+        réservée : ses colonnes ne sont dérivées qu'à la création.
+        """
+        if self._state.adding:
+            return True
+        if self.reservation_jour_id is not None or self.reservation_complet_id is not None:
+            return False
+        return self.champ_a_change('prix_mad') is not False
+
+
+
+# -----------------------------
+# FILE D'ENVOI DES E-MAILS
+# -----------------------------
+
+class EmailSortant(models.Model):
+    sujet = models.CharField(max_length=255)
+    contenu_html = models.TextField()
+    destinataires = models.JSONField(default=list)
+
+    statut = models.CharField(max_length=20, choices=STATUT_EMAIL, default='en_attente')
+    tentatives = models.PositiveIntegerField(default=0)
+    prochaine_tentative = models.DateTimeField(default=timezone.now)
+    derniere_erreur = models.TextField(blank=True, default="")
+
+    date_creation = models.DateTimeField(default=timezone.now)
+    date_envoi = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['statut', 'prochaine_tentative'], name='email_a_envoyer_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.sujet} → {', '.join(self.destinataires)}"
+
+
+# -----------------------------
+# DÉRIVÉS D'IMAGES
+# -----------------------------
+# Une ligne par image originale du catalogue : créée à l'envoi de l'image,
+# traitée par `manage.py run_image_worker` (voir Appli/images.py).
+
+class DerivesImage(models.Model):
+    original = models.CharField(max_length=255, unique=True)
+    statut = models.CharField(max_length=20, choices=STATUT_IMAGE, default='en_attente')
+    empreinte = models.CharField(max_length=16, blank=True, default="")
+    # [{"largeur": 640, "format": "webp", "nom": "derives/.../photo.<empreinte>.640.webp"}, ...]
+    derives = models.JSONField(default=list, blank=True)
+
+    tentatives = models.PositiveIntegerField(default=0)
+    derniere_erreur = models.TextField(blank=True, default="")
+    date_creation = models.DateTimeField(default=timezone.now)
+    date_traitement = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['statut', 'date_creation'], name='image_a_traiter_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.original} ({self.get_statut_display()})"
+
+
+# -----------------------------
+# DISPONIBILITÉS
+# -----------------------------
+# Places restantes par pack et par jour, tenues à jour par UPDATE conditionnel
+# à chaque réservation (voir Appli/disponibilites.py). Les lignes sont créées
+# à la demande pour les packs dont la capacité est définie.
+
+class Disponibilite(models.Model):
+    pack_jour = models.ForeignKey(
+        PackJour,
+        on_delete=models.CASCADE,
+        related_name="disponibilites",
+        null=True,
+        blank=True
+    )
+    pack_complet = models.ForeignKey(
+        PackComplet,
+        on_delete=models.CASCADE,
+        related_name="disponibilites",
+        null=True,
+        blank=True
+    )
+    date = models.DateField()
+    places_restantes = models.IntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['pack_jour', 'date'], name='disponibilite_pack_jour_date_uniq'),
+            models.UniqueConstraint(fields=['pack_complet', 'date'], name='disponibilite_pack_complet_date_uniq'),
+            models.CheckConstraint(condition=models.Q(places_restantes__gte=0), name='disponibilite_places_positives'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} : {self.places_restantes} place(s)"
+
+# -----------------------------
+# STATISTIQUES JOURNALIÈRES
+# -----------------------------
+# Agrégats par jour de réservation, incrémentés à chaque enregistrement
+# (voir Appli/rapports.py). Les réservations annulées ne sont pas comptées.
+# Une seule ligne par (jour, pack, devise) et par (jour, ville, devise) :
+# les contraintes d'unicité arbitrent les créations concurrentes.
+
+class StatistiqueJournaliere(models.Model):
+    jour = models.DateField()
+    type_reservation = models.CharField(max_length=10, choices=TYPE_RESERVATION_CHOICES)
+    pack_jour = models.ForeignKey(PackJour, on_delete=models.CASCADE, null=True, blank=True)
+    pack_complet = models.ForeignKey(PackComplet, on_delete=models.CASCADE, null=True, blank=True)
+    pack_nom = models.CharField(max_length=200)
+    type_pack = models.CharField(max_length=20, choices=TYPE_PACK_CHOICES, blank=True, default="")
+    devise = models.CharField(max_length=10, choices=MONNAIE_CHOICES)
+
+    nb_reservations = models.PositiveIntegerField(default=0)
+    nb_personnes = models.PositiveIntegerField(default=0)
+    chiffre_affaires = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            # Un seul des deux packs est renseigné : NULL ne compte pas dans l'unicité
+            models.UniqueConstraint(
+                fields=['jour', 'pack_jour', 'devise'],
+                condition=models.Q(type_reservation='jour'),
+                name='stat_jour_pack_jour_unique',
+            ),
+            models.UniqueConstraint(
+                fields=['jour', 'pack_complet', 'devise'],
+                condition=models.Q(type_reservation='complet'),
+                name='stat_jour_pack_complet_unique',
+            ),
+        ]
+        indexes = [models.Index(fields=['jour'], name='stat_jour_idx')]
+
+    def __str__(self):
+        return f"{self.jour} - {self.pack_nom} ({self.devise})"
+
+
+class StatistiqueVilleJournaliere(models.Model):
+    """Une réservation compte pour chaque ville visitée par son pack."""
+    jour = models.DateField()
+    ville = models.ForeignKey(Ville, on_delete=models.CASCADE, related_name="statistiques")
+    devise = models.CharField(max_length=10, choices=MONNAIE_CHOICES)
+
+    nb_reservations = models.PositiveIntegerField(default=0)
+    nb_personnes = models.PositiveIntegerField(default=0)
+    chiffre_affaires = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['jour', 'ville', 'devise'], name='stat_ville_jour_unique'),
+        ]
+        indexes = [models.Index(fields=['jour'], name='stat_ville_jour_idx')]
+
+    def __str__(self):
+        return f"{self.jour} - {self.ville_id} ({self.devise})"
+
+# -----------------------------
+# RECHERCHE
+# -----------------------------
+# Un document par ville, activité ou pack, tenu à jour par Appli/recherche.py.
+# titre_index / contenu_index contiennent le texte normalisé (sans accents,
+# racinisé) que l'index plein texte du moteur (FTS5 ou tsvector) indexe.
+
+class DocumentRecherche(models.Model):
+    type_objet = models.CharField(max_length=20, choices=TYPE_DOCUMENT_CHOICES)
+    objet_id = models.PositiveBigIntegerField()
+
+    titre = models.CharField(max_length=200)
+    resume = models.CharField(max_length=300, blank=True, default="")
+    url = models.CharField(max_length=200, blank=True, default="")
+    titre_index = models.TextField(blank=True, default="")
+    contenu_index = models.TextField(blank=True, default="")
+
+    # Facettes
+    type_pack = models.CharField(max_length=20, choices=TYPE_PACK_CHOICES, blank=True, default="")
+    villes = models.ManyToManyField(Ville, related_name="+", blank=True)
+    duree_jours = models.PositiveIntegerField(blank=True, null=True)
+    prix_mad = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+    tranche_prix = models.CharField(max_length=20, blank=True, default="")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['type_objet', 'objet_id'], name='document_recherche_objet_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['type_pack'], name='recherche_type_pack_idx'),
+            models.Index(fields=['duree_jours'], name='recherche_duree_idx'),
+            models.Index(fields=['tranche_prix'], name='recherche_tranche_prix_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_type_objet_display()} : {self.titre}"
+
+
+# -----------------------------
+# SIGNAUX : TOTAL DES RÉSERVATIONS
+# -----------------------------
+
+@receiver(post_save, sender=OptionReservation)
+@receiver(post_delete, sender=OptionReservation)
+def recalculer_total_reservation(sender, instance, origin=None, **kwargs):
+    """
+    Une option ajoutée, modifiée ou supprimée met à jour le total stocké de sa
+    réservation (signal `totaux_modifies` avec l'ancien total). Rien à faire
+    quand les options disparaissent avec leur réservation (suppression en cascade).
+    """
+    modele_origine = origin.model if isinstance(origin, models.QuerySet) else type(origin)
+    if origin is not None and modele_origine is not OptionReservation:
+        return
+    for modele, pk in (
+        (ReservationPackJour, instance.reservation_jour_id),
+        (ReservationPackComplet, instance.reservation_complet_id),
+    ):
+        if pk:
+            reservations = modele.objects.filter(pk=pk)
+            ancien_total = reservations.values_list("montant_total", flat=True).first()
+            if ancien_total is not None and reservations.recalculer_totaux():
+                totaux_modifies.send(sender=modele, pk=pk, ancien_total=ancien_total)
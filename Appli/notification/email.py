@@ -1,12 +1,15 @@
 from django.template.loader import render_to_string
-from django.core.mail import EmailMessage
 from django.contrib.auth import get_user_model
 from django.db.models.signals import pre_save
 from django.dispatch import receiver
-from Appli.models import ReservationPackJour, ReservationPackComplet
+from Appli.models import ReservationPackComplet
+from Appli.signals import statuts_modifies
+from .file_envoi import mettre_en_file, mettre_en_file_lot
 
 User = get_user_model()
 
+# À modifier avec l'email d'Estamira si différent de contact@maisonelba.com
+ADMINS = ["contact@estamira.com"]
 
 
 # ====================================================================
@@ -17,6 +20,7 @@ def notifier_admins_reservation(reservation):
     """
     Notifie les admins d'une nouvelle réservation de Pack.
     La fonction accepte soit ReservationPackJour soit ReservationPackComplet.
+    L'e-mail est placé dans la file d'envoi (voir run_mail_worker).
     """
     subject = "Nouvelle réservation Estamira"
     
@@ -25,49 +29,78 @@ def notifier_admins_reservation(reservation):
     html_content = render_to_string("email/admin/reservation_notification_pack.html", {
         "user": reservation.user,
         "pack": reservation.pack,
-        "date_debut": reservation.date_debut,
+        # Un Pack Jour n'a qu'une date : elle sert de date de début
+        "date_debut": getattr(reservation, 'date_debut', None) or getattr(reservation, 'date', None),
         # Si c'est un Pack Jour, date_fin sera None. Le template doit s'adapter.
         "date_fin": getattr(reservation, 'date_fin', None), 
         "nb_personne": reservation.nb_personne,
-        "devise_paiement": reservation.devise_paiement,
+        "devise_paiement": reservation.devise,
         "montant_total": reservation.montant_total
     })
 
-    # À modifier avec l'email d'Estamira si différent de contact@maisonelba.com
-    admins = ["contact@estamira.com"] 
-    email = EmailMessage(subject, html_content, to=list(admins))
-    email.content_subtype = "html"
-    email.send()
+    mettre_en_file(subject, html_content, ADMINS)
 
 
 # ====================================================================
 # NOTIFICATIONS UTILISATEURS
 # ====================================================================
 
-def notifier_utilisateur_reservation(reservation):
-    """Envoie la confirmation de réservation de Pack à l'utilisateur."""
+def _message_confirmation(reservation):
     subject = "Confirmation de votre réservation Estamira"
     html_content = render_to_string("email/utilisateur/reservation_notif_user_pack.html", {
         "user": reservation.user,
         "pack": reservation.pack,
-        "date_debut": reservation.date_debut,
+        # Un Pack Jour n'a qu'une date : elle sert de date de début
+        "date_debut": getattr(reservation, 'date_debut', None) or getattr(reservation, 'date', None),
         "date_fin": getattr(reservation, 'date_fin', None), 
         "nb_personne": reservation.nb_personne,
-        "devise_paiement": reservation.devise_paiement,
+        "devise_paiement": reservation.devise,
         "montant_total": reservation.montant_total
     })
+    return subject, html_content, [reservation.user.email]
 
-    email = EmailMessage(
-        subject,
-        html_content,
-        to=[reservation.user.email]
-    )
-    email.content_subtype = "html"
-    email.send()
 
+def notifier_utilisateur_reservation(reservation):
+    """Met en file la confirmation de réservation de Pack pour l'utilisateur."""
+    mettre_en_file(*_message_confirmation(reservation))
 
-def notifier_utilisateur_changement_statut(reservation):
-    """Notifie l'utilisateur quand le statut de sa réservation change (par l'Admin)."""
+
+def _message_recapitulatif_client(user, reservations):
+    if len(reservations) == 1:
+        return _message_confirmation(reservations[0])
+    subject = "Confirmation de vos réservations Estamira"
+    html_content = render_to_string("email/utilisateur/import_reservations.html", {
+        "user": user,
+        "reservations": reservations,
+    })
+    return subject, html_content, [user.email]
+
+
+def notifier_import_reservations(importeur, source=""):
+    """
+    Notifications d'un import en lot (ImportReservations), mises en file en
+    une requête : un seul e-mail par client ayant un compte (récapitulatif de
+    ses réservations) et un seul récapitulatif pour les administrateurs, qui
+    donne le nombre de réservations et n'en détaille qu'un échantillon.
+    """
+    if not importeur.nb_reservations:
+        return []
+    messages = [_message_recapitulatif_client(user, liste) for user, liste in importeur.par_client.values()]
+    messages.append((
+        "Import de réservations Estamira",
+        render_to_string("email/admin/import_reservations.html", {
+            "nombre": importeur.nb_reservations,
+            "nb_options": importeur.nb_options,
+            "reservations": importeur.echantillon,
+            "autres": importeur.nb_reservations - len(importeur.echantillon),
+            "source": source,
+        }),
+        ADMINS,
+    ))
+    return mettre_en_file_lot(messages)
+
+
+def _message_changement_statut(reservation):
     subject = "Mise à jour de votre réservation Estamira"
     html_content = render_to_string("email/utilisateur/statut_update.html", {
         "user": reservation.user,
@@ -75,32 +108,44 @@ def notifier_utilisateur_changement_statut(reservation):
         # get_statut_display est une méthode de modèle pour obtenir le label lisible (ex: 'Demande effectuée')
         "nouveau_statut": reservation.get_statut_display(), 
     })
+    return subject, html_content, [reservation.user.email]
+
 
-    email = EmailMessage(subject, html_content, to=[reservation.user.email])
-    email.content_subtype = "html"
-    email.send()
+def notifier_utilisateur_changement_statut(reservation):
+    """Notifie l'utilisateur quand le statut de sa réservation change (par l'Admin)."""
+    if reservation.user is None:
+        return
+    mettre_en_file(*_message_changement_statut(reservation))
 
 
 # ====================================================================
 # DÉTECTEUR DE CHANGEMENT DE STATUT (Signal Django)
 # ====================================================================
 
-# CORRECTION : Le signal doit écouter les deux modèles de réservation.
+# Seule ReservationPackComplet porte un statut. Le statut chargé est mémorisé
+# sur l'instance (ChampsSuivisMixin) : la détection ne coûte aucune requête.
 
-@receiver(pre_save, sender=ReservationPackJour)
 @receiver(pre_save, sender=ReservationPackComplet)
 def detecter_changement_statut(sender, instance, **kwargs):
     """
     Détecte un changement de statut AVANT que la réservation soit sauvegardée.
     Si le statut a changé, notifie l'utilisateur.
     """
-    if instance.pk:
-        try:
-            # Récupère la version ancienne de l'objet
-            ancien = sender.objects.get(pk=instance.pk)
-        except sender.DoesNotExist:
-            return # Sort si l'objet n'existe pas encore (création)
-
-        # Vérifie la différence de statut
-        if ancien.statut != instance.statut:
-            notifier_utilisateur_changement_statut(instance)
\ No newline at end of file
+    if not instance.pk:
+        return  # Création : pas de changement de statut
+
+    change = instance.champ_a_change('statut')
+    if change is None:
+        # Instance construite à la main (pas chargée depuis la base) : on relit l'ancien statut
+        ancien = sender.objects.filter(pk=instance.pk).values_list('statut', flat=True).first()
+        change = ancien is not None and ancien != instance.statut
+
+    if change:
+        notifier_utilisateur_changement_statut(instance)
+
+
+@receiver(statuts_modifies, sender=ReservationPackComplet)
+def notifier_statuts_modifies(sender, pks, **kwargs):
+    """Notifie en un lot les clients après un queryset.update(statut=...)."""
+    reservations = sender.objects.filter(pk__in=pks, user__isnull=False).select_related('user', 'pack')
+    mettre_en_file_lot(_message_changement_statut(r) for r in reservations)
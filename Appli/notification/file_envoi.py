@@ -0,0 +1,145 @@
+from datetime import timedelta
+from smtplib import SMTPServerDisconnected
+
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection as db_connection, transaction
+from django.utils import timezone
+
+from Appli.models import EmailSortant
+
+
+# ====================================================================
+# MISE EN FILE
+# ====================================================================
+
+def mettre_en_file(sujet, contenu_html, destinataires):
+    """
+    Enregistre un e-mail HTML dans la file d'envoi.
+    L'envoi SMTP est fait plus tard par `manage.py run_mail_worker`.
+    """
+    return EmailSortant.objects.create(
+        sujet=sujet,
+        contenu_html=contenu_html,
+        destinataires=[d for d in destinataires if d],
+    )
+
+
+def mettre_en_file_lot(messages):
+    """Met en file plusieurs e-mails (sujet, contenu_html, destinataires) en une requête."""
+    return EmailSortant.objects.bulk_create([
+        EmailSortant(
+            sujet=sujet,
+            contenu_html=contenu_html,
+            destinataires=[d for d in destinataires if d],
+        )
+        for sujet, contenu_html, destinataires in messages
+    ])
+
+
+# ====================================================================
+# ENVOI PAR LOTS
+# ====================================================================
+
+def delai_avant_nouvelle_tentative(tentatives, delai_base=60):
+    """Backoff exponentiel : delai_base, 2×, 4×... secondes (plafonné à 6 h)."""
+    return timedelta(seconds=min(delai_base * 2 ** (tentatives - 1), 6 * 3600))
+
+
+# Bail posé sur les e-mails réservés par un worker : s'il s'arrête en plein lot,
+# les e-mails non envoyés redeviennent disponibles à son expiration.
+DUREE_BAIL = timedelta(minutes=10)
+
+CHAMPS_RESULTAT = ['statut', 'tentatives', 'prochaine_tentative', 'derniere_erreur', 'date_envoi']
+
+
+def reserver_lot(taille_lot, maintenant):
+    """
+    Réserve jusqu'à `taille_lot` e-mails dus en repoussant leur prochaine
+    tentative à la fin du bail, dans une transaction courte : l'envoi SMTP se
+    fait ensuite hors transaction, sans tenir de verrou d'écriture.
+    """
+    bail = maintenant + DUREE_BAIL
+    with transaction.atomic():
+        emails = EmailSortant.objects.filter(
+            statut='en_attente',
+            prochaine_tentative__lte=maintenant,
+        ).order_by('prochaine_tentative', 'id')
+        if db_connection.features.has_select_for_update_skip_locked:
+            # Plusieurs workers peuvent tourner en parallèle sans doublon
+            emails = emails.select_for_update(skip_locked=True)
+        ids = list(emails.values_list('id', flat=True)[:taille_lot])
+        if not ids:
+            return []
+        # Conditionnelle : une ligne réservée entre-temps par un autre worker porte un autre bail
+        EmailSortant.objects.filter(
+            pk__in=ids, statut='en_attente', prochaine_tentative__lte=maintenant,
+        ).update(prochaine_tentative=bail)
+    return list(EmailSortant.objects.filter(pk__in=ids, prochaine_tentative=bail).order_by('id'))
+
+
+def envoyer_lot(taille_lot=50, connexion=None, max_tentatives=5, delai_base=60):
+    """
+    Envoie jusqu'à `taille_lot` e-mails en attente sur une seule connexion SMTP.
+    Les échecs sont replanifiés avec un backoff exponentiel, puis marqués
+    en échec définitif après `max_tentatives`. Le résultat de chaque e-mail est
+    enregistré dès son envoi ; si le relais est injoignable, les e-mails
+    restants du lot sont replanifiés.
+    Retourne le nombre d'e-mails effectivement envoyés.
+    """
+    maintenant = timezone.now()
+    lot = reserver_lot(taille_lot, maintenant)
+    if not lot:
+        return 0
+
+    fermer = connexion is None
+    connexion = connexion or get_connection(fail_silently=False)
+    envoyes = 0
+    restants = list(lot)
+    try:
+        connexion.open()
+        while restants:
+            email = restants[0]
+            message = EmailMessage(
+                email.sujet,
+                email.contenu_html,
+                to=email.destinataires,
+                connection=connexion,
+            )
+            message.content_subtype = "html"
+            try:
+                message.send()
+            except SMTPServerDisconnected as exc:
+                _echec(email, exc, maintenant, max_tentatives, delai_base)
+                restants.pop(0).save(update_fields=CHAMPS_RESULTAT)
+                # Le relais a coupé la connexion : on la rouvre pour la suite du lot
+                connexion.close()
+                connexion.open()
+                continue
+            except Exception as exc:
+                _echec(email, exc, maintenant, max_tentatives, delai_base)
+            else:
+                email.statut = 'envoye'
+                email.tentatives += 1
+                email.date_envoi = timezone.now()
+                email.derniere_erreur = ""
+                envoyes += 1
+            restants.pop(0).save(update_fields=CHAMPS_RESULTAT)
+    except Exception as exc:
+        # Connexion impossible (ouverture ou reconnexion) : le reste du lot est replanifié
+        for email in restants:
+            _echec(email, exc, maintenant, max_tentatives, delai_base)
+        EmailSortant.objects.bulk_update(restants, CHAMPS_RESULTAT)
+    finally:
+        if fermer:
+            connexion.close()
+
+    return envoyes
+
+
+def _echec(email, exc, maintenant, max_tentatives, delai_base):
+    email.tentatives += 1
+    email.derniere_erreur = f"{type(exc).__name__}: {exc}"
+    if email.tentatives >= max_tentatives:
+        email.statut = 'echec'
+    else:
+        email.prochaine_tentative = maintenant + delai_avant_nouvelle_tentative(email.tentatives, delai_base)
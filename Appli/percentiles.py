@@ -0,0 +1,16 @@
+# -----------------------------
+# PERCENTILES
+# -----------------------------
+# Utilisé par le banc d'essai (bench.py) et par le profilage des requêtes
+# (profilage.py), qui n'a pas à importer le banc d'essai.
+
+
+def percentile(valeurs, p):
+    """Percentile `p` (0-100) par interpolation linéaire entre les rangs."""
+    valeurs = sorted(valeurs)
+    if not valeurs:
+        return None
+    rang = (len(valeurs) - 1) * p / 100
+    bas = int(rang)
+    haut = min(bas + 1, len(valeurs) - 1)
+    return valeurs[bas] + (valeurs[haut] - valeurs[bas]) * (rang - bas)
@@ -0,0 +1,232 @@
+import csv
+import json
+import threading
+from decimal import Decimal, ROUND_HALF_UP
+from pathlib import Path
+from time import monotonic
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Value, DecimalField
+from django.db.models.functions import Round
+from django.db.models.signals import post_save, post_delete
+
+# -----------------------------
+# MOTEUR DE PRIX MULTI-DEVISES
+# -----------------------------
+# Le prix de base est saisi en dirhams (prix_mad). Les autres devises sont
+# obtenues par la table TauxChange : les colonnes prix_eur / prix_usd en sont
+# la conversion matérialisée (utilisée par les totaux calculés en SQL) et une
+# devise sans colonne est convertie à la volée. Sans taux pour une devise, la
+# colonne saisie à la main fait foi, comme avant.
+
+DEVISE_BASE = "MAD"
+
+# Devises disposant d'une colonne de prix sur les packs et les options
+COLONNES_PRIX = {
+    "MAD": "prix_mad",
+    "EUR": "prix_eur",
+    "USD": "prix_usd",
+}
+
+CLE_VERSION_TAUX = "prix:taux:version"
+
+CENTIME = Decimal("0.01")
+
+_cache_local = {"taux": None, "version": None, "expire": 0.0}
+_verrou = threading.Lock()
+
+
+# -----------------------------
+# TAUX DE CHANGE (CACHE EN MÉMOIRE)
+# -----------------------------
+
+def _cache_partage():
+    from .catalogue import cache_catalogue
+    return cache_catalogue()
+
+
+def taux_de_change():
+    """
+    {devise: taux} (1 MAD = taux devise), servi depuis la mémoire du processus.
+    Passé TAUX_CHANGE_TTL secondes, la version partagée est relue et les taux
+    ne sont rechargés depuis la base que si elle a changé.
+    """
+    from .models import TauxChange
+
+    maintenant = monotonic()
+    with _verrou:
+        if _cache_local["taux"] is not None and maintenant < _cache_local["expire"]:
+            return _cache_local["taux"]
+
+    cache = _cache_partage()
+    cache.add(CLE_VERSION_TAUX, 1, timeout=None)
+    version = cache.get(CLE_VERSION_TAUX)
+
+    with _verrou:
+        if _cache_local["taux"] is None or version != _cache_local["version"]:
+            taux = dict(TauxChange.objects.values_list("devise", "taux"))
+            taux[DEVISE_BASE] = Decimal(1)
+            _cache_local["taux"] = taux
+            _cache_local["version"] = version
+        _cache_local["expire"] = maintenant + getattr(settings, "TAUX_CHANGE_TTL", 300)
+        return _cache_local["taux"]
+
+
+def invalider_taux():
+    """Nouvelle version des taux : tous les processus rechargent au plus tard après le TTL."""
+    cache = _cache_partage()
+    try:
+        cache.incr(CLE_VERSION_TAUX)
+    except ValueError:
+        cache.add(CLE_VERSION_TAUX, 1, timeout=None)
+    oublier_taux_locaux()
+
+
+def oublier_taux_locaux():
+    """Vide le cache du seul processus courant (relu depuis la base au prochain accès)."""
+    with _verrou:
+        _cache_local["taux"] = None
+
+
+# -----------------------------
+# CONVERSION
+# -----------------------------
+
+def convertir(montant, devise, taux=None):
+    """Montant en dirhams converti dans `devise`, arrondi au centime. None si le taux est inconnu."""
+    taux = taux_de_change() if taux is None else taux
+    if devise not in taux:
+        return None
+    return (Decimal(montant) * taux[devise]).quantize(CENTIME, rounding=ROUND_HALF_UP)
+
+
+def prix_par_devise(objet, devise, taux=None):
+    """
+    Prix de `objet` (pack ou option) dans `devise` : colonne matérialisée si
+    elle existe, sinon conversion du prix de base ; prix de base à défaut de taux.
+    """
+    colonne = COLONNES_PRIX.get(devise)
+    if colonne is not None:
+        return getattr(objet, colonne)
+    converti = convertir(objet.prix_mad, devise, taux)
+    return objet.prix_mad if converti is None else converti
+
+
+def prix_en_lot(objets, devises=None):
+    """
+    [{devise: prix}, ...] pour une liste d'objets : un seul accès aux taux
+    pour toute la page, quelle que soit sa taille.
+    """
+    from .models import MONNAIE_CHOICES
+
+    devises = devises or [code for code, _ in MONNAIE_CHOICES]
+    taux = taux_de_change()
+    return [{devise: prix_par_devise(objet, devise, taux) for devise in devises} for objet in objets]
+
+
+def deriver_prix(objet, taux=None):
+    """Recalcule les colonnes prix_* de `objet` depuis prix_mad pour les devises ayant un taux."""
+    taux = taux_de_change() if taux is None else taux
+    for devise, colonne in COLONNES_PRIX.items():
+        if devise != DEVISE_BASE and devise in taux:
+            setattr(objet, colonne, convertir(objet.prix_mad, devise, taux))
+
+
+def expression_prix(devise, prefixe=""):
+    """Expression SQL du prix dans `devise` (colonne, ou prix de base × taux)."""
+    colonne = COLONNES_PRIX.get(devise)
+    if colonne is not None:
+        return F(f"{prefixe}{colonne}")
+    taux = taux_de_change().get(devise)
+    if taux is None:
+        return F(f"{prefixe}prix_mad")
+    return Round(
+        F(f"{prefixe}prix_mad") * Value(taux, output_field=DecimalField(max_digits=12, decimal_places=6)),
+        2,
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+    )
+
+
+# -----------------------------
+# CHARGEMENT ET RE-TARIFICATION
+# -----------------------------
+
+def lire_fichier_taux(chemin):
+    """
+    Taux depuis un fichier local : JSON {"EUR": "0.092", ...} ou CSV
+    avec les colonnes devise,taux.
+    """
+    chemin = Path(chemin)
+    with chemin.open(encoding="utf-8") as fichier:
+        if chemin.suffix.lower() == ".json":
+            donnees = json.load(fichier).items()
+        else:
+            donnees = ((ligne["devise"], ligne["taux"]) for ligne in csv.DictReader(fichier))
+        return {devise.strip().upper(): Decimal(str(taux).strip()) for devise, taux in donnees}
+
+
+@transaction.atomic
+def enregistrer_taux(taux):
+    """Crée ou met à jour les taux donnés ({devise: taux})."""
+    from .models import TauxChange
+
+    for devise, valeur in taux.items():
+        if devise == DEVISE_BASE:
+            continue
+        # post_save invalide les taux des autres processus à la validation de la transaction
+        TauxChange.objects.update_or_create(devise=devise, defaults={"taux": valeur})
+    # Ce processus relit les nouveaux taux tout de suite (même transaction)
+    oublier_taux_locaux()
+
+
+def modeles_prix():
+    from .models import PackJour, PackComplet, OptionReservation
+    return (PackJour, PackComplet, OptionReservation)
+
+
+def lignes_a_retarifer(modele):
+    """Les options déjà rattachées à une réservation gardent le prix auquel elles ont été réservées."""
+    from .models import OptionReservation
+
+    queryset = modele.objects.all()
+    if modele is OptionReservation:
+        queryset = queryset.filter(reservation_jour__isnull=True, reservation_complet__isnull=True)
+    return queryset
+
+
+@transaction.atomic
+def recalculer_prix(modeles=None):
+    """
+    Re-tarifie les lignes en un UPDATE par table (prix_mad × taux, arrondi
+    au centime en SQL). Les montants des réservations déjà enregistrées et
+    leurs lignes d'options ne changent pas. Retourne {modèle: lignes mises à jour}.
+    """
+    from .catalogue import invalider_catalogue
+
+    taux = taux_de_change()
+    colonnes = {
+        colonne: Round(
+            F("prix_mad") * Value(taux[devise], output_field=DecimalField(max_digits=12, decimal_places=6)),
+            2,
+        )
+        for devise, colonne in COLONNES_PRIX.items()
+        if devise != DEVISE_BASE and devise in taux
+    }
+    resultats = {}
+    for modele in modeles or modeles_prix():
+        resultats[modele._meta.label] = lignes_a_retarifer(modele).update(**colonnes) if colonnes else 0
+    transaction.on_commit(invalider_catalogue)
+    return resultats
+
+
+# -----------------------------
+# SIGNAUX
+# -----------------------------
+
+def _taux_modifie(sender, **kwargs):
+    transaction.on_commit(invalider_taux)
+
+
+post_save.connect(_taux_modifie, sender="Appli.TauxChange", dispatch_uid="prix_taux_save")
+post_delete.connect(_taux_modifie, sender="Appli.TauxChange", dispatch_uid="prix_taux_delete")
@@ -0,0 +1,206 @@
+import logging
+import re
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import ExitStack
+from contextvars import ContextVar
+from functools import lru_cache, wraps
+
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import Template as TemplateDjango
+from django.urls import URLResolver, get_resolver
+
+from .percentiles import percentile
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------
+# PROFILAGE SQL PAR REQUÊTE (OPT-IN)
+# -----------------------------
+# Activé par PROFILAGE_SQL : nombre de requêtes, temps SQL, requêtes
+# dupliquées (empreinte du SQL paramétré) et temps de rendu des gabarits,
+# renvoyés dans l'en-tête Server-Timing et agrégés par vue pour /__perf__/.
+
+# Vues profilées : celles des URLconf du site, vues de django.contrib.auth
+# montées par authUser.urls comprises (pas l'admin ni les statiques)
+URLCONFS_PROFILES = ("Appli.urls", "authUser.urls")
+
+_mesure_courante = ContextVar("mesure_profilage", default=None)
+
+_historique = defaultdict(lambda: deque(maxlen=getattr(settings, "PROFILAGE_SQL_FENETRE", 500)))
+_verrou = threading.Lock()
+
+
+class BudgetRequetesDepasse(AssertionError):
+    """Levée en mode strict quand une vue dépasse son budget de requêtes."""
+
+
+def budget_requetes(maximum):
+    """Déclare le nombre maximal de requêtes SQL attendu pour une vue."""
+    def decorateur(vue):
+        @wraps(vue)
+        def enveloppe(*args, **kwargs):
+            return vue(*args, **kwargs)
+        enveloppe.budget_requetes = maximum
+        return enveloppe
+    return decorateur
+
+
+def empreinte(sql):
+    """SQL paramétré normalisé : les listes IN (%s, %s, ...) de toute longueur se confondent."""
+    return re.sub(r"\(\s*%s(?:\s*,\s*%s)*\s*\)", "(%s...)", sql)
+
+
+class Mesure:
+    def __init__(self):
+        self.requetes = Counter()
+        self.nb_requetes = 0
+        self.duree_sql = 0.0
+        self.duree_gabarits = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        # execute_wrapper de la connexion : chaque requête passe par ici
+        debut = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duree_sql += time.perf_counter() - debut
+            self.nb_requetes += 1
+            self.requetes[empreinte(sql)] += 1
+
+    def dupliquees(self):
+        return [(sql, n) for sql, n in self.requetes.most_common() if n > 1]
+
+
+# Temps de rendu : le shortcut render() passe par le Template du moteur Django.
+# La méthode n'est remplacée qu'à la première requête profilée : sans
+# PROFILAGE_SQL, le moteur de gabarits reste intact.
+_render_origine = TemplateDjango.render
+
+
+def _render_mesure(self, context=None, request=None):
+    mesure = _mesure_courante.get()
+    if mesure is None:
+        return _render_origine(self, context, request)
+    debut = time.perf_counter()
+    try:
+        return _render_origine(self, context, request)
+    finally:
+        mesure.duree_gabarits += time.perf_counter() - debut
+
+
+def installer_mesure_gabarits():
+    # Idempotent : _render_origine est relevée à l'import
+    TemplateDjango.render = _render_mesure
+
+
+def _joindre(route, suite):
+    # Comme URLResolver : le ^ d'un motif re_path() inclus est retiré
+    return route + suite.removeprefix("^") if route else suite
+
+
+def _routes(motifs, prefixe, profile):
+    for motif in motifs:
+        route = _joindre(prefixe, str(motif.pattern))
+        if isinstance(motif, URLResolver):
+            module = getattr(motif.urlconf_name, "__name__", motif.urlconf_name)
+            yield from _routes(motif.url_patterns, route, profile or module in URLCONFS_PROFILES)
+        elif profile:
+            yield route
+
+
+@lru_cache
+def routes_profilees(urlconf):
+    """Routes complètes (ResolverMatch.route) servies par les URLconf de URLCONFS_PROFILES."""
+    return frozenset(_routes(get_resolver(urlconf).url_patterns, "", False))
+
+
+def enregistrer(vue, total, mesure):
+    with _verrou:
+        _historique[vue].append((total, mesure.nb_requetes, mesure.duree_sql, len(mesure.dupliquees())))
+
+
+def statistiques():
+    """Percentiles glissants par vue (fenêtre PROFILAGE_SQL_FENETRE)."""
+    with _verrou:
+        copie = {vue: list(mesures) for vue, mesures in _historique.items()}
+    lignes = []
+    for vue, mesures in sorted(copie.items()):
+        durees = [m[0] * 1000 for m in mesures]
+        requetes = [m[1] for m in mesures]
+        lignes.append({
+            "vue": vue,
+            "appels": len(mesures),
+            "p50_ms": round(percentile(durees, 50), 2),
+            "p95_ms": round(percentile(durees, 95), 2),
+            "p99_ms": round(percentile(durees, 99), 2),
+            "requetes_p50": percentile(requetes, 50),
+            "requetes_max": max(requetes),
+            "sql_p95_ms": round(percentile([m[2] * 1000 for m in mesures], 95), 2),
+            "appels_avec_doublons": sum(1 for m in mesures if m[3]),
+        })
+    return lignes
+
+
+def reinitialiser():
+    with _verrou:
+        _historique.clear()
+
+
+class ProfilageSQLMiddleware:
+    """
+    Middleware opt-in (PROFILAGE_SQL = True). En mode strict
+    (PROFILAGE_SQL_STRICT, pour les tests), une vue décorée par
+    budget_requetes qui dépasse son budget lève BudgetRequetesDepasse.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, "PROFILAGE_SQL", False):
+            return self.get_response(request)
+
+        installer_mesure_gabarits()
+        mesure = Mesure()
+        jeton = _mesure_courante.set(mesure)
+        debut = time.perf_counter()
+        try:
+            # Toutes les bases (primaire, réplique) : chaque requête est comptée
+            with ExitStack() as pile:
+                for connexion in connections.all():
+                    pile.enter_context(connexion.execute_wrapper(mesure))
+                response = self.get_response(request)
+        finally:
+            _mesure_courante.reset(jeton)
+        total = time.perf_counter() - debut
+
+        match = request.resolver_match
+        if match is None or match.route not in routes_profilees(getattr(request, "urlconf", None) or settings.ROOT_URLCONF):
+            return response
+
+        dupliquees = mesure.dupliquees()
+        response["Server-Timing"] = ", ".join([
+            f'sql;dur={mesure.duree_sql * 1000:.1f};desc="{mesure.nb_requetes} requetes"',
+            f'tpl;dur={mesure.duree_gabarits * 1000:.1f}',
+            f'dup;desc="{len(dupliquees)}"',
+            f'total;dur={total * 1000:.1f}',
+        ])
+        if match.view_name != "perf":
+            enregistrer(match.view_name, total, mesure)
+
+        for sql, n in dupliquees:
+            logger.debug("%s : requête exécutée %d fois : %s", match.view_name, n, sql)
+
+        budget = getattr(match.func, "budget_requetes", None)
+        if budget is not None and mesure.nb_requetes > budget:
+            message = f"{match.view_name} : {mesure.nb_requetes} requêtes pour un budget de {budget}."
+            if dupliquees:
+                message += f" Requête la plus répétée ({dupliquees[0][1]} fois) : {dupliquees[0][0]}"
+            if getattr(settings, "PROFILAGE_SQL_STRICT", False):
+                raise BudgetRequetesDepasse(message)
+            logger.warning(message)
+
+        return response
@@ -0,0 +1,472 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q, Sum
+from django.db.models.functions import TruncMonth, TruncYear
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import (
+    INCONNU,
+    ActiviteJour,
+    ActiviteComplet,
+    PackJour,
+    PackComplet,
+    ReservationPackJour,
+    ReservationPackComplet,
+    StatistiqueJournaliere,
+    StatistiqueVilleJournaliere,
+)
+from .signals import statuts_modifies, totaux_modifies
+
+# -----------------------------
+# RECALCUL DES AGRÉGATS
+# -----------------------------
+
+COLONNES_RESERVATION = ("id", "pack_id", "devise", "nb_personne", "montant_total", "date_reservation")
+
+
+def jour_local(date_reservation):
+    return timezone.localdate(date_reservation) if timezone.is_aware(date_reservation) else date_reservation.date()
+
+
+def filtre_jours(jours, champ="date_reservation"):
+    """
+    Q équivalent à `<champ>__date__in=jours`, exprimé en plages [début, fin[
+    (une par suite de jours consécutifs) pour que l'index sur `champ` serve.
+    """
+    def debut(jour):
+        instant = datetime.combine(jour, time.min)
+        return timezone.make_aware(instant) if settings.USE_TZ else instant
+
+    condition = Q(pk__in=[])
+    jours = sorted(jours)
+    i = 0
+    while i < len(jours):
+        j = i
+        while j + 1 < len(jours) and jours[j + 1] == jours[j] + timedelta(days=1):
+            j += 1
+        condition |= Q(**{f"{champ}__gte": debut(jours[i]), f"{champ}__lt": debut(jours[j] + timedelta(days=1))})
+        i = j + 1
+    return condition
+
+
+def _villes_par_pack(packs=None):
+    """
+    {('jour'|'complet', pack_id): {ville_id, ...}} à partir des tables
+    d'activités ; `packs` ({(type, pack_id)}) limite la lecture à ces packs.
+    """
+    villes = defaultdict(set)
+    liens_jour = PackJour.activites.through.objects.all()
+    liens_complet = ActiviteComplet.villes.through.objects.all()
+    if packs is not None:
+        liens_jour = liens_jour.filter(packjour_id__in=[p for t, p in packs if t == "jour"])
+        liens_complet = liens_complet.filter(activitecomplet__pack_id__in=[p for t, p in packs if t == "complet"])
+    for pack_id, ville_id in liens_jour.values_list("packjour_id", "activitejour__ville_id"):
+        villes[("jour", pack_id)].add(ville_id)
+    for pack_id, ville_id in liens_complet.values_list("activitecomplet__pack_id", "ville_id"):
+        villes[("complet", pack_id)].add(ville_id)
+    return villes
+
+
+def _reservations_des_jours(jours):
+    """Réservations (hors annulées) dont la date de réservation tombe dans `jours`."""
+    for type_reservation, queryset in (
+        ("jour", ReservationPackJour.objects.all()),
+        ("complet", ReservationPackComplet.objects.exclude(statut="annulé")),
+    ):
+        colonnes = COLONNES_RESERVATION + ("pack__nom",)
+        if type_reservation == "complet":
+            colonnes += ("pack__type_pack",)
+        for ligne in queryset.filter(filtre_jours(jours)).values(*colonnes):
+            yield type_reservation, jour_local(ligne["date_reservation"]), ligne
+
+
+@transaction.atomic
+def recalculer_jours(jours):
+    """
+    Recalcule entièrement les agrégats des jours donnés à partir des
+    réservations de ces seuls jours (commande recalculer_statistiques) ; les
+    enregistrements ne font qu'appliquer leur variation (appliquer_deltas).
+    """
+    jours = set(jours)
+    if not jours:
+        return
+
+    par_pack = {}
+    par_ville = {}
+    villes = None
+
+    for type_reservation, jour, ligne in _reservations_des_jours(jours):
+        cle = (jour, type_reservation, ligne["pack_id"], ligne["devise"])
+        stat = par_pack.get(cle)
+        if stat is None:
+            stat = par_pack[cle] = StatistiqueJournaliere(
+                jour=jour,
+                type_reservation=type_reservation,
+                pack_jour_id=ligne["pack_id"] if type_reservation == "jour" else None,
+                pack_complet_id=ligne["pack_id"] if type_reservation == "complet" else None,
+                pack_nom=ligne["pack__nom"],
+                type_pack=ligne.get("pack__type_pack", ""),
+                devise=ligne["devise"],
+                chiffre_affaires=Decimal(0),
+            )
+        stat.nb_reservations += 1
+        stat.nb_personnes += ligne["nb_personne"]
+        stat.chiffre_affaires += ligne["montant_total"]
+
+        if villes is None:
+            villes = _villes_par_pack()
+        for ville_id in villes.get((type_reservation, ligne["pack_id"]), ()):
+            cle = (jour, ville_id, ligne["devise"])
+            stat = par_ville.get(cle)
+            if stat is None:
+                stat = par_ville[cle] = StatistiqueVilleJournaliere(
+                    jour=jour, ville_id=ville_id, devise=ligne["devise"], chiffre_affaires=Decimal(0)
+                )
+            stat.nb_reservations += 1
+            stat.nb_personnes += ligne["nb_personne"]
+            stat.chiffre_affaires += ligne["montant_total"]
+
+    StatistiqueJournaliere.objects.filter(jour__in=jours).delete()
+    StatistiqueVilleJournaliere.objects.filter(jour__in=jours).delete()
+    StatistiqueJournaliere.objects.bulk_create(par_pack.values())
+    StatistiqueVilleJournaliere.objects.bulk_create(par_ville.values())
+
+
+# -----------------------------
+# MISE À JOUR INCRÉMENTALE
+# -----------------------------
+# Chaque enregistrement retire l'ancienne contribution de la réservation et
+# ajoute la nouvelle, par UPDATE … SET n = n + delta sur les seules lignes
+# concernées : pas de relecture de la journée, et deux réservations
+# concurrentes s'additionnent au lieu de s'écraser.
+
+TYPES_RESERVATION = {ReservationPackJour: "jour", ReservationPackComplet: "complet"}
+CHAMPS_PACK = {"jour": "pack_jour_id", "complet": "pack_complet_id"}
+CHAMPS_CONTRIBUTION = ("date_reservation", "pack", "devise", "nb_personne", "montant_total")
+
+
+def _champs(modele):
+    return CHAMPS_CONTRIBUTION + (("statut",) if modele is ReservationPackComplet else ())
+
+
+def etat_reservation(instance):
+    """Valeurs de CHAMPS_CONTRIBUTION d'une instance de réservation."""
+    return {champ: getattr(instance, instance._meta.get_field(champ).attname) for champ in _champs(type(instance))}
+
+
+def nouveaux_deltas():
+    """{(jour, type_reservation, pack_id, devise): [réservations, personnes, chiffre d'affaires]}"""
+    return defaultdict(lambda: [0, 0, Decimal(0)])
+
+
+def contribution(type_reservation, valeurs):
+    """
+    (clé d'agrégat, (1, personnes, montant)) d'une réservation décrite par
+    `valeurs` (champs de CHAMPS_CONTRIBUTION) ; None si elle n'est pas comptée.
+    """
+    if valeurs is None or valeurs.get("statut") == "annulé" or valeurs["date_reservation"] is None:
+        return None
+    cle = (jour_local(valeurs["date_reservation"]), type_reservation, valeurs["pack"], valeurs["devise"])
+    # Instance pas encore relue : le total peut être un float (prix par défaut 0.0)
+    return cle, (1, valeurs["nb_personne"], Decimal(str(valeurs["montant_total"])))
+
+
+def cumuler(deltas, element, signe=1):
+    if element is None:
+        return
+    cle, valeurs = element
+    delta = deltas[cle]
+    for i, valeur in enumerate(valeurs):
+        delta[i] += signe * valeur
+
+
+def _infos_pack(type_reservation, pack_id):
+    if type_reservation == "jour":
+        return {"pack_nom": PackJour.objects.values_list("nom", flat=True).get(pk=pack_id)}
+    nom, type_pack = PackComplet.objects.values_list("nom", "type_pack").get(pk=pack_id)
+    return {"pack_nom": nom, "type_pack": type_pack}
+
+
+def _incrementer(modele, cle, delta, infos=dict):
+    nb, personnes, chiffre = delta
+    lignes = modele.objects.filter(**cle)
+    increments = {
+        "nb_reservations": F("nb_reservations") + nb,
+        "nb_personnes": F("nb_personnes") + personnes,
+        "chiffre_affaires": F("chiffre_affaires") + chiffre,
+    }
+    if lignes.update(**increments):
+        if nb < 0:
+            lignes.filter(nb_reservations=0).delete()
+        return
+    if nb <= 0:
+        # Rien à retirer : agrégats pas encore calculés (voir recalculer_statistiques)
+        return
+    try:
+        with transaction.atomic():
+            modele.objects.create(
+                **cle, **infos(), nb_reservations=nb, nb_personnes=personnes, chiffre_affaires=chiffre
+            )
+    except IntegrityError:
+        # Ligne créée entre-temps par une autre transaction (contrainte d'unicité)
+        lignes.update(**increments)
+
+
+@transaction.atomic
+def appliquer_deltas(deltas):
+    """
+    Ajoute aux agrégats par pack et par ville les variations `deltas` (voir
+    nouveaux_deltas). Une ligne absente est créée, une ligne retombée à zéro
+    réservation est supprimée. Les lignes sont modifiées dans un ordre fixe.
+    """
+    deltas = {cle: delta for cle, delta in deltas.items() if any(delta)}
+    if not deltas:
+        return
+
+    villes = _villes_par_pack({(type_reservation, pack_id) for _, type_reservation, pack_id, _ in deltas})
+    par_ville = nouveaux_deltas()
+    for (jour, type_reservation, pack_id, devise), delta in sorted(deltas.items()):
+        _incrementer(
+            StatistiqueJournaliere,
+            {"jour": jour, "type_reservation": type_reservation, CHAMPS_PACK[type_reservation]: pack_id, "devise": devise},
+            delta,
+            lambda: _infos_pack(type_reservation, pack_id),
+        )
+        for ville_id in villes.get((type_reservation, pack_id), ()):
+            cumuler(par_ville, ((jour, ville_id, devise), delta))
+
+    for (jour, ville_id, devise), delta in sorted(par_ville.items()):
+        if any(delta):
+            _incrementer(StatistiqueVilleJournaliere, {"jour": jour, "ville_id": ville_id, "devise": devise}, delta)
+
+
+# -----------------------------
+# SIGNAUX
+# -----------------------------
+
+@receiver(pre_save, sender=ReservationPackJour)
+@receiver(pre_save, sender=ReservationPackComplet)
+def memoriser_contribution(sender, instance, using=None, **kwargs):
+    """Contribution avant l'enregistrement : valeurs mémorisées au chargement, relues sinon."""
+    instance._contribution_precedente = None
+    if instance._state.adding:
+        return
+    valeurs = {champ: instance.valeur_initiale(champ) for champ in _champs(sender)}
+    if any(valeur is INCONNU for valeur in valeurs.values()):
+        valeurs = sender.objects.using(using).filter(pk=instance.pk).values(*_champs(sender)).first()
+    instance._contribution_precedente = contribution(TYPES_RESERVATION[sender], valeurs)
+
+
+@receiver(post_save, sender=ReservationPackJour)
+@receiver(post_save, sender=ReservationPackComplet)
+def reservation_enregistree(sender, instance, **kwargs):
+    deltas = nouveaux_deltas()
+    cumuler(deltas, getattr(instance, "_contribution_precedente", None), -1)
+    cumuler(deltas, contribution(TYPES_RESERVATION[sender], etat_reservation(instance)))
+    appliquer_deltas(deltas)
+
+
+@receiver(pre_delete, sender=ReservationPackJour)
+@receiver(pre_delete, sender=ReservationPackComplet)
+def memoriser_contribution_supprimee(sender, instance, using=None, **kwargs):
+    # Relue en base : le total a pu changer (options) depuis le chargement de l'instance
+    valeurs = sender.objects.using(using).filter(pk=instance.pk).values(*_champs(sender)).first()
+    instance._contribution_precedente = contribution(TYPES_RESERVATION[sender], valeurs)
+
+
+@receiver(post_delete, sender=ReservationPackJour)
+@receiver(post_delete, sender=ReservationPackComplet)
+def reservation_supprimee(sender, instance, **kwargs):
+    deltas = nouveaux_deltas()
+    cumuler(deltas, getattr(instance, "_contribution_precedente", None), -1)
+    appliquer_deltas(deltas)
+
+
+@receiver(totaux_modifies, sender=ReservationPackJour)
+@receiver(totaux_modifies, sender=ReservationPackComplet)
+def total_modifie(sender, pk, ancien_total, **kwargs):
+    # Options ajoutées, modifiées ou supprimées : seul le chiffre d'affaires varie
+    element = contribution(TYPES_RESERVATION[sender], sender.objects.filter(pk=pk).values(*_champs(sender)).first())
+    if element is not None:
+        cle, (_, _, total) = element
+        appliquer_deltas({cle: [0, 0, total - ancien_total]})
+
+
+@receiver(statuts_modifies, sender=ReservationPackComplet)
+def statuts_modifies_en_masse(sender, pks, anciens_statuts, **kwargs):
+    deltas = nouveaux_deltas()
+    for valeurs in sender.objects.filter(pk__in=pks).values("pk", *_champs(sender)):
+        cumuler(deltas, contribution("complet", {**valeurs, "statut": anciens_statuts[valeurs["pk"]]}), -1)
+        cumuler(deltas, contribution("complet", valeurs))
+    appliquer_deltas(deltas)
+
+
+# -----------------------------
+# VILLES ET NOMS DES PACKS
+# -----------------------------
+# Les agrégats par ville reprennent les villes des activités du pack au
+# moment de la réservation. Quand ces villes changent (activités ajoutées
+# ou retirées, ville d'une activité modifiée…), la contribution du pack,
+# lue dans ses agrégats par pack, passe des villes retirées aux villes
+# ajoutées. Le nom (et le type) recopié dans les agrégats par pack suit
+# le pack.
+
+def _contributions_pack(type_reservation, pack_id):
+    """[((jour, devise), (réservations, personnes, chiffre d'affaires))] des agrégats du pack."""
+    lignes = StatistiqueJournaliere.objects.filter(
+        type_reservation=type_reservation, **{CHAMPS_PACK[type_reservation]: pack_id}
+    ).values_list("jour", "devise", "nb_reservations", "nb_personnes", "chiffre_affaires")
+    return [((jour, devise), (nb, personnes, chiffre)) for jour, devise, nb, personnes, chiffre in lignes]
+
+
+@transaction.atomic
+def reporter_villes(villes_avant):
+    """
+    Reporte les agrégats par ville des packs de `villes_avant`
+    ({(type, pack_id): {ville_id, ...}}, lu par _villes_par_pack avant la
+    modification) sur leurs villes actuelles.
+    """
+    if not villes_avant:
+        return
+    villes_apres = _villes_par_pack(set(villes_avant))
+    par_ville = nouveaux_deltas()
+    for pack, avant in villes_avant.items():
+        apres = villes_apres.get(pack, set())
+        if avant == apres:
+            continue
+        for (jour, devise), valeurs in _contributions_pack(*pack):
+            for ville_id in avant - apres:
+                cumuler(par_ville, ((jour, ville_id, devise), valeurs), -1)
+            for ville_id in apres - avant:
+                cumuler(par_ville, ((jour, ville_id, devise), valeurs))
+
+    for (jour, ville_id, devise), delta in sorted(par_ville.items()):
+        if any(delta):
+            _incrementer(StatistiqueVilleJournaliere, {"jour": jour, "ville_id": ville_id, "devise": devise}, delta)
+
+
+def _memoriser_villes(instance, packs):
+    packs = set(packs)
+    villes = _villes_par_pack(packs)
+    instance._villes_avant = {pack: villes.get(pack, set()) for pack in packs}
+
+
+def _reporter_villes_memorisees(instance):
+    villes_avant = getattr(instance, "_villes_avant", None)
+    instance._villes_avant = None
+    reporter_villes(villes_avant)
+
+
+def _packs_liens(sender, instance, reverse, pk_set):
+    """Packs dont les villes dépendent des liens modifiés par un m2m_changed."""
+    if sender is PackJour.activites.through:
+        if not reverse:
+            return [("jour", instance.pk)]
+        ids = pk_set if pk_set is not None else instance.packs_jour.values_list("pk", flat=True)
+        return [("jour", pk) for pk in ids]
+    if not reverse:
+        return [("complet", instance.pack_id)]
+    activites = ActiviteComplet.objects.filter(pk__in=pk_set) if pk_set is not None else instance.activites_complet.all()
+    return [("complet", pk) for pk in activites.values_list("pack_id", flat=True)]
+
+
+def liens_villes_modifies(sender, instance, action, reverse, pk_set, **kwargs):
+    if action in ("pre_add", "pre_remove", "pre_clear"):
+        _memoriser_villes(instance, _packs_liens(sender, instance, reverse, pk_set))
+    elif action in ("post_add", "post_remove", "post_clear"):
+        _reporter_villes_memorisees(instance)
+
+
+def _packs_activite(instance):
+    if isinstance(instance, ActiviteJour):
+        return [("jour", pk) for pk in instance.packs_jour.values_list("pk", flat=True)]
+    # Le pack enregistré et le nouveau pack de l'activité
+    packs = ActiviteComplet.objects.filter(pk=instance.pk).values_list("pack_id", flat=True)
+    return [("complet", pk) for pk in {*packs, instance.pack_id}]
+
+
+@receiver(pre_save, sender=ActiviteJour)
+@receiver(pre_save, sender=ActiviteComplet)
+@receiver(pre_delete, sender=ActiviteJour)
+@receiver(pre_delete, sender=ActiviteComplet)
+def memoriser_villes_activite(sender, instance, **kwargs):
+    # Une activité créée n'a pas encore de liens ; supprimée, ses liens partent en cascade
+    if instance.pk is not None and not instance._state.adding:
+        _memoriser_villes(instance, _packs_activite(instance))
+
+
+@receiver(post_save, sender=ActiviteJour)
+@receiver(post_save, sender=ActiviteComplet)
+@receiver(post_delete, sender=ActiviteJour)
+@receiver(post_delete, sender=ActiviteComplet)
+def activite_enregistree(sender, instance, **kwargs):
+    _reporter_villes_memorisees(instance)
+
+
+m2m_changed.connect(liens_villes_modifies, sender=PackJour.activites.through, dispatch_uid="rapports_m2m_pack_jour")
+m2m_changed.connect(liens_villes_modifies, sender=ActiviteComplet.villes.through, dispatch_uid="rapports_m2m_activite_complet")
+
+
+@receiver(post_save, sender=PackJour)
+@receiver(post_save, sender=PackComplet)
+def pack_renomme(sender, instance, created, **kwargs):
+    champs = ("nom",) if sender is PackJour else ("nom", "type_pack")
+    if created or not any(instance.champ_a_change(champ) is not False for champ in champs):
+        return
+    type_reservation = "jour" if sender is PackJour else "complet"
+    valeurs = {"pack_nom": instance.nom}
+    if sender is PackComplet:
+        valeurs["type_pack"] = instance.type_pack
+    StatistiqueJournaliere.objects.filter(
+        type_reservation=type_reservation, **{CHAMPS_PACK[type_reservation]: instance.pk}
+    ).update(**valeurs)
+
+
+# -----------------------------
+# REQUÊTES DE RAPPORT
+# -----------------------------
+
+DIMENSIONS = {
+    "jour": ("jour",),
+    "mois": ("mois",),
+    "annee": ("annee",),
+    "type_reservation": ("type_reservation",),
+    "pack": ("type_reservation", "pack_jour", "pack_complet", "pack_nom"),
+    "type_pack": ("type_pack",),
+    "ville": ("ville", "ville__nom"),
+}
+
+
+def rapport(debut, fin, par="jour"):
+    """
+    Chiffre d'affaires, réservations et personnes entre `debut` et `fin`
+    (inclus), regroupés selon `par` et par devise. Ne lit que les agrégats.
+    """
+    if par not in DIMENSIONS:
+        raise ValueError(f"Dimension inconnue : {par}")
+
+    modele = StatistiqueVilleJournaliere if par == "ville" else StatistiqueJournaliere
+    queryset = modele.objects.filter(jour__gte=debut, jour__lte=fin)
+    if par == "type_pack":
+        queryset = queryset.filter(type_reservation="complet")
+    if par == "mois":
+        queryset = queryset.annotate(mois=TruncMonth("jour"))
+    if par == "annee":
+        queryset = queryset.annotate(annee=TruncYear("jour"))
+
+    champs = DIMENSIONS[par] + ("devise",)
+    return list(
+        queryset.values(*champs)
+        .annotate(
+            nb_reservations=Sum("nb_reservations"),
+            nb_personnes=Sum("nb_personnes"),
+            chiffre_affaires=Sum("chiffre_affaires"),
+        )
+        .order_by(*champs)
+    )
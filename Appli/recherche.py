@@ -0,0 +1,754 @@
+import json
+import logging
+import re
+import threading
+import unicodedata
+from decimal import Decimal
+from time import time
+
+from django.db import connection, transaction
+from django.db.models import Count, Prefetch
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import post_save, pre_delete, m2m_changed
+from django.urls import reverse
+
+from .catalogue import cache_catalogue
+from .models import (
+    Ville,
+    ActiviteJour,
+    PackJour,
+    ActiviteComplet,
+    PackComplet,
+    DocumentRecherche,
+    TYPE_PACK_CHOICES,
+)
+from .routeurs import lecture_primaire
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------
+# RECHERCHE PLEIN TEXTE ET FACETTES
+# -----------------------------
+# Chaque ville, activité et pack a un DocumentRecherche. Le texte est normalisé
+# en Python (minuscules, accents repliés, racinisation légère du français) puis
+# indexé par le moteur de la base : table FTS5 sous SQLite (migration 0016),
+# colonne tsvector générée + index GIN sous PostgreSQL (migration 0012). Les
+# deux partagent donc exactement les mêmes termes. Les signaux réindexent,
+# après validation de la transaction, l'objet modifié et les documents qui
+# reprennent son texte (une ville renommée réindexe ses activités et ses packs).
+
+# -----------------------------
+# NORMALISATION
+# -----------------------------
+
+MOTS_VIDES = frozenset(
+    "a au aux avec ce ces d dans de des du en et l la le les leur leurs ou par "
+    "pour qu que qui sa se ses son sur un une vos votre nos notre".split()
+)
+
+# Racinisation légère (pluriels, féminins et suffixes dérivationnels courants) :
+# « excursions », « excursion » -> « excurs » ; « culturelles » -> « culturel ».
+SUFFIXES = sorted(
+    [
+        ("issements", ""), ("issement", ""), ("ements", ""), ("ement", ""),
+        ("ations", ""), ("ation", ""), ("atrices", ""), ("atrice", ""),
+        ("ateurs", ""), ("ateur", ""), ("ions", ""), ("ion", ""),
+        ("euses", ""), ("euse", ""), ("eux", ""), ("iques", ""), ("ique", ""),
+        ("ables", ""), ("able", ""), ("istes", ""), ("iste", ""),
+        ("ismes", ""), ("isme", ""), ("ites", ""), ("ite", ""),
+        ("ives", ""), ("ive", ""), ("ifs", ""), ("if", ""),
+        ("elles", "el"), ("elle", "el"), ("els", "el"),
+        ("aux", "al"), ("ers", ""), ("er", ""), ("es", ""), ("s", ""), ("x", ""), ("e", ""),
+    ],
+    key=lambda regle: -len(regle[0]),
+)
+LONGUEUR_RACINE_MIN = 3
+
+RE_MOT = re.compile(r"[a-z0-9]+")
+
+
+def replier_accents(texte):
+    """« Kasbah d'Aït-Ben-Haddou » -> « kasbah d'ait-ben-haddou »."""
+    texte = (texte or "").lower().replace("œ", "oe").replace("æ", "ae")
+    return "".join(c for c in unicodedata.normalize("NFKD", texte) if not unicodedata.combining(c))
+
+
+def raciner(mot):
+    if len(mot) <= LONGUEUR_RACINE_MIN or mot.isdigit():
+        return mot
+    for suffixe, remplacement in SUFFIXES:
+        if mot.endswith(suffixe) and len(mot) - len(suffixe) >= LONGUEUR_RACINE_MIN:
+            return mot[: -len(suffixe)] + remplacement
+    return mot
+
+
+def termes(texte):
+    """Termes indexés d'un texte (ou d'une requête), dans l'ordre."""
+    return [raciner(mot) for mot in RE_MOT.findall(replier_accents(texte)) if mot not in MOTS_VIDES]
+
+
+def normaliser(*textes):
+    return " ".join(t for texte in textes for t in termes(texte))
+
+
+# -----------------------------
+# TRANCHES DE PRIX (MAD)
+# -----------------------------
+
+TRANCHES_PRIX = (
+    ("0-500", Decimal(0), Decimal(500), "Moins de 500 MAD"),
+    ("500-1500", Decimal(500), Decimal(1500), "500 à 1 500 MAD"),
+    ("1500-5000", Decimal(1500), Decimal(5000), "1 500 à 5 000 MAD"),
+    ("5000+", Decimal(5000), None, "Plus de 5 000 MAD"),
+)
+
+
+def tranche_prix(prix):
+    if prix is None:
+        return ""
+    for code, minimum, maximum, _ in TRANCHES_PRIX:
+        if prix >= minimum and (maximum is None or prix < maximum):
+            return code
+    return ""
+
+
+# -----------------------------
+# CONSTRUCTION DES DOCUMENTS
+# -----------------------------
+# Chaque constructeur charge un lot d'objets en un nombre constant de
+# requêtes et retourne [(document, ids des villes)].
+
+def _document(type_objet, objet, textes, villes, **facettes):
+    return DocumentRecherche(
+        type_objet=type_objet,
+        objet_id=objet.pk,
+        titre=objet.nom,
+        resume=(objet.description or "")[:300],
+        titre_index=normaliser(objet.nom),
+        contenu_index=normaliser(objet.description, *textes),
+        **facettes,
+    ), villes
+
+
+def _facettes_pack(pack, url, **autres):
+    return dict(url=url, prix_mad=pack.prix_mad, tranche_prix=tranche_prix(pack.prix_mad), **autres)
+
+
+def _villes(ids):
+    return [
+        _document("ville", ville, [], {ville.pk})
+        for ville in Ville.objects.filter(pk__in=ids)
+    ]
+
+
+def _activites_jour(ids):
+    return [
+        _document("activite_jour", activite, [activite.ville.nom], {activite.ville_id})
+        for activite in ActiviteJour.objects.filter(pk__in=ids).select_related("ville")
+    ]
+
+
+def _packs_jour(ids):
+    documents = []
+    for pack in PackJour.objects.filter(pk__in=ids).prefetch_related(
+        Prefetch("activites", queryset=ActiviteJour.objects.select_related("ville"))
+    ):
+        activites = list(pack.activites.all())
+        documents.append(_document(
+            "pack_jour", pack,
+            [a.nom for a in activites] + [a.ville.nom for a in activites],
+            {a.ville_id for a in activites},
+            duree_jours=1,
+            **_facettes_pack(pack, reverse("reservation_jour_detail", args=[pack.pk])),
+        ))
+    return documents
+
+
+def _activites_complet(ids):
+    documents = []
+    for activite in ActiviteComplet.objects.filter(pk__in=ids).select_related("pack").prefetch_related("villes"):
+        villes = list(activite.villes.all())
+        documents.append(_document(
+            "activite_complet", activite,
+            [activite.pack.nom] + [v.nom for v in villes],
+            {v.pk for v in villes},
+            type_pack=activite.pack.type_pack,
+            url=reverse("reservation_complet_detail", args=[activite.pack_id]),
+        ))
+    return documents
+
+
+def _packs_complet(ids):
+    documents = []
+    for pack in PackComplet.objects.filter(pk__in=ids).prefetch_related("activites__villes"):
+        activites = list(pack.activites.all())
+        villes = {v for a in activites for v in a.villes.all()}
+        documents.append(_document(
+            "pack_complet", pack,
+            [pack.get_type_pack_display()] + [a.nom for a in activites] + [v.nom for v in villes],
+            {v.pk for v in villes},
+            type_pack=pack.type_pack,
+            duree_jours=pack.duree_jours,
+            **_facettes_pack(pack, reverse("reservation_complet_detail", args=[pack.pk])),
+        ))
+    return documents
+
+
+CONSTRUCTEURS = {
+    "ville": (Ville, _villes),
+    "activite_jour": (ActiviteJour, _activites_jour),
+    "pack_jour": (PackJour, _packs_jour),
+    "activite_complet": (ActiviteComplet, _activites_complet),
+    "pack_complet": (PackComplet, _packs_complet),
+}
+
+
+# -----------------------------
+# MOTEURS PLEIN TEXTE
+# -----------------------------
+# classer() retourne au plus `limite` documents du plus au moins pertinent,
+# compter() le nombre exact de correspondances, filtrer() restreint un
+# queryset aux critères de facettes (voir CHAMPS_CRITERES).
+
+# Clé FTS5 d'un document : ordre de l'index × CLE_DOCUMENT + id (id < 2³²)
+CLE_DOCUMENT = 2 ** 32
+# Ordre de l'index : villes, packs puis activités, chaque type du plus court au plus long document
+RANGS_TYPE = {"ville": 0, "pack_complet": 1, "pack_jour": 2, "activite_complet": 3, "activite_jour": 4}
+LONGUEUR_MAX = 2 ** 24 - 1
+
+# Au-delà de ce nombre de correspondances, pas de bm25 (voir MoteurSQLite)
+CLASSEMENT_EXACT_MAX = 200
+
+
+def jeton(*parties):
+    """Jeton de facette indexé (« prix_1500_5000 ») : lettres, chiffres et « _ » seulement."""
+    return re.sub(r"[^a-z0-9]+", "_", "_".join(str(partie) for partie in parties).lower())
+
+
+CRITERES_JETONS = {
+    "type_objet": "type",
+    "type_pack": "pack",
+    "duree": "duree",
+    "tranche": "prix",
+    "ville": "ville",
+}
+
+
+class MoteurSQLite:
+    """
+    Table virtuelle FTS5 : titre, contenu et jetons des facettes, qui filtrent
+    dans l'index même. Son rowid est la clé de cle() : FTS5 parcourt les
+    correspondances dans l'ordre de l'index et s'arrête à la limite sans lire
+    les autres. bm25 n'est calculé que si elles sont au plus
+    CLASSEMENT_EXACT_MAX : son coût fixe (fréquence de chaque terme dans tout
+    l'index) dépasse sinon, à lui seul, le budget d'une recherche.
+    """
+
+    table = "appli_recherche_fts"
+    # Un terme du titre pèse dix fois plus que dans le contenu ; les jetons des facettes ne comptent pas
+    bm25 = f"bm25({table}, 10.0, 1.0, 0.0)"
+
+    def expression(self, mots):
+        # Préfixe sur le dernier terme seulement (celui en cours de saisie) :
+        # les autres sont des mots complets, déjà ramenés à leur racine
+        return " AND ".join([f'"{mot}"' for mot in mots[:-1]] + [f'"{mots[-1]}"*'])
+
+    def _requete(self, mots, criteres, colonne=None):
+        parties = []
+        if mots:
+            parties.append(f"({self.expression(mots)})")
+            if colonne:
+                parties[0] = f"{{{colonne}}} : {parties[0]}"
+        jetons = [jeton(CRITERES_JETONS[critere], valeur) for critere, valeur in criteres.items()]
+        if jetons:
+            parties.append("{filtres_index} : (" + " AND ".join(f'"{j}"' for j in jetons) + ")")
+        return " AND ".join(parties)
+
+    @staticmethod
+    def cle(document_id, type_objet, titre_index, contenu_index):
+        ordre = RANGS_TYPE[type_objet] * (LONGUEUR_MAX + 1) + min(len(titre_index) + len(contenu_index), LONGUEUR_MAX)
+        return ordre * CLE_DOCUMENT + document_id
+
+    @staticmethod
+    def jetons_filtres(document, villes):
+        jetons = [jeton("type", document.type_objet)]
+        if document.type_pack:
+            jetons.append(jeton("pack", document.type_pack))
+        if document.duree_jours is not None:
+            jetons.append(jeton("duree", document.duree_jours))
+        if document.tranche_prix:
+            jetons.append(jeton("prix", document.tranche_prix))
+        jetons += [jeton("ville", ville_id) for ville_id in sorted(villes)]
+        return " ".join(jetons)
+
+    @staticmethod
+    def parmi(ids):
+        return RawSQL("SELECT value FROM json_each(%s)", [json.dumps(list(ids))])
+
+    def indexer(self, lignes):
+        with connection.cursor() as curseur:
+            curseur.executemany(
+                f"INSERT INTO {self.table} (rowid, titre_index, contenu_index, filtres_index) VALUES (%s, %s, %s, %s)",
+                [
+                    (self.cle(d.pk, d.type_objet, d.titre_index, d.contenu_index), d.titre_index, d.contenu_index,
+                     self.jetons_filtres(d, villes))
+                    for d, villes in lignes
+                ],
+            )
+
+    def retirer(self, documents):
+        cles = [
+            self.cle(*valeurs)
+            for valeurs in documents.values_list("id", "type_objet", "titre_index", "contenu_index")
+        ]
+        if cles:
+            with connection.cursor() as curseur:
+                curseur.execute(
+                    f"DELETE FROM {self.table} WHERE rowid IN ({', '.join(['%s'] * len(cles))})", cles
+                )
+
+    def _cles(self, requete, limite, ordre="rowid"):
+        with connection.cursor() as curseur:
+            curseur.execute(
+                f"SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s ORDER BY {ordre} LIMIT %s",
+                [requete, limite],
+            )
+            return [ligne[0] for ligne in curseur.fetchall()]
+
+    def classer(self, mots, criteres, limite):
+        requete = self._requete(mots, criteres)
+        cles = self._cles(requete, max(limite, CLASSEMENT_EXACT_MAX + 1))
+        if len(cles) <= CLASSEMENT_EXACT_MAX:
+            # Toutes les correspondances : classement exact par bm25
+            cles = self._cles(requete, limite, ordre=self.bm25)
+        else:
+            # Recherche large : les documents dont le titre correspond d'abord,
+            # puis les autres, chaque groupe dans l'ordre de l'index
+            titres = self._cles(self._requete(mots, criteres, colonne="titre_index"), limite)
+            vus = set(titres)
+            cles = (titres + [cle for cle in cles if cle not in vus])[:limite]
+        return [cle % CLE_DOCUMENT for cle in cles]
+
+    def compter(self, mots, criteres):
+        with connection.cursor() as curseur:
+            curseur.execute(
+                f"SELECT count(*) FROM {self.table} WHERE {self.table} MATCH %s", [self._requete(mots, criteres)]
+            )
+            return curseur.fetchone()[0]
+
+    def filtrer(self, documents, criteres):
+        if not criteres:
+            return documents
+        return documents.filter(id__in=RawSQL(
+            f"SELECT rowid %% {CLE_DOCUMENT} FROM {self.table} WHERE {self.table} MATCH %s",
+            [self._requete([], criteres)],
+        ))
+
+
+class MoteurPostgres:
+    """Colonne générée `vecteur` (poids A : titre, B : contenu), indexée en GIN."""
+
+    table = '"Appli_documentrecherche"'
+
+    def expression(self, mots):
+        return " & ".join([*mots[:-1], f"{mots[-1]}:*"])
+
+    @staticmethod
+    def parmi(ids):
+        return RawSQL("SELECT unnest(%s::bigint[])", [list(ids)])
+
+    def indexer(self, lignes):
+        pass  # colonne générée : calculée par PostgreSQL à l'écriture
+
+    def retirer(self, documents):
+        pass
+
+    def _requete(self, mots, criteres):
+        conditions, params = [], []
+        if mots:
+            conditions.append("vecteur @@ to_tsquery('simple', %s)")
+            params.append(self.expression(mots))
+        if criteres:
+            filtre, params_filtre = filtrer(DocumentRecherche.objects.all(), criteres).values("id").query.sql_with_params()
+            conditions.append(f"id IN ({filtre})")
+            params += list(params_filtre)
+        return f"FROM {self.table} WHERE " + (" AND ".join(conditions) or "TRUE"), params
+
+    def classer(self, mots, criteres, limite):
+        sql, params = self._requete(mots, criteres)
+        with connection.cursor() as curseur:
+            curseur.execute(
+                f"SELECT id {sql} ORDER BY ts_rank(vecteur, to_tsquery('simple', %s)) DESC, id LIMIT %s",
+                params + [self.expression(mots), limite],
+            )
+            return [ligne[0] for ligne in curseur.fetchall()]
+
+    def compter(self, mots, criteres):
+        sql, params = self._requete(mots, criteres)
+        with connection.cursor() as curseur:
+            curseur.execute(f"SELECT count(*) {sql}", params)
+            return curseur.fetchone()[0]
+
+    def filtrer(self, documents, criteres):
+        return filtrer(documents, criteres)
+
+
+MOTEURS = {
+    "sqlite": MoteurSQLite,
+    "postgresql": MoteurPostgres,
+}
+
+
+def parmi(ids):
+    """
+    Valeur d'un filtre `id__in` pour une longue liste d'ids : un seul paramètre
+    SQL quand la base a un moteur (l'ORM en prépare sinon un par id).
+    """
+    classe = MOTEURS.get(connection.vendor)
+    return list(ids) if classe is None else classe.parmi(ids)
+
+
+def moteur():
+    """Moteur plein texte de la base, None si elle n'en a pas (recherche par mots vide)."""
+    classe = MOTEURS.get(connection.vendor)
+    if classe is None:
+        logger.warning("Recherche plein texte non disponible pour « %s » : index plein texte ignoré.", connection.vendor)
+        return None
+    return classe()
+
+
+# -----------------------------
+# INDEXATION
+# -----------------------------
+
+@transaction.atomic
+def indexer(type_objet, ids):
+    """(Ré)indexe les objets `ids` de `type_objet` ; les objets supprimés sont retirés de l'index."""
+    modele, construire = CONSTRUCTEURS[type_objet]
+    ids = set(ids)
+    if not ids:
+        return 0
+    # Sans moteur, les documents (facettes, parcours) sont tenus à jour mais pas
+    # l'index plein texte : une sauvegarde du catalogue ne doit pas échouer
+    moteur_courant = moteur()
+
+    with lecture_primaire():
+        lignes = construire(ids)
+
+    anciens = DocumentRecherche.objects.filter(type_objet=type_objet, objet_id__in=ids)
+    if moteur_courant is not None:
+        moteur_courant.retirer(anciens)
+    anciens.delete()
+
+    documents = DocumentRecherche.objects.bulk_create([document for document, _ in lignes])
+    Liaison = DocumentRecherche.villes.through
+    Liaison.objects.bulk_create([
+        Liaison(documentrecherche_id=document.pk, ville_id=ville_id)
+        for document, (_, villes) in zip(documents, lignes)
+        for ville_id in villes
+    ])
+    if moteur_courant is not None:
+        moteur_courant.indexer([(document, villes) for document, (_, villes) in zip(documents, lignes)])
+    return len(documents)
+
+
+def reindexer(taille_lot=500):
+    """Reconstruit tout l'index. Retourne {type_objet: documents indexés}."""
+    moteur_courant = moteur()
+    totaux = {}
+    for type_objet, (modele, _) in CONSTRUCTEURS.items():
+        ids = list(modele.objects.order_by("pk").values_list("pk", flat=True))
+        totaux[type_objet] = sum(
+            indexer(type_objet, ids[debut:debut + taille_lot]) for debut in range(0, len(ids), taille_lot)
+        )
+        # Documents d'objets qui n'existent plus
+        orphelins = DocumentRecherche.objects.filter(type_objet=type_objet).exclude(objet_id__in=ids)
+        if moteur_courant is not None:
+            moteur_courant.retirer(orphelins)
+        orphelins.delete()
+    invalider_recherche()
+    return totaux
+
+
+# -----------------------------
+# VERSION DE L'INDEX
+# -----------------------------
+# Les résultats peuvent être mis en cache sous cette version : elle change
+# une fois les documents réindexés (et non dès la sauvegarde, comme la version
+# du catalogue), pour qu'aucun résultat antérieur à la réindexation ne soit
+# mis en cache sous la nouvelle version.
+
+CLE_VERSION_RECHERCHE = "recherche:version"
+
+
+def version_recherche():
+    cache = cache_catalogue()
+    version = cache.get(CLE_VERSION_RECHERCHE)
+    if version is None:
+        cache.add(CLE_VERSION_RECHERCHE, int(time() * 1000), timeout=None)
+        version = cache.get(CLE_VERSION_RECHERCHE)
+    return version
+
+
+def invalider_recherche():
+    cache = cache_catalogue()
+    try:
+        cache.incr(CLE_VERSION_RECHERCHE)
+    except ValueError:
+        cache.add(CLE_VERSION_RECHERCHE, int(time() * 1000), timeout=None)
+
+
+# -----------------------------
+# RECHERCHE
+# -----------------------------
+
+PAR_PAGE = 20
+PAR_PAGE_MAX = 50
+VILLES_FACETTE_MAX = 20
+
+# Les facettes d'une recherche sont comptées sur ses premiers documents dans
+# l'ordre des résultats (le total reste exact) : coût borné quel que soit le catalogue
+FACETTES_DOCUMENTS_MAX = 200
+
+# Facettes sans requête ni filtre (parcours du catalogue) : calculées une fois
+# par version de l'index
+CLE_FACETTES = "recherche:facettes:{version}:{type_objet}"
+
+LIBELLES_TYPE_PACK = dict(TYPE_PACK_CHOICES)
+LIBELLES_TRANCHE = {code: libelle for code, _, _, libelle in TRANCHES_PRIX}
+
+
+FACETTES = (
+    ("type_pack", LIBELLES_TYPE_PACK),
+    ("duree_jours", {}),
+    ("tranche_prix", LIBELLES_TRANCHE),
+)
+
+
+CHAMPS_CRITERES = {
+    "type_objet": "type_objet",
+    "type_pack": "type_pack",
+    "ville": "villes",
+    "duree": "duree_jours",
+    "tranche": "tranche_prix",
+}
+
+
+def filtrer(documents, criteres):
+    """Filtre `documents` par critères de facettes (clés de CHAMPS_CRITERES)."""
+    return documents.filter(**{CHAMPS_CRITERES[critere]: valeur for critere, valeur in criteres.items()})
+
+
+def _facettes(queryset):
+    """
+    {champ: [{valeur, libelle, nombre}]} pour FACETTES (valeurs vides exclues)
+    et nombre total de documents. Une seule requête groupée sur les trois
+    champs : les combinaisons sont peu nombreuses, les totaux par champ sont
+    faits en Python.
+    """
+    champs = [champ for champ, _ in FACETTES]
+    comptes = {champ: {} for champ in champs}
+    total = 0
+    for ligne in queryset.values(*champs).annotate(nombre=Count("id")).order_by():
+        total += ligne["nombre"]
+        for champ in champs:
+            comptes[champ][ligne[champ]] = comptes[champ].get(ligne[champ], 0) + ligne["nombre"]
+    facettes = {
+        champ: [
+            {"valeur": valeur, "libelle": libelles.get(valeur, valeur), "nombre": comptes[champ][valeur]}
+            for valeur in sorted(valeur for valeur in comptes[champ] if valeur not in ("", None))
+        ]
+        for champ, libelles in FACETTES
+    }
+    return facettes, total
+
+
+def compter_facettes(documents, ids=None):
+    """
+    (facettes, nombre de documents) de `documents` : FACETTES et villes
+    (VILLES_FACETTE_MAX). `ids`, ceux de `documents` quand ils sont connus,
+    évite aux villes une sous-requête sur les documents.
+    """
+    facettes, total = _facettes(documents)
+    # Sur la table de liaison (un document n'y a qu'une ligne par ville), triée en Python
+    liaisons = DocumentRecherche.villes.through.objects.filter(
+        documentrecherche__in=documents.values("id") if ids is None else ids
+    )
+    facettes["ville"] = sorted(
+        (
+            {"valeur": ville_id, "libelle": nom, "nombre": nombre}
+            for ville_id, nom, nombre in liaisons.values_list("ville_id", "ville__nom").annotate(nombre=Count("id")).order_by()
+        ),
+        key=lambda ligne: (-ligne["nombre"], ligne["libelle"]),
+    )[:VILLES_FACETTE_MAX]
+    return facettes, total
+
+
+def _facettes_catalogue(documents, type_objet):
+    cache = cache_catalogue()
+    cle = CLE_FACETTES.format(version=version_recherche(), type_objet=type_objet or "tous")
+    valeur = cache.get(cle)
+    if valeur is None:
+        valeur = compter_facettes(documents)
+        cache.set(cle, valeur, timeout=None)
+    return valeur
+
+
+def rechercher(q="", type_objet=None, type_pack=None, ville=None, duree=None, tranche=None, page=1, par_page=PAR_PAGE):
+    """
+    Documents correspondant à `q` (tous les termes, le dernier en préfixe),
+    filtrés par facettes et classés par pertinence (par titre sans requête).
+    Seuls les FACETTES_DOCUMENTS_MAX premiers documents (au moins jusqu'à la
+    page demandée) sont classés : ils donnent la page et les facettes, le
+    total est compté à part s'il y en a d'autres. Sans requête ni filtre,
+    facettes et total sont lus en cache.
+    """
+    criteres = {
+        critere: valeur
+        for critere, valeur in dict(type_objet=type_objet, type_pack=type_pack, ville=ville, duree=duree, tranche=tranche).items()
+        if valeur
+    }
+    page = max(page, 1)
+    par_page = max(1, min(par_page, PAR_PAGE_MAX))
+    decalage = (page - 1) * par_page
+    mots = termes(q)
+    # Un document de plus que nécessaire : signale qu'il en reste d'autres
+    limite = max(FACETTES_DOCUMENTS_MAX, decalage + par_page) + 1
+
+    if not mots and set(criteres) <= {"type_objet"}:
+        documents = filtrer(DocumentRecherche.objects.all(), criteres)
+        ids = list(documents.order_by("titre", "id").values_list("id", flat=True)[decalage:decalage + par_page])
+        facettes, total = _facettes_catalogue(documents, type_objet)
+        approximatives = False
+    else:
+        if mots:
+            moteur_courant = moteur()
+            classes = moteur_courant.classer(mots, criteres, limite) if moteur_courant is not None else []
+            total = len(classes) if len(classes) < limite else moteur_courant.compter(mots, criteres)
+        else:
+            # Filtres seuls, par titre : critères appliqués par l'index plein texte s'il y en a un
+            classe = MOTEURS.get(connection.vendor)
+            moteur_courant = classe() if classe is not None else None
+            documents = DocumentRecherche.objects.all()
+            documents = moteur_courant.filtrer(documents, criteres) if moteur_courant else filtrer(documents, criteres)
+            classes = list(documents.order_by("titre", "id").values_list("id", flat=True)[:limite])
+            if len(classes) < limite:
+                total = len(classes)
+            else:
+                total = moteur_courant.compter([], criteres) if moteur_courant else documents.count()
+        echantillon = classes[:FACETTES_DOCUMENTS_MAX]
+        facettes, _ = compter_facettes(DocumentRecherche.objects.filter(id__in=parmi(echantillon)), ids=parmi(echantillon))
+        approximatives = total > len(echantillon)
+        ids = classes[decalage:decalage + par_page]
+
+    # Villes des documents de la page, sans instancier de modèles (voir api.recherche)
+    villes = {}
+    liaisons = DocumentRecherche.villes.through.objects.filter(documentrecherche_id__in=ids).order_by("id")
+    for document_id, ville_id, nom in liaisons.values_list("documentrecherche_id", "ville_id", "ville__nom"):
+        villes.setdefault(document_id, []).append({"id": ville_id, "nom": nom})
+    documents = {d.pk: d for d in DocumentRecherche.objects.filter(pk__in=ids).defer("titre_index", "contenu_index")}
+    for document in documents.values():
+        document.villes_resultat = villes.get(document.pk, [])
+    return {
+        "requete": q,
+        "termes": mots,
+        "total": total,
+        "page": page,
+        "par_page": par_page,
+        "resultats": [documents[i] for i in ids if i in documents],
+        "facettes": facettes,
+        "facettes_approximatives": approximatives,
+    }
+
+
+# -----------------------------
+# SIGNAUX : INDEXATION INCRÉMENTALE
+# -----------------------------
+
+_en_attente = threading.local()
+
+
+def _planifier(type_objet, ids):
+    """Réindexe après validation ; plusieurs signaux d'une même transaction sont regroupés."""
+    file = getattr(_en_attente, "objets", None)
+    if file is None:
+        file = _en_attente.objets = set()
+    file.update((type_objet, pk) for pk in ids if pk is not None)
+    transaction.on_commit(_vider)
+
+
+def _vider():
+    file = getattr(_en_attente, "objets", None)
+    if not file:
+        return
+    _en_attente.objets = set()
+    par_type = {}
+    for type_objet, pk in file:
+        par_type.setdefault(type_objet, set()).add(pk)
+    for type_objet, ids in par_type.items():
+        indexer(type_objet, ids)
+    invalider_recherche()
+
+
+def _dependants(instance):
+    """(type_objet, ids) des documents qui reprennent le texte de `instance`."""
+    if isinstance(instance, Ville):
+        activites_complet = ActiviteComplet.objects.filter(villes=instance)
+        return [
+            ("ville", [instance.pk]),
+            ("activite_jour", instance.activites_jour.values_list("pk", flat=True)),
+            ("pack_jour", PackJour.objects.filter(activites__ville=instance).values_list("pk", flat=True)),
+            ("activite_complet", activites_complet.values_list("pk", flat=True)),
+            ("pack_complet", activites_complet.values_list("pack_id", flat=True)),
+        ]
+    if isinstance(instance, ActiviteJour):
+        return [
+            ("activite_jour", [instance.pk]),
+            ("pack_jour", instance.packs_jour.values_list("pk", flat=True)),
+        ]
+    if isinstance(instance, ActiviteComplet):
+        return [("activite_complet", [instance.pk]), ("pack_complet", [instance.pack_id])]
+    if isinstance(instance, PackComplet):
+        # Le nom et le type du pack sont repris par ses activités
+        return [("pack_complet", [instance.pk]), ("activite_complet", instance.activites.values_list("pk", flat=True))]
+    return [("pack_jour", [instance.pk])]
+
+
+def _objet_modifie(sender, instance, **kwargs):
+    for type_objet, ids in _dependants(instance):
+        _planifier(type_objet, list(ids))
+
+
+def _activites_pack_jour_modifiees(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if not reverse:
+        _planifier("pack_jour", [instance.pk])
+    else:
+        _planifier("pack_jour", pk_set if pk_set is not None else instance.packs_jour.values_list("pk", flat=True))
+
+
+def _villes_activite_complet_modifiees(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if not reverse:
+        activites = [instance.pk]
+        packs = [instance.pack_id]
+    else:
+        if pk_set is None:
+            pk_set = instance.activites_complet.values_list("pk", flat=True)
+        activites = list(pk_set)
+        packs = ActiviteComplet.objects.filter(pk__in=activites).values_list("pack_id", flat=True)
+    _planifier("activite_complet", activites)
+    _planifier("pack_complet", list(packs))
+
+
+TYPES_MODELES = {modele: type_objet for type_objet, (modele, _) in CONSTRUCTEURS.items()}
+
+# Suppression : les dépendants sont lus avant que la cascade n'efface les liaisons
+for _modele, _type in TYPES_MODELES.items():
+    post_save.connect(_objet_modifie, sender=_modele, dispatch_uid=f"recherche_save_{_type}")
+    pre_delete.connect(_objet_modifie, sender=_modele, dispatch_uid=f"recherche_delete_{_type}")
+
+m2m_changed.connect(_activites_pack_jour_modifiees, sender=PackJour.activites.through, dispatch_uid="recherche_m2m_pack_jour")
+m2m_changed.connect(_villes_activite_complet_modifiees, sender=ActiviteComplet.villes.through, dispatch_uid="recherche_m2m_activite_complet")
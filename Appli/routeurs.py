@@ -0,0 +1,70 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# -----------------------------
+# ROUTAGE PRIMAIRE / RÉPLIQUE
+# -----------------------------
+# Les lectures du catalogue (villes, packs, activités) partent vers l'alias
+# REPLIQUE quand il est configuré ; tout le reste (réservations, e-mails,
+# disponibilités, statistiques, comptes) et toutes les écritures restent sur
+# la base primaire.
+
+REPLIQUE = "replica"
+
+MODELES_CATALOGUE = {
+    "appli.ville",
+    "appli.activitejour",
+    "appli.activitecomplet",
+    "appli.packjour",
+    "appli.packcomplet",
+    # Tables de liaison ManyToMany du catalogue
+    "appli.packjour_activites",
+    "appli.activitecomplet_villes",
+}
+
+_lecture_primaire = ContextVar("lecture_primaire", default=False)
+
+
+@contextmanager
+def lecture_primaire():
+    """Force les lectures du catalogue sur la primaire (lire ses propres écritures)."""
+    jeton = _lecture_primaire.set(True)
+    try:
+        yield
+    finally:
+        _lecture_primaire.reset(jeton)
+
+
+def _cle(modele):
+    return f"{modele._meta.app_label}.{modele._meta.model_name}".lower()
+
+
+class CatalogueRouter:
+
+    def db_for_read(self, model, **hints):
+        if REPLIQUE not in settings.DATABASES or _cle(model) not in MODELES_CATALOGUE:
+            return None
+        # Dans une transaction, la réplique ne voit pas encore les écritures en cours
+        if _lecture_primaire.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return REPLIQUE
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # La réplique est une copie de la primaire : un pack lu sur la réplique
+        # peut être lié à une réservation enregistrée sur la primaire.
+        bases = {DEFAULT_DB_ALIAS, REPLIQUE}
+        if obj1._state.db in bases and obj2._state.db in bases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # La réplique reçoit le schéma par réplication
+        if db == REPLIQUE:
+            return False
+        return None
@@ -0,0 +1,34 @@
+import json
+from decimal import Decimal
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+
+try:
+    import orjson
+except ImportError:  # orjson est facultatif : repli sur l'encodeur de Django
+    orjson = None
+
+# -----------------------------
+# ENCODAGE JSON RAPIDE
+# -----------------------------
+# orjson (si installé) encode directement en octets, sans espaces ; dates et
+# UUID sont gérés nativement, les Decimal sont rendus en chaînes comme le
+# fait DjangoJSONEncoder. Le repli produit le même document.
+
+
+def _par_defaut(valeur):
+    if isinstance(valeur, Decimal):
+        return str(valeur)
+    raise TypeError(f"Type non sérialisable : {type(valeur).__name__}")
+
+
+def encoder_json(donnees):
+    """Document JSON compact (bytes, UTF-8)."""
+    if orjson is not None:
+        return orjson.dumps(donnees, default=_par_defaut)
+    return json.dumps(donnees, cls=DjangoJSONEncoder, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def reponse_json(donnees, status=200):
+    return HttpResponse(encoder_json(donnees), status=status, content_type="application/json")
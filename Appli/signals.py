@@ -0,0 +1,12 @@
+from django.dispatch import Signal
+
+# Émis par ReservationQuerySet.update() quand le statut de plusieurs
+# réservations change en une seule requête (actions admin, imports).
+# Arguments : sender (modèle), pks (liste des réservations réellement modifiées),
+# anciens_statuts ({pk: statut avant la mise à jour}).
+statuts_modifies = Signal()
+
+# Émis quand le total d'une réservation est recalculé par UPDATE (options
+# ajoutées, modifiées ou supprimées), donc sans post_save.
+# Arguments : sender (modèle de réservation), pk, ancien_total.
+totaux_modifies = Signal()
@@ -0,0 +1,45 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.utils.html import format_html
+
+from Appli.images import derives_de, srcset as construire_srcset
+
+register = template.Library()
+
+
+def _nom(image):
+    """Nom dans le stockage d'un ImageFieldFile ou d'une chaîne (instantané du catalogue)."""
+    return getattr(image, "name", image) or ""
+
+
+@register.simple_tag
+def image_responsive(image, alt="", sizes="100vw", classe=""):
+    """
+    <picture> avec une source WebP et un srcset de repli : le navigateur ne
+    télécharge que la largeur adaptée à l'affichage. Tant que les dérivés ne
+    sont pas générés, l'image d'origine est servie telle quelle.
+
+        {% load images %}
+        {% image_responsive pack.image alt=pack.nom sizes="(min-width: 992px) 33vw, 100vw" %}
+    """
+    nom = _nom(image)
+    if not nom:
+        return ""
+    original = default_storage.url(nom)
+    derives = derives_de(nom)
+    if not derives:
+        return format_html('<img src="{}" alt="{}" class="{}" loading="lazy">', original, alt, classe)
+
+    repli = next(d["format"] for d in derives if d["format"] != "webp")
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}" class="{}" loading="lazy"></picture>',
+        construire_srcset(derives, "webp"), sizes,
+        original, construire_srcset(derives, repli), sizes, alt, classe,
+    )
+
+
+@register.filter
+def srcset(image, format_image="webp"):
+    """Valeur d'attribut srcset d'une image : {{ pack.image|srcset }} ou {{ pack.image|srcset:"jpeg" }}."""
+    return construire_srcset(derives_de(_nom(image)), format_image)
@@ -1,3 +1,1591 @@
-from django.test import TestCase
+import os
+import shutil
+import sqlite3
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import SkipTest, mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .catalogue import cache_catalogue, obtenir_catalogue
+from .chronologie import chronologie_reservations
+from .models import (
+    Ville,
+    ActiviteJour,
+    ActiviteComplet,
+    PackJour,
+    PackComplet,
+    ReservationPackJour,
+    ReservationPackComplet,
+    OptionReservation,
+    EmailSortant,
+    StatistiqueJournaliere,
+    DocumentRecherche,
+    Disponibilite,
+)
+from .notification.file_envoi import envoyer_lot, mettre_en_file
+from .rapports import rapport
+from .disponibilites import PlacesInsuffisantes, disponibilites
+
+User = get_user_model()
+
+
+# -----------------------------
+# CATALOGUE (PAGE D'ACCUEIL)
+# -----------------------------
+
+class CatalogueTests(TestCase):
+
+    def setUp(self):
+        cache_catalogue().clear()
+        self.ville = Ville.objects.create(nom="Marrakech")
+        activite = ActiviteJour.objects.create(nom="Jardin Majorelle", ville=self.ville)
+        pack = PackJour.objects.create(nom="Zagora express", prix_mad=500)
+        pack.activites.add(activite)
+        PackComplet.objects.create(nom="Atlas", prix_mad=3000)
+
+    def test_accueil_sans_requete_a_chaud(self):
+        self.client.get(reverse("accueil"))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("accueil"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p["nom"] for p in response.context["packs"]], ["Atlas", "Zagora express"])
+
+    def test_modification_invalide_instantane(self):
+        version = obtenir_catalogue()["version"]
+        PackComplet.objects.create(nom="Désert", prix_mad=4000)
+        catalogue = obtenir_catalogue()
+        self.assertNotEqual(catalogue["version"], version)
+        self.assertIn("Désert", [p["nom"] for p in catalogue["packs"]])
+
+    def test_ajout_activite_m2m_invalide_instantane(self):
+        pack = PackJour.objects.get(nom="Zagora express")
+        obtenir_catalogue()
+        autre = ActiviteJour.objects.create(nom="Médina", ville=self.ville)
+        pack.activites.add(autre)
+        activites = next(p for p in obtenir_catalogue()["packs"] if p["type"] == "jour" and p["id"] == pack.id)["activites"]
+        self.assertEqual(len(activites), 2)
+
+
+# -----------------------------
+# PACK PAR DÉFAUT DES RÉSERVATIONS
+# -----------------------------
+
+class PackParDefautTests(TestCase):
+
+    def setUp(self):
+        cache_catalogue().clear()
+        self.pack_jour = PackJour.objects.create(nom="Zagora express")
+        self.pack_complet = PackComplet.objects.create(nom="Atlas")
+
+    def test_instanciation_sans_requete(self):
+        ReservationPackJour()
+        ReservationPackComplet()
+        with self.assertNumQueries(0):
+            reservations = [ReservationPackJour() for _ in range(5000)]
+            reservations += [ReservationPackComplet() for _ in range(5000)]
+        self.assertEqual(reservations[0].pack_id, self.pack_jour.id)
+        self.assertEqual(reservations[-1].pack_id, self.pack_complet.id)
+
+    def test_invalide_quand_les_packs_changent(self):
+        self.assertEqual(ReservationPackJour().pack_id, self.pack_jour.id)
+        self.pack_jour.delete()
+        self.assertIsNone(ReservationPackJour().pack_id)
+
+    @override_settings(RESERVATION_PACK_PAR_DEFAUT=False)
+    def test_mode_sans_valeur_par_defaut(self):
+        with self.assertNumQueries(0):
+            self.assertIsNone(ReservationPackComplet().pack_id)
+
+
+# -----------------------------
+# FILE D'ENVOI DES E-MAILS
+# -----------------------------
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class FileEnvoiTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="client@example.com", password="Motdepasse1!", prenom="Samir", nom="Alaoui", tel="0600000000"
+        )
+        self.pack = PackJour.objects.create(nom="Zagora express", prix_mad=500)
+
+    def test_reservation_met_en_file_sans_envoyer(self):
+        self.client.force_login(self.user)
+        response = self.client.post(reverse("reservation_jour_base"), {
+            "pack": self.pack.id,
+            "nb_personne": 2,
+            "devise": "MAD",
+            "date": (timezone.now().date() + timedelta(days=5)).isoformat(),
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(EmailSortant.objects.filter(statut='en_attente').count(), 2)
+
+        call_command("run_mail_worker", "--une-fois", stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertFalse(EmailSortant.objects.filter(statut='en_attente').exists())
+
+    def test_echec_replanifie_avec_backoff(self):
+        email = mettre_en_file("Sujet", "<p>Corps</p>", ["client@example.com"])
+
+        class ConnexionEnPanne:
+            def open(self):
+                pass
+
+            def close(self):
+                pass
+
+            def send_messages(self, messages):
+                raise OSError("relais indisponible")
+
+        self.assertEqual(envoyer_lot(connexion=ConnexionEnPanne(), max_tentatives=2), 0)
+        email.refresh_from_db()
+        self.assertEqual((email.statut, email.tentatives), ('en_attente', 1))
+        self.assertGreater(email.prochaine_tentative, timezone.now())
+
+        EmailSortant.objects.update(prochaine_tentative=timezone.now())
+        envoyer_lot(connexion=ConnexionEnPanne(), max_tentatives=2)
+        email.refresh_from_db()
+        self.assertEqual(email.statut, 'echec')
+
+    def test_relais_injoignable_replanifie_sans_renvoyer(self):
+        premier = mettre_en_file("Premier", "<p>1</p>", ["client@example.com"])
+        suivants = [mettre_en_file(f"Suivant {i}", "<p>2</p>", ["client@example.com"]) for i in range(2)]
+        envoyes = []
+
+        class RelaisQuiCoupe:
+            ouvertures = 0
+
+            def open(self):
+                self.ouvertures += 1
+                if self.ouvertures > 1:
+                    raise OSError("relais injoignable")
+
+            def close(self):
+                pass
+
+            def send_messages(self, messages):
+                from smtplib import SMTPServerDisconnected
+                if envoyes:
+                    raise SMTPServerDisconnected("coupure")
+                envoyes.extend(messages)
+                return len(messages)
+
+        # Ni exception ni retour arrière : le premier e-mail reste envoyé, les autres sont replanifiés
+        self.assertEqual(envoyer_lot(connexion=RelaisQuiCoupe()), 1)
+        premier.refresh_from_db()
+        self.assertEqual(premier.statut, 'envoye')
+        for email in suivants:
+            email.refresh_from_db()
+            self.assertEqual((email.statut, email.tentatives), ('en_attente', 1))
+            self.assertGreater(email.prochaine_tentative, timezone.now())
+        self.assertEqual(envoyer_lot(connexion=RelaisQuiCoupe()), 0)
+
+    def test_lot_reserve_hors_transaction(self):
+        from .notification.file_envoi import reserver_lot
+        mettre_en_file("Sujet", "<p>Corps</p>", ["client@example.com"])
+        maintenant = timezone.now()
+        self.assertEqual(len(reserver_lot(10, maintenant)), 1)
+        # Déjà réservé par un autre worker : bail en cours
+        self.assertEqual(reserver_lot(10, maintenant), [])
+
+
+# -----------------------------
+# CHANGEMENT DE STATUT
+# -----------------------------
+
+class ChangementStatutTests(TestCase):
+
+    def setUp(self):
+        user = User.objects.create_user(
+            email="client@example.com", password="Motdepasse1!", prenom="Samir", nom="Alaoui", tel="0600000000"
+        )
+        pack = PackComplet.objects.create(nom="Atlas", prix_mad=3000)
+        self.reservations = [ReservationPackComplet.objects.create(user=user, pack=pack) for _ in range(3)]
+
+    def test_detection_sans_requete_supplementaire(self):
+        reservation = ReservationPackComplet.objects.select_related('user', 'pack').get(pk=self.reservations[0].pk)
+        with CaptureQueriesContext(connection) as sans_changement:
+            reservation.save()
+        self.assertEqual(EmailSortant.objects.count(), 0)
+
+        reservation.statut = 'validée'
+        # Seul l'INSERT dans la file d'envoi s'ajoute : pas de SELECT de l'ancien statut
+        with CaptureQueriesContext(connection) as avec_changement:
+            reservation.save()
+        self.assertEqual(len(avec_changement), len(sans_changement) + 1)
+        self.assertEqual(EmailSortant.objects.count(), 1)
+
+    def test_update_en_masse_notifie_par_lot(self):
+        self.reservations[0].statut = 'validée'
+        self.reservations[0].save()
+        EmailSortant.objects.all().delete()
+
+        lignes = ReservationPackComplet.objects.update(statut='validée')
+        self.assertEqual(lignes, 3)
+        self.assertEqual(EmailSortant.objects.count(), 2)
+
+
+# -----------------------------
+# CHRONOLOGIE (MON ACTIVITÉ)
+# -----------------------------
+
+class ChronologieTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="client@example.com", password="Motdepasse1!", prenom="Samir", nom="Alaoui", tel="0600000000"
+        )
+        pack_jour = PackJour.objects.create(nom="Zagora express", prix_mad=500, prix_eur=50)
+        pack_complet = PackComplet.objects.create(nom="Atlas", prix_mad=3000)
+        debut = timezone.now() - timedelta(days=30)
+        for i in range(5):
+            ReservationPackJour.objects.create(
+                user=self.user, pack=pack_jour, nb_personne=2, devise="EUR",
+                date_reservation=debut + timedelta(days=2 * i),
+            )
+            reservation = ReservationPackComplet.objects.create(
+                user=self.user, pack=pack_complet, date_reservation=debut + timedelta(days=2 * i + 1),
+            )
+        reservation.options.create(nom_option="Dîner", prix_mad=200, quantite=2)
+
+    def test_pagination_par_curseur_en_une_requete(self):
+        vues = []
+        curseur = None
+        while True:
+            with self.assertNumQueries(1):
+                lignes, curseur = chronologie_reservations(self.user, apres=curseur, taille=3)
+            vues += lignes
+            if curseur is None:
+                break
+
+        self.assertEqual(len(vues), 10)
+        dates = [ligne["date_reservation"] for ligne in vues]
+        self.assertEqual(dates, sorted(dates, reverse=True))
+        self.assertEqual(vues[0]["pack_nom"], "Atlas")
+        self.assertEqual(vues[0]["total"], 3400)
+        self.assertEqual(vues[1]["total"], 100)
+        self.assertEqual(vues[1]["type_reservation"], "Pack 1 Jour")
+
+    def test_curseur_sans_caractere_a_encoder(self):
+        from .chronologie import decoder_curseur
+        lignes, curseur = chronologie_reservations(self.user, taille=3)
+        # Pas de « +00:00 » : le curseur survit à une URL non encodée
+        self.assertRegex(curseur, r"^\d+~complet~\d+$")
+        self.assertEqual(decoder_curseur(curseur)[0], lignes[-1]["date_reservation"])
+        self.assertIsNone(decoder_curseur("2025-01-01T10:00:00 00:00~jour~1"))
+
+    def test_vue_mon_activite(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("mon_activite"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["reservations"]), 10)
+
+
+# -----------------------------
+# TOTAUX DES RÉSERVATIONS
+# -----------------------------
+
+class MontantTotalTests(TestCase):
+
+    def setUp(self):
+        self.pack = PackComplet.objects.create(nom="Atlas", prix_mad=3000, prix_eur=300)
+        self.reservation = ReservationPackComplet.objects.create(pack=self.pack, nb_personne=2, devise="EUR")
+
+    def test_total_stocke_suit_options_et_pack(self):
+        self.assertEqual(self.reservation.montant_total, 600)
+
+        option = self.reservation.options.create(nom_option="Hammam", prix_mad=200, prix_eur=20, quantite=3)
+        self.reservation.refresh_from_db()
+        self.assertEqual(self.reservation.montant_total, 660)
+
+        self.reservation.devise = "MAD"
+        self.reservation.save()
+        self.assertEqual(self.reservation.montant_total, 6600)
+
+        option.delete()
+        self.reservation.refresh_from_db()
+        self.assertEqual(self.reservation.montant_total, 6000)
+
+    def test_option_ne_retarife_pas_le_pack(self):
+        self.pack.prix_eur = 500
+        self.pack.save()
+        self.reservation.options.create(nom_option="Hammam", prix_mad=200, prix_eur=20, quantite=1)
+        self.reservation.refresh_from_db()
+        # Pack au tarif de la réservation (2 × 300 €), pas au nouveau tarif
+        self.assertEqual((self.reservation.montant_pack, self.reservation.montant_total), (600, 620))
+
+    def test_with_totals_en_sql(self):
+        self.reservation.options.create(nom_option="Dîner", prix_eur=40, quantite=1)
+        ReservationPackComplet.objects.create(pack=self.pack, nb_personne=1)
+        with self.assertNumQueries(1):
+            totaux = {r.pk: r.total_calcule for r in ReservationPackComplet.objects.with_totals()}
+        self.assertEqual(totaux[self.reservation.pk], 640)
+        self.assertEqual(sorted(totaux.values()), [640, 3000])
+
+
+# -----------------------------
+# STATISTIQUES ET RAPPORTS
+# -----------------------------
+
+class RapportsTests(TestCase):
+
+    def setUp(self):
+        self.ville = Ville.objects.create(nom="Marrakech")
+        self.pack_jour = PackJour.objects.create(nom="Zagora express", prix_mad=500)
+        self.pack_jour.activites.add(ActiviteJour.objects.create(nom="Médina", ville=self.ville))
+        self.pack_complet = PackComplet.objects.create(nom="Atlas", type_pack="AVENTURE", prix_mad=3000)
+        self.jour = timezone.now() - timedelta(days=3)
+
+    def test_agregats_mis_a_jour_a_l_enregistrement(self):
+        ReservationPackJour.objects.create(pack=self.pack_jour, nb_personne=2, date_reservation=self.jour)
+        reservation = ReservationPackComplet.objects.create(
+            pack=self.pack_complet, nb_personne=1, date_reservation=self.jour
+        )
+        periode = (self.jour.date(), self.jour.date())
+
+        with self.assertNumQueries(1):
+            par_type = rapport(*periode, par="type_reservation")
+        self.assertEqual([(l["type_reservation"], l["chiffre_affaires"]) for l in par_type],
+                         [("complet", 3000), ("jour", 1000)])
+        self.assertEqual(rapport(*periode, par="ville")[0]["nb_personnes"], 2)
+
+        reservation.statut = "annulé"
+        reservation.save()
+        self.assertEqual(rapport(*periode, par="type_pack"), [])
+
+    def test_deplacement_de_jour(self):
+        reservation = ReservationPackJour.objects.create(pack=self.pack_jour, date_reservation=self.jour)
+        reservation = ReservationPackJour.objects.get(pk=reservation.pk)
+        reservation.date_reservation = timezone.now()
+        reservation.save()
+        self.assertEqual(list(StatistiqueJournaliere.objects.values_list("jour", flat=True)), [timezone.localdate()])
+
+    def test_mise_a_jour_incrementale(self):
+        periode = (self.jour.date(), self.jour.date())
+        premiere = ReservationPackJour.objects.create(pack=self.pack_jour, nb_personne=2, date_reservation=self.jour)
+        # Deuxième réservation du jour : UPDATE … + delta, sans relire la journée
+        with CaptureQueriesContext(connection) as requetes:
+            ReservationPackJour.objects.create(pack=self.pack_jour, nb_personne=1, date_reservation=self.jour)
+        self.assertFalse([q for q in requetes.captured_queries if "reservationpackjour" in q["sql"].lower()
+                          and q["sql"].lstrip().upper().startswith("SELECT")])
+        self.assertEqual(StatistiqueJournaliere.objects.count(), 1)
+
+        option = OptionReservation.objects.create(
+            reservation_jour=premiere, nom_option="Guide", prix_mad=100, quantite=2
+        )
+        ligne, = rapport(*periode, par="ville")
+        self.assertEqual((ligne["nb_reservations"], ligne["nb_personnes"], ligne["chiffre_affaires"]), (2, 3, 1700))
+
+        # Suppression avec ses options : la contribution complète est retirée une seule fois
+        ReservationPackJour.objects.get(pk=premiere.pk).delete()
+        ligne, = rapport(*periode, par="pack")
+        self.assertEqual((ligne["nb_reservations"], ligne["chiffre_affaires"]), (1, 500))
+        self.assertFalse(OptionReservation.objects.filter(pk=option.pk).exists())
+
+    def test_annulation_en_masse(self):
+        ReservationPackComplet.objects.create(pack=self.pack_complet, nb_personne=1, date_reservation=self.jour)
+        periode = (self.jour.date(), self.jour.date())
+        ReservationPackComplet.objects.update(statut="annulé")
+        self.assertEqual(rapport(*periode, par="type_pack"), [])
+        ReservationPackComplet.objects.update(statut="demande")
+        self.assertEqual(rapport(*periode, par="type_pack")[0]["chiffre_affaires"], 3000)
+
+    def test_villes_et_nom_suivent_le_pack(self):
+        from .rapports import recalculer_jours
+        ReservationPackJour.objects.create(pack=self.pack_jour, nb_personne=2, date_reservation=self.jour)
+        periode = (self.jour.date(), self.jour.date())
+
+        def villes():
+            return [(l["ville__nom"], l["nb_personnes"]) for l in rapport(*periode, par="ville")]
+
+        fes = Ville.objects.create(nom="Fès")
+        self.pack_jour.activites.add(ActiviteJour.objects.create(nom="Tanneries", ville=fes))
+        self.assertEqual(villes(), [("Marrakech", 2), ("Fès", 2)])
+
+        medina = ActiviteJour.objects.get(nom="Médina")
+        medina.ville = fes
+        medina.save()
+        self.assertEqual(villes(), [("Fès", 2)])
+
+        self.pack_jour.activites.clear()
+        self.assertEqual(villes(), [])
+        recalculer_jours(periode[:1])
+        self.assertEqual(villes(), [])
+
+        ReservationPackComplet.objects.create(pack=self.pack_complet, nb_personne=3, date_reservation=self.jour)
+        ActiviteComplet.objects.create(nom="Ourika", pack=self.pack_complet).villes.add(self.ville)
+        self.assertEqual(villes(), [("Marrakech", 3)])
+
+        self.pack_jour.nom = "Zagora by night"
+        self.pack_jour.save()
+        self.assertEqual([l["pack_nom"] for l in rapport(*periode, par="pack")], ["Atlas", "Zagora by night"])
+
+    def test_endpoint_reserve_au_staff(self):
+        url = reverse("rapport_chiffre_affaires")
+        self.assertEqual(self.client.get(url).status_code, 302)
+        staff = User.objects.create_user(email="staff@example.com", password="x", is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get(url, {"par": "pack"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(url, {"par": "inconnu"}).status_code, 400)
+
+
+# -----------------------------
+# CAPACITÉ ET DISPONIBILITÉS
+# -----------------------------
+
+class DisponibilitesTests(TestCase):
+
+    def setUp(self):
+        self.pack = PackComplet.objects.create(nom="Atlas", prix_mad=3000, capacite_journaliere=5)
+        self.debut = timezone.localdate() + timedelta(days=10)
+        self.fin = self.debut + timedelta(days=2)
+
+    def reserver(self, nb_personne, **kwargs):
+        return ReservationPackComplet.objects.create(
+            pack=self.pack, nb_personne=nb_personne, date_debut=self.debut, date_fin=self.fin, **kwargs
+        )
+
+    def test_surreservation_impossible(self):
+        self.reserver(4)
+        with self.assertRaises(PlacesInsuffisantes):
+            self.reserver(2)
+        self.assertEqual(ReservationPackComplet.objects.count(), 1)
+        self.assertEqual(set(disponibilites(self.pack, self.debut, self.fin).values()), {1})
+
+    def test_calendrier_en_une_requete(self):
+        self.reserver(2)
+        with self.assertNumQueries(1):
+            self.assertEqual(set(disponibilites(self.pack, self.debut, self.fin).values()), {3})
+
+    def test_calendrier_sans_ecriture(self):
+        self.reserver(2)
+        lignes = Disponibilite.objects.count()
+        with self.assertNumQueries(2):
+            calendrier = disponibilites(self.pack, self.debut - timedelta(days=10), self.debut + timedelta(days=19))
+        self.assertEqual(len(calendrier), 30)
+        self.assertEqual(calendrier[self.debut], 3)
+        self.assertEqual(calendrier[self.debut - timedelta(days=1)], 5)
+        self.assertEqual(Disponibilite.objects.count(), lignes)
+
+    def test_annulation_et_suppression_liberent_les_places(self):
+        reservation = self.reserver(5)
+        reservation.statut = "annulé"
+        reservation.save()
+        self.assertEqual(disponibilites(self.pack, self.debut, self.debut)[self.debut], 5)
+
+        autre = self.reserver(3)
+        # Réactivation en masse impossible : plus que 2 places, tout est annulé
+        with self.assertRaises(PlacesInsuffisantes):
+            ReservationPackComplet.objects.filter(pk=reservation.pk).update(statut="validée")
+        reservation.refresh_from_db()
+        self.assertEqual(reservation.statut, "annulé")
+
+        autre.delete()
+        self.assertEqual(disponibilites(self.pack, self.debut, self.debut)[self.debut], 5)
+
+    def test_changement_de_capacite(self):
+        self.reserver(2)
+        self.pack.capacite_journaliere = 10
+        self.pack.save()
+        self.assertEqual(disponibilites(self.pack, self.debut, self.debut)[self.debut], 8)
+
+
+# -----------------------------
+# API : CALENDRIER DES DISPONIBILITÉS
+# -----------------------------
+
+class ApiDisponibilitesTests(TestCase):
+
+    def setUp(self):
+        self.pack = PackJour.objects.create(nom="Zagora express", prix_mad=500, capacite_journaliere=4)
+        self.jour = timezone.localdate() + timedelta(days=3)
+        self.url = reverse("api_disponibilites_pack", args=["jour", self.pack.pk])
+        self.params = {"from": self.jour.isoformat(), "to": (self.jour + timedelta(days=6)).isoformat()}
+
+    def test_calendrier_etag_et_304(self):
+        ReservationPackJour.objects.create(pack=self.pack, nb_personne=3, date=self.jour)
+        response = self.client.get(self.url, self.params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["places"], [1, 4, 4, 4, 4, 4, 4])
+        self.assertIn("max-age", response["Cache-Control"])
+
+        with self.assertNumQueries(1):
+            revalidation = self.client.get(self.url, self.params, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(revalidation.status_code, 304)
+
+        ReservationPackJour.objects.create(pack=self.pack, nb_personne=1, date=self.jour)
+        apres = self.client.get(self.url, self.params, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(apres.status_code, 200)
+        self.assertEqual(apres.json()["places"][0], 0)
+
+    def test_sauvegarde_admin_n_ecrase_pas_la_version(self):
+        pack = PackJour.objects.get(pk=self.pack.pk)
+        ReservationPackJour.objects.create(pack=self.pack, nb_personne=1, date=self.jour)
+        pack.nom = "Zagora"
+        pack.save()
+        pack.refresh_from_db()
+        self.assertEqual(pack.version_disponibilite, 1)
+
+    def test_parametres_invalides(self):
+        self.assertEqual(self.client.get(self.url, {"from": "demain"}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {"from": "9999-12-31"}).status_code, 400)
+        hier = timezone.localdate() - timedelta(days=1)
+        self.assertEqual(self.client.get(self.url, {"from": hier.isoformat()}).status_code, 400)
+        self.assertEqual(self.client.get(reverse("api_disponibilites_pack", args=["autre", 1])).status_code, 404)
+
+
+# -----------------------------
+# BANC D'ESSAI
+# -----------------------------
+
+class BenchTests(TestCase):
+
+    def test_percentile(self):
+        from .percentiles import percentile
+        self.assertEqual(percentile([4, 1, 3, 2], 50), 2.5)
+        self.assertEqual(percentile(range(101), 95), 95)
+
+    def test_executer_mesure_tous_les_scenarios(self):
+        from .bench import executer, CHANGELISTS_ADMIN, GABARITS_SITE
+        resultats = executer(iterations=3, echauffement=1, villes=2, packs=3, activites=2, utilisateurs=2, reservations=2)
+
+        scenarios = resultats["resultats"]
+        # Chaque gabarit est mesuré compilé (chargeur en cache) et recompilé à chaque rendu
+        self.assertEqual(len(scenarios), 4 + len(CHANGELISTS_ADMIN) + 2 * len(GABARITS_SITE))
+        self.assertTrue(all(s["iterations"] == 3 and s["p50_ms"] <= s["p99_ms"] for s in scenarios.values()))
+        # Les POST enregistrent réellement des réservations (pas de formulaire réaffiché)
+        self.assertEqual(ReservationPackJour.objects.count(), 2 * 2 + 1 + 3)
+        # Budgets de requêtes : l'accueil est servi depuis le cache, la chronologie en requêtes constantes
+        self.assertEqual(scenarios["home_page"]["requetes"]["max"], 0)
+        self.assertLessEqual(scenarios["mon_activite"]["requetes"]["max"], 5)
+        self.assertEqual(scenarios["gabarit_accueil"]["requetes"]["max"], 0)
+
+    def test_executer_import(self):
+        from .bench import executer_import
+        resultats = executer_import(paquets=2, taille_lot=20, echauffement=1)
+        self.assertEqual(resultats["resultats"]["import_reservations"]["iterations"], 2)
+        self.assertEqual(ReservationPackJour.objects.count() + ReservationPackComplet.objects.count(), 3 * 20)
+        self.assertGreater(resultats["reservations_par_seconde"], 0)
+
+    def test_executer_export(self):
+        from .bench import executer_export
+        resultats = executer_export(reservations=30, iterations=1, echauffement=0)
+        self.assertEqual(set(resultats["resultats"]), {"export_csv_flux", "export_csv_tablib"})
+        self.assertEqual(resultats["resultats"]["export_csv_flux"]["requetes"]["max"], 1)
+        self.assertEqual(set(resultats["pic_memoire_mo"]), set(resultats["resultats"]))
+
+
+# -----------------------------
+# PROFILAGE SQL
+# -----------------------------
+
+@override_settings(PROFILAGE_SQL=True, PROFILAGE_SQL_STRICT=True)
+class ProfilageTests(TestCase):
+
+    def setUp(self):
+        from .profilage import reinitialiser
+        reinitialiser()
+        self.user = User.objects.create_user(email="perf@test.com", password="pass", prenom="P", nom="F", tel="0600000000")
+
+    def test_server_timing_et_page_perf(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("mon_activite"))
+        self.assertIn("sql;dur=", response["Server-Timing"])
+        self.assertIn("tpl;dur=", response["Server-Timing"])
+
+        self.user.is_staff = True
+        self.user.save()
+        vues = self.client.get(reverse("perf"), {"format": "json"}).json()["vues"]
+        self.assertEqual([ligne["vue"] for ligne in vues], ["mon_activite"])
+        self.assertEqual(self.client.get(reverse("perf")).status_code, 200)
+
+    def test_vues_auth_profilees_admin_exclue(self):
+        from .profilage import routes_profilees
+        # Vue de django.contrib.auth montée par authUser.urls
+        self.assertIn("sql;dur=", self.client.get(reverse("login"))["Server-Timing"])
+        self.assertNotIn("Server-Timing", self.client.get(reverse("admin:login")))
+        self.assertIn("auth/login/", routes_profilees(settings.ROOT_URLCONF))
+
+    def test_toutes_les_bases_mesurees(self):
+        from contextlib import nullcontext
+        from django.db import connections
+        from .profilage import Mesure
+        replique = mock.Mock(**{"execute_wrapper.return_value": nullcontext()})
+        with mock.patch.object(connections, "all", return_value=[connection, replique]):
+            self.client.get(reverse("login"))
+        self.assertIsInstance(replique.execute_wrapper.call_args.args[0], Mesure)
+
+    def test_budget_depasse_fait_echouer(self):
+        from .profilage import BudgetRequetesDepasse, empreinte
+        self.assertEqual(empreinte("id IN (%s, %s)"), empreinte("id IN (%s)"))
+
+        from . import views
+        self.client.force_login(self.user)
+        self.client.get(reverse("mon_activite"))
+        with mock.patch.object(views.mon_activite, "budget_requetes", 1):
+            with self.assertRaises(BudgetRequetesDepasse):
+                self.client.get(reverse("mon_activite"))
+
+
+# -----------------------------
+# ADMIN : LISTES EN REQUÊTES CONSTANTES
+# -----------------------------
+
+class AdminChangelistTests(TestCase):
+
+    MODELES = (
+        "reservationpackjour", "reservationpackcomplet", "activitejour",
+        "activitecomplet", "optionreservation", "packjour",
+    )
+
+    def setUp(self):
+        self.staff = User.objects.create_superuser(email="admin@test.com", password="pass", prenom="A", nom="D", tel="0600000000")
+        self.client.force_login(self.staff)
+
+    def _ajouter_lignes(self, n):
+        for i in range(n):
+            ville = Ville.objects.create(nom=f"Ville {Ville.objects.count()}")
+            activite = ActiviteJour.objects.create(nom="Souk", ville=ville)
+            pack_jour = PackJour.objects.create(nom=f"Jour {i}")
+            pack_jour.activites.add(activite)
+            pack_complet = PackComplet.objects.create(nom=f"Complet {i}")
+            ActiviteComplet.objects.create(nom="Étape", pack=pack_complet)
+            user = User.objects.create_user(email=f"c{ville.pk}@test.com", password="pass", prenom="C", nom="L", tel="0600000000")
+            reservation_jour = ReservationPackJour.objects.create(user=user, pack=pack_jour)
+            reservation_complet = ReservationPackComplet.objects.create(user=user, pack=pack_complet)
+            OptionReservation.objects.create(reservation_jour=reservation_jour, nom_option="Dîner")
+            OptionReservation.objects.create(reservation_complet=reservation_complet, nom_option="Guide")
+
+    def _requetes(self):
+        comptes = {}
+        for modele in self.MODELES:
+            with CaptureQueriesContext(connection) as capture:
+                response = self.client.get(reverse(f"admin:Appli_{modele}_changelist"))
+            self.assertEqual(response.status_code, 200)
+            comptes[modele] = len(capture.captured_queries)
+        return comptes
+
+    def test_nombre_de_requetes_independant_du_nombre_de_lignes(self):
+        self._ajouter_lignes(2)
+        avant = self._requetes()
+        self._ajouter_lignes(10)
+        self.assertEqual(self._requetes(), avant)
+
+    def test_estimation_lue_apres_analyze(self):
+        from .admin import estimation_lignes
+        if connection.vendor != "sqlite":
+            self.skipTest("sqlite_stat1 propre à SQLite.")
+        self._ajouter_lignes(3)
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        # Tables indexées : le nombre vient des lignes d'index de sqlite_stat1
+        self.assertEqual(estimation_lignes(ReservationPackJour), 3)
+        self.assertEqual(estimation_lignes(OptionReservation), 6)
+
+    def test_compte_estime_sur_grande_table(self):
+        from .admin import PaginateurEstime
+        self._ajouter_lignes(1)
+        with mock.patch("Appli.admin.estimation_lignes", return_value=50000):
+            self.assertEqual(PaginateurEstime(ReservationPackJour.objects.order_by("pk"), 100).count, 50000)
+            # Liste filtrée : compte exact
+            self.assertEqual(PaginateurEstime(ReservationPackJour.objects.filter(devise="MAD").order_by("pk"), 100).count, 1)
+
+
+# -----------------------------
+# INDEX ET PLANS D'EXÉCUTION
+# -----------------------------
+
+class ExpliquerRequetesTests(TestCase):
+
+    def test_requetes_cles_sans_parcours_complet(self):
+        from .management.commands.expliquer_requetes import parcours_complets, requetes_cles
+        for nom, queryset in requetes_cles():
+            with self.subTest(nom):
+                self.assertEqual(parcours_complets(queryset.explain(), connection.vendor), [])
+
+    def test_filtre_jours_regroupe_les_jours_consecutifs(self):
+        from .rapports import filtre_jours
+        user = User.objects.create_user(email="jours@test.com", password="pass", prenom="J", nom="O", tel="0600000000")
+        pack = PackJour.objects.create(nom="Ourika")
+        maintenant = timezone.now()
+        for jours in (0, 1, 3):
+            ReservationPackJour.objects.create(user=user, pack=pack, date_reservation=maintenant - timedelta(days=jours))
+        aujourd_hui = timezone.localdate(maintenant)
+        self.assertEqual(ReservationPackJour.objects.filter(filtre_jours([aujourd_hui, aujourd_hui - timedelta(days=1)])).count(), 2)
+        self.assertEqual(ReservationPackJour.objects.filter(filtre_jours([aujourd_hui - timedelta(days=3)])).count(), 1)
+        self.assertFalse(ReservationPackJour.objects.filter(filtre_jours([])).exists())
+
+
+# -----------------------------
+# ROUTAGE PRIMAIRE / RÉPLIQUE
+# -----------------------------
+
+class RoutageRepliqueTests(TestCase):
+
+    def setUp(self):
+        from .routeurs import CatalogueRouter
+        self.routeur = CatalogueRouter()
+
+    def test_sans_replique_tout_reste_sur_la_primaire(self):
+        self.assertIsNone(self.routeur.db_for_read(PackJour))
+
+    def test_pool_psycopg_sans_psycopg3(self):
+        from django.core.exceptions import ImproperlyConfigured
+        from Estamira import settings as module_settings
+        with mock.patch.object(module_settings, "DB_POOL", "psycopg"), \
+                mock.patch.dict("sys.modules", {"dj_database_url": mock.Mock(), "psycopg": None}):
+            with self.assertRaisesMessage(ImproperlyConfigured, "psycopg 3"):
+                module_settings.base_de_donnees("postgres://localhost/estamira")
+
+
+class RepliqueSQLiteTests(TransactionTestCase):
+    """Primaire et réplique : deux bases SQLite réelles, la réplique ne reçoit aucune écriture du test."""
+
+    @classmethod
+    def setUpClass(cls):
+        if connection.vendor != "sqlite":
+            raise SkipTest("Copie de base propre à SQLite.")
+        super().setUpClass()
+        dossier = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, dossier, ignore_errors=True)
+        nom = os.path.join(dossier, "replique.sqlite3")
+        # Schéma de la base de test recopié dans un second fichier
+        connection.ensure_connection()
+        copie = sqlite3.connect(nom)
+        connection.connection.backup(copie)
+        copie.close()
+
+        config = {**connections.settings["default"], "NAME": nom}
+        connections.settings["replica"] = config
+        cls.addClassCleanup(cls._retirer_replique)
+        patch = mock.patch.dict(settings.DATABASES, {"replica": config})
+        patch.start()
+        cls.addClassCleanup(patch.stop)
+        # Alias ajouté après la création des bases de test : autorisé pour cette classe seulement
+        cls.databases = cls.databases | {"replica"}
+
+    @classmethod
+    def _retirer_replique(cls):
+        connections["replica"].close()
+        del connections["replica"]
+        del connections.settings["replica"]
+
+    def test_catalogue_lu_sur_la_replique(self):
+        from .routeurs import lecture_primaire
+        Ville.objects.using("replica").create(nom="Fès")
+        Ville.objects.create(nom="Rabat")  # pas encore répliquée
+
+        self.assertEqual(list(Ville.objects.values_list("nom", flat=True)), ["Fès"])
+        with lecture_primaire():
+            self.assertEqual(list(Ville.objects.values_list("nom", flat=True)), ["Rabat"])
+        # Dans une transaction, la primaire voit ses propres écritures
+        with transaction.atomic():
+            self.assertEqual(list(Ville.objects.values_list("nom", flat=True)), ["Rabat"])
+        # Hors catalogue, tout reste sur la primaire
+        self.assertEqual(ReservationPackJour.objects.all().db, "default")
+
+
+# -----------------------------
+# SQLITE EN CONCURRENCE
+# -----------------------------
+
+class SqliteConcurrenceTests(TestCase):
+
+    def test_connexion_configuree(self):
+        if connection.vendor != "sqlite" or not settings.SQLITE_CONCURRENCE:
+            self.skipTest("Mode concurrence SQLite inactif.")
+        self.assertEqual(connection.transaction_mode, "IMMEDIATE")
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA busy_timeout")
+            self.assertEqual(cursor.fetchone()[0], 20000)
+            if settings.SQLITE_WAL:
+                cursor.execute("PRAGMA synchronous")
+                self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+
+
+class SqliteReservationsConcurrentesTests(TransactionTestCase):
+    """Deux threads réservent le même pack sur une base SQLite en fichier (une connexion chacun)."""
+
+    def setUp(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("Verrouillage propre à SQLite.")
+        self.user = User.objects.create_user(email="concurrence@test.com", password="x")
+        self.pack = PackJour.objects.create(nom="Merzouga", prix_mad=100, capacite_journaliere=50)
+        dossier = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, dossier, ignore_errors=True)
+        self.fichier = os.path.join(dossier, "concurrence.sqlite3")
+
+    def _reserver(self, options):
+        from .bench import reserver_en_parallele
+        # Copie de la base de test : les threads ouvrent leur connexion sur ce fichier
+        if os.path.exists(self.fichier):
+            os.remove(self.fichier)
+        copie = sqlite3.connect(self.fichier)
+        connection.connection.backup(copie)
+        copie.close()
+        with mock.patch.dict(connection.settings_dict, {"NAME": self.fichier, "OPTIONS": options}):
+            resultats = reserver_en_parallele(self.pack, self.user, timezone.localdate(), threads=2, par_thread=10)
+        with sqlite3.connect(self.fichier) as base:
+            enregistrees = base.execute(f"SELECT COUNT(*) FROM {ReservationPackJour._meta.db_table}").fetchone()[0]
+        return resultats, enregistrees
+
+    def test_sans_database_is_locked(self):
+        for wal in (False, True):
+            with self.subTest(wal=wal):
+                options = dict(settings.SQLITE_OPTIONS_CONCURRENCE)
+                if wal:
+                    options["init_command"] = settings.SQLITE_PRAGMAS_WAL
+                resultats, enregistrees = self._reserver(options)
+                self.assertEqual((resultats["erreurs_verrou"], resultats["autres_erreurs"]), (0, 0))
+                self.assertEqual(enregistrees, 20)
+
+
+# -----------------------------
+# PRIX ET TAUX DE CHANGE
+# -----------------------------
+
+class PrixTests(TestCase):
+
+    def setUp(self):
+        from .prix import invalider_taux
+        invalider_taux()
+        self.addCleanup(invalider_taux)
+
+    def _charger(self, taux):
+        from .prix import enregistrer_taux
+        with self.captureOnCommitCallbacks(execute=True):
+            enregistrer_taux(taux)
+
+    def test_sans_taux_les_colonnes_font_foi(self):
+        pack = PackJour.objects.create(nom="Essaouira", prix_mad=500, prix_eur=46, prix_usd=50)
+        self.assertEqual(pack.get_prix_par_devise("EUR"), 46)
+        self.assertEqual(pack.get_prix_par_devise("GBP"), 500)
+
+    def test_prix_derives_et_retarification(self):
+        from .prix import recalculer_prix, taux_de_change
+        pack = PackJour.objects.create(nom="Merzouga", prix_mad=1000, prix_eur=1, prix_usd=1)
+
+        self._charger({"EUR": Decimal("0.0925"), "USD": Decimal("0.1"), "GBP": Decimal("0.079")})
+        taux_de_change()
+        with self.assertNumQueries(0):
+            taux_de_change()
+        self.assertEqual(pack.get_prix_par_devise("GBP"), Decimal("79.00"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            recalculer_prix()
+        pack.refresh_from_db()
+        self.assertEqual((pack.prix_eur, pack.prix_usd), (Decimal("92.50"), Decimal("100.00")))
+
+        nouveau = PackComplet.objects.create(nom="Grand Sud", prix_mad=Decimal("3333"))
+        self.assertEqual(nouveau.prix_eur, Decimal("308.30"))
+
+    def test_options_reservees_non_retarifees(self):
+        from .prix import recalculer_prix
+        pack = PackJour.objects.create(nom="Ifrane", prix_mad=100, prix_eur=9)
+        reservation = ReservationPackJour.objects.create(pack=pack, devise="EUR")
+        option = OptionReservation.objects.create(
+            reservation_jour=reservation, nom_option="Guide", prix_mad=100, prix_eur=9
+        )
+        self._charger({"EUR": Decimal("0.1")})
+        with self.captureOnCommitCallbacks(execute=True):
+            recalculer_prix()
+        option.refresh_from_db()
+        self.assertEqual(option.prix_eur, Decimal("9"))
+        self.assertEqual(ReservationPackJour.objects.get(pk=reservation.pk).montant_total, Decimal("18"))
+
+    def test_option_reservee_modifiee_garde_son_prix(self):
+        pack = PackJour.objects.create(nom="Ifrane", prix_mad=100, prix_eur=9)
+        reservation = ReservationPackJour.objects.create(pack=pack, devise="EUR")
+        option = OptionReservation.objects.create(
+            reservation_jour=reservation, nom_option="Guide", prix_mad=100, prix_eur=9
+        )
+        libre = OptionReservation.objects.create(nom_option="Hammam", prix_mad=200, prix_eur=18)
+        self._charger({"EUR": Decimal("0.1")})
+
+        option = OptionReservation.objects.get(pk=option.pk)
+        option.quantite = 2
+        option.save()
+        option.refresh_from_db()
+        self.assertEqual(option.prix_eur, Decimal("9"))
+        self.assertEqual(ReservationPackJour.objects.get(pk=reservation.pk).montant_total, Decimal("27"))
+
+        # Hors réservation : dérivé seulement si le prix de base change
+        libre = OptionReservation.objects.get(pk=libre.pk)
+        libre.nom_option = "Hammam traditionnel"
+        libre.save()
+        self.assertEqual(libre.prix_eur, Decimal("18"))
+        libre.prix_mad = 300
+        libre.save()
+        self.assertEqual(libre.prix_eur, Decimal("30.00"))
+
+    def test_commande_depuis_fichier_csv(self):
+        pack = PackJour.objects.create(nom="Chefchaouen", prix_mad=200)
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as fichier:
+            fichier.write("devise,taux\nEUR,0.09\n")
+        self.addCleanup(os.remove, fichier.name)
+
+        call_command("recalculer_prix", fichier=fichier.name, stdout=StringIO())
+        pack.refresh_from_db()
+        self.assertEqual(pack.prix_eur, Decimal("18.00"))
+
+
+# -----------------------------
+# DÉRIVÉS D'IMAGES
+# -----------------------------
+
+class ImagesTests(TestCase):
+
+    def setUp(self):
+        dossier = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, dossier, ignore_errors=True)
+        reglages = override_settings(MEDIA_ROOT=dossier, IMAGES_LARGEURS=(320, 640, 1024))
+        reglages.enable()
+        self.addCleanup(reglages.disable)
+        cache_catalogue().clear()
+
+    def _photo(self, largeur=800, hauteur=600):
+        from PIL import Image
+        sortie = BytesIO()
+        Image.new("RGB", (largeur, hauteur), (200, 120, 40)).save(sortie, "JPEG")
+        return SimpleUploadedFile("kasbah.jpg", sortie.getvalue(), content_type="image/jpeg")
+
+    def test_pipeline_et_srcset(self):
+        from django.template import Context, Template
+        from .images import traiter_lot
+        from .models import DerivesImage
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ville = Ville.objects.create(nom="Aït Benhaddou", image=self._photo())
+        tache = DerivesImage.objects.get(original=ville.image.name)
+        self.assertEqual(tache.statut, "en_attente")
+
+        gabarit = Template("{% load images %}{% image_responsive ville.image alt=ville.nom %}")
+        self.assertNotIn("srcset", gabarit.render(Context({"ville": ville})))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(traiter_lot(), 1)
+        tache.refresh_from_db()
+        # Pas d'agrandissement : 320, 640 puis l'original (800 px), en WebP et JPEG
+        self.assertEqual(
+            sorted((d["largeur"], d["format"]) for d in tache.derives),
+            [(320, "jpeg"), (320, "webp"), (640, "jpeg"), (640, "webp"), (800, "jpeg"), (800, "webp")],
+        )
+        self.assertTrue(all(tache.empreinte in d["nom"] for d in tache.derives))
+
+        html = gabarit.render(Context({"ville": ville}))
+        self.assertIn('type="image/webp"', html)
+        self.assertIn(f".{tache.empreinte}.640.webp 640w", html)
+        filtre = Template('{% load images %}{{ v.image|srcset:"jpeg" }}').render(Context({"v": ville}))
+        self.assertIn(f".{tache.empreinte}.320.jpeg 320w", filtre)
+
+
+    def test_traitement_hors_transaction_cache_apres_validation(self):
+        from .images import derives_de, generer_derives, traiter_lot
+        from .models import DerivesImage
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ville = Ville.objects.create(nom="Tinghir", image=self._photo())
+        nom = ville.image.name
+        self.assertEqual(derives_de(nom), [])
+
+        blocs = len(connection.atomic_blocks)
+        profondeurs = []
+
+        def generer(original):
+            profondeurs.append(len(connection.atomic_blocks))
+            return generer_derives(original)
+
+        with mock.patch("Appli.images.generer_derives", side_effect=generer):
+            with self.captureOnCommitCallbacks() as rappels:
+                self.assertEqual(traiter_lot(), 1)
+        self.assertEqual(profondeurs, [blocs])
+        # Réponse négative de durée limitée, remplacée à la validation
+        self.assertEqual(derives_de(nom), [])
+        for rappel in rappels:
+            rappel()
+        self.assertEqual(derives_de(nom), DerivesImage.objects.get(original=nom).derives)
+
+    def test_echec_retente_apres_le_bail(self):
+        from .images import DUREE_BAIL, traiter_lot
+        from .models import DerivesImage
+
+        DerivesImage.objects.create(original="img_villes/absente.jpg")
+        self.assertEqual(traiter_lot(), 0)
+        # Réservée par la tentative précédente : pas reprise avant la fin du bail
+        self.assertEqual(traiter_lot(), 0)
+        self.assertEqual(DerivesImage.objects.get().tentatives, 1)
+        DerivesImage.objects.update(date_traitement=timezone.now() - DUREE_BAIL)
+        traiter_lot()
+        self.assertEqual(DerivesImage.objects.get().tentatives, 2)
+
+
+class RessourcesStatiquesTests(TestCase):
+
+    def test_gabarits_sans_chemin_en_dur_ni_fichier_introuvable(self):
+        from .checks import verifier_ressources_statiques
+        self.assertEqual(verifier_ressources_statiques(), [])
+
+    def test_chemin_en_dur_et_fichier_introuvable(self):
+        from .checks import references_statiques
+        dossier = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, dossier)
+        with open(os.path.join(dossier, "page.html"), "w", encoding="utf-8") as fichier:
+            fichier.write(
+                "{% load static %}\n"
+                "<link href=\"{% static 'css/navbar.css' %}\">\n"
+                "<img src=\"/static/img/logo.png\"><div style=\"background: url('/static/img/fond.jpg')\"></div>\n"
+            )
+        references = [(numero, chemin, en_dur) for _, numero, chemin, en_dur in references_statiques(dossier)]
+        self.assertEqual(references, [
+            (2, "css/navbar.css", False),
+            (3, "img/logo.png", True),
+            (3, "img/fond.jpg", True),
+        ])
+
+
+# -----------------------------
+# CACHE DES PAGES ET DES FRAGMENTS
+# -----------------------------
+
+class CachePagesTests(TestCase):
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        cache_catalogue().clear()
+        self.user = User.objects.create_user(
+            email="client@example.com", password="Motdepasse1!", prenom="Samir", nom="Alaoui", tel="0600000000"
+        )
+
+    def test_page_statique_en_cache_pour_les_anonymes(self):
+        from django.shortcuts import render
+        with mock.patch("Appli.views.render", wraps=render) as rendu:
+            premiere = self.client.get(reverse("services"))
+            seconde = self.client.get(reverse("services"))
+        self.assertEqual(rendu.call_count, 1)
+        self.assertEqual(premiere.content, seconde.content)
+        self.assertIn("Cookie", seconde["Vary"])
+        self.assertIn('class="nav-link active" href="/services/"', seconde.content.decode())
+
+    def test_utilisateur_connecte_jamais_servi_depuis_le_cache(self):
+        self.client.get(reverse("about"))
+        self.client.force_login(self.user)
+        html = self.client.get(reverse("about")).content.decode()
+        # Variante connectée de la barre de navigation et jeton CSRF propre au visiteur
+        self.assertIn("Déconnexion", html)
+        self.assertIn("csrfmiddlewaretoken", html)
+        self.client.logout()
+        self.assertNotIn("Déconnexion", self.client.get(reverse("about")).content.decode())
+
+    def test_accueil_borne_les_cartes_de_packs(self):
+        with mock.patch("Appli.views.PACKS_ACCUEIL", 1):
+            PackJour.objects.create(nom="Agafay", prix_mad=400)
+            PackJour.objects.create(nom="Zagora express", prix_mad=500)
+            response = self.client.get(reverse("accueil"))
+        self.assertContains(response, "Agafay")
+        self.assertNotContains(response, "Zagora express")
+        self.assertContains(response, "Tous les packs jour")
+
+    def test_cartes_packs_suivent_la_version_du_catalogue(self):
+        pack = PackJour.objects.create(nom="Zagora express", prix_mad=500)
+        self.assertContains(self.client.get(reverse("accueil")), "Zagora express")
+        pack.nom = "Zagora by night"
+        pack.save()
+        response = self.client.get(reverse("accueil"))
+        self.assertContains(response, "Zagora by night")
+        self.assertNotContains(response, "Zagora express")
+
+
+# -----------------------------
+# RECHERCHE
+# -----------------------------
+
+class RechercheTests(TestCase):
+
+    def setUp(self):
+        cache_catalogue().clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ville = Ville.objects.create(nom="Merzouga", description="Porte du désert et des dunes de l'Erg Chebbi")
+            self.autre = Ville.objects.create(nom="Chefchaouen")
+            self.pack = PackComplet.objects.create(
+                nom="Grand Sud", type_pack="AVENTURE", duree_jours=4, prix_mad=2500,
+                description="Bivouac sous les étoiles",
+            )
+            activite = ActiviteComplet.objects.create(nom="Excursion en dromadaire", pack=self.pack)
+            activite.villes.add(self.ville)
+            PackComplet.objects.create(nom="Ville bleue", type_pack="CULTUREL", duree_jours=2, prix_mad=900)
+
+    def test_accents_et_pluriels(self):
+        from .recherche import normaliser, rechercher
+        self.assertEqual(normaliser("Désert"), normaliser("deserts"))
+        titres = [d.titre for d in rechercher("excursions")["resultats"]]
+        self.assertIn("Grand Sud", titres)
+        self.assertIn("Excursion en dromadaire", titres)
+        self.assertIn("Merzouga", [d.titre for d in rechercher("DESERT")["resultats"]])
+
+    def test_facettes_et_filtres(self):
+        from .recherche import rechercher
+        resultat = rechercher(type_objet="pack_complet")
+        self.assertEqual(resultat["total"], 2)
+        self.assertEqual(
+            {f["valeur"]: f["nombre"] for f in resultat["facettes"]["tranche_prix"]},
+            {"500-1500": 1, "1500-5000": 1},
+        )
+        filtre = rechercher(type_objet="pack_complet", ville=self.ville.pk)
+        self.assertEqual([d.titre for d in filtre["resultats"]], ["Grand Sud"])
+        self.assertEqual(filtre["facettes"]["ville"][0]["libelle"], "Merzouga")
+        # Correspondances, classement bm25, facettes, villes des facettes, villes et documents de la page
+        with self.assertNumQueries(6):
+            rechercher("sud", type_pack="AVENTURE", duree=4)
+
+    def test_facettes_bornees_et_precalculees(self):
+        from . import recherche
+        with mock.patch.object(recherche, "FACETTES_DOCUMENTS_MAX", 2):
+            resultat = recherche.rechercher(type_pack="AVENTURE")
+            self.assertFalse(resultat["facettes_approximatives"])
+            large = recherche.rechercher("e")  # trop de documents : échantillon + total exact
+        self.assertTrue(large["facettes_approximatives"])
+        self.assertEqual(large["total"], recherche.rechercher("e")["total"])
+        self.assertLessEqual(sum(f["nombre"] for f in large["facettes"]["duree_jours"]), 3)
+
+        recherche.rechercher()
+        with self.assertNumQueries(3):  # page des résultats et leurs villes ; facettes en cache
+            total = recherche.rechercher()["total"]
+        self.assertEqual(total, DocumentRecherche.objects.count())
+
+    def test_facettes_comptees_sur_les_premiers_resultats(self):
+        from . import recherche
+        with self.captureOnCommitCallbacks(execute=True):
+            PackComplet.objects.create(nom="Circuit du Sud", type_pack="LUXE", prix_mad=8000, description="Nuit dans une oasis")
+            PackComplet.objects.create(nom="Oasis de Fint", type_pack="DETENTE", prix_mad=1200)
+        with mock.patch.object(recherche, "FACETTES_DOCUMENTS_MAX", 1):
+            resultat = recherche.rechercher("oasis")
+        # Échantillon = le mieux classé (titre), pas le plus ancien
+        self.assertEqual(resultat["resultats"][0].titre, "Oasis de Fint")
+        self.assertEqual([f["valeur"] for f in resultat["facettes"]["type_pack"]], ["DETENTE"])
+        self.assertTrue(resultat["facettes_approximatives"])
+        self.assertEqual(resultat["total"], 2)
+
+    def test_base_sans_moteur_plein_texte(self):
+        from . import recherche
+        with mock.patch.dict(recherche.MOTEURS, clear=True), self.assertLogs("Appli.recherche", "WARNING"):
+            with self.captureOnCommitCallbacks(execute=True):
+                Ville.objects.create(nom="Ouarzazate")
+            self.assertEqual(recherche.rechercher("ouarzazate")["total"], 0)
+        self.assertTrue(DocumentRecherche.objects.filter(titre="Ouarzazate").exists())
+
+        sortie = StringIO()
+        with mock.patch.dict(recherche.MOTEURS, clear=True), self.assertLogs("Appli.recherche", "WARNING"):
+            call_command("reindexer_recherche", stdout=sortie)
+        self.assertIn("Aucun moteur plein texte", sortie.getvalue())
+        self.assertNotIn("Index de recherche reconstruit", sortie.getvalue())
+
+    def test_ville_renommee_reindexe_ses_packs(self):
+        from .recherche import rechercher
+        self.assertEqual(rechercher("erfoud")["total"], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ville.nom = "Erfoud"
+            self.ville.save()
+        self.assertIn("Grand Sud", [d.titre for d in rechercher("erfoud")["resultats"]])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pack.delete()
+        self.assertNotIn("Grand Sud", [d.titre for d in rechercher("erfoud")["resultats"]])
+
+    def test_endpoint(self):
+        url = reverse("recherche")
+        response = self.client.get(url, {"q": "dromadaire", "type": "activite_complet"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["resultats"][0]["villes"], [{"id": self.ville.pk, "nom": "Merzouga"}])
+        with self.assertNumQueries(0):
+            self.client.get(url, {"q": "dromadaire", "type": "activite_complet"})
+        self.assertEqual(self.client.get(url, {"prix": "gratuit"}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"ville": "x"}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"type": "autre"}).status_code, 400)
+
+
+# -----------------------------
+# LISTE DES PACKS
+# -----------------------------
+
+class ListePacksTests(TestCase):
+
+    def setUp(self):
+        self.merzouga = Ville.objects.create(nom="Merzouga")
+        self.grand_sud = PackComplet.objects.create(nom="Grand Sud", type_pack="AVENTURE", duree_jours=4, prix_mad=2500)
+        ActiviteComplet.objects.create(nom="Bivouac", pack=self.grand_sud).villes.add(self.merzouga)
+        # Deux activités dans la même ville : le pack n'apparaît qu'une fois
+        ActiviteComplet.objects.create(nom="Dunes", pack=self.grand_sud).villes.add(self.merzouga)
+        PackComplet.objects.create(nom="Ville bleue", type_pack="CULTUREL", duree_jours=2, prix_mad=900)
+        for i in range(5):
+            PackJour.objects.create(nom="Atlas" if i < 3 else f"Oasis {i}", prix_mad=300)
+
+    def test_pagination_par_curseur_sur_nom_et_id(self):
+        from .liste_packs import page_packs
+        vus, apres = [], None
+        while True:
+            packs, apres = page_packs(PackJour, apres=apres, taille=2)
+            vus += [(p.nom, p.pk) for p in packs]
+            if apres is None:
+                break
+        self.assertEqual(vus, sorted(PackJour.objects.values_list("nom", "pk")))
+        self.assertEqual(packs[0].get_deferred_fields(), {"prix_eur", "prix_usd", "capacite_journaliere", "version_disponibilite"})
+
+    def test_filtres(self):
+        from .liste_packs import filtrer_packs
+        self.assertEqual(list(filtrer_packs(PackComplet, ville=self.merzouga.pk)), [self.grand_sud])
+        self.assertEqual(list(filtrer_packs(PackComplet, type_pack="AVENTURE", duree=4, tranche="1500-5000")), [self.grand_sud])
+        self.assertFalse(filtrer_packs(PackComplet, tranche="5000+").exists())
+        self.assertFalse(filtrer_packs(PackJour, type_pack="AVENTURE").exists())
+        self.assertEqual(filtrer_packs(PackJour, duree=1, q="oasis").count(), 2)
+
+    def test_endpoint(self):
+        url = reverse("api_liste_packs", args=["jour"])
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {"taille": 3})
+        self.assertEqual([p["nom"] for p in response.json()["packs"]], ["Atlas"] * 3)
+        suite = self.client.get(url, {"taille": 3, "apres": response.json()["suivant"]}).json()
+        self.assertEqual([p["nom"] for p in suite["packs"]], ["Oasis 3", "Oasis 4"])
+        self.assertIsNone(suite["suivant"])
+        self.assertEqual(self.client.get(url, {"prix": "gratuit"}).status_code, 400)
+        self.assertEqual(self.client.get(reverse("api_liste_packs", args=["autre"])).status_code, 404)
+
+    def test_formulaire_sans_liste_complete_des_packs(self):
+        from .forms import ReservationPackCompletForm
+        form = ReservationPackCompletForm(initial={"pack": self.grand_sud})
+        with self.assertNumQueries(1):
+            html = str(form["pack"])
+        self.assertIn(f'value="{self.grand_sud.pk}"', html)
+        self.assertIn('value="Grand Sud"', html)
+        self.assertNotIn("Ville bleue", html)
+        self.assertIn("js/autocomplete_pack.js", str(form.media))
+
+    def test_page_de_reservation(self):
+        user = User.objects.create_user(
+            email="client@example.com", password="Motdepasse1!", prenom="Samir", nom="Alaoui", tel="0600000000"
+        )
+        self.client.force_login(user)
+        response = self.client.get(reverse("reservation_jour_base"), {"q": "atlas"})
+        self.assertContains(response, 'class="autocomplete-pack"')
+        self.assertEqual(len(response.context["packs_standards"]), 3)
+        self.assertIsNone(response.context["curseur_suivant"])
+
+
+# -----------------------------
+# API CATALOGUE
+# -----------------------------
+
+class ApiCatalogueTests(TestCase):
+
+    def setUp(self):
+        cache_catalogue().clear()
+        self.merzouga = Ville.objects.create(nom="Merzouga")
+        self.fes = Ville.objects.create(nom="Fès")
+        for i in range(3):
+            pack = PackComplet.objects.create(nom=f"Grand Sud {i}", type_pack="AVENTURE", duree_jours=3, prix_mad=2500)
+            for jour, ville in ((2, self.fes), (1, self.merzouga), (1, self.fes)):
+                ActiviteComplet.objects.create(nom=f"Étape {jour}", jour_numero=jour, pack=pack).villes.add(ville)
+        self.pack = pack
+        pack_jour = PackJour.objects.create(nom="Zagora express", prix_mad=500)
+        pack_jour.activites.add(ActiviteJour.objects.create(nom="Dromadaire", ville=self.merzouga))
+
+    def test_requetes_constantes_et_activites_par_jour(self):
+        url = reverse("api_v1_packs_complet")
+        self.client.get(url)  # taux de change chargés en mémoire
+        with self.assertNumQueries(3):
+            donnees = self.client.get(url).json()
+        self.assertEqual(len(donnees["resultats"]), 3)
+        pack = donnees["resultats"][-1]
+        self.assertEqual([jour["jour_numero"] for jour in pack["activites"]], [1, 2])
+        self.assertEqual(len(pack["activites"][0]["activites"]), 2)
+        self.assertEqual(set(pack["prix"]), {"MAD", "EUR", "USD"})
+        self.assertEqual(pack["prix"]["MAD"], "2500.00")
+
+        with self.assertNumQueries(2):
+            jour = self.client.get(reverse("api_v1_packs_jour")).json()["resultats"][0]
+        self.assertEqual(jour["activites"][0]["ville"], {"id": self.merzouga.pk, "nom": "Merzouga"})
+
+    def test_selection_des_champs_et_pagination(self):
+        url = reverse("api_v1_packs_complet")
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {"fields": "nom,id", "taille": 2})
+        donnees = response.json()
+        self.assertEqual(list(donnees["resultats"][0]), ["id", "nom"])
+        suite = self.client.get(url, {"fields": "id", "taille": 2, "apres": donnees["suivant"]}).json()
+        self.assertEqual(suite["resultats"], [{"id": self.pack.pk}])
+        self.assertIsNone(suite["suivant"])
+        erreur = self.client.get(url, {"fields": "nom,mot_de_passe"})
+        self.assertEqual(erreur.status_code, 400)
+        absente = self.client.get(reverse("api_v1_ville", args=[0]))
+        self.assertEqual(absente.status_code, 404)
+        for reponse in (erreur, absente):
+            self.assertFalse(reponse.has_header("Cache-Control"))
+            self.assertFalse(reponse.has_header("ETag"))
+            self.assertFalse(reponse.has_header("Last-Modified"))
+
+    def test_requetes_conditionnelles(self):
+        url = reverse("api_v1_ville", args=[self.fes.pk])
+        response = self.client.get(url)
+        self.assertEqual(response.json()["nom"], "Fès")
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+            self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]).status_code, 304)
+
+        self.fes.description = "Ville impériale"
+        self.fes.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 200)
+
+    def test_version_avance_d_un_pas(self):
+        from .catalogue import date_modification_catalogue, invalider_catalogue, version_catalogue
+        version = version_catalogue()
+        with mock.patch("Appli.catalogue.time", return_value=2_000_000_000.0):
+            invalider_catalogue()
+        self.assertEqual(version_catalogue(), version + 1)
+        self.assertEqual(date_modification_catalogue(), 2_000_000_000.0)
+
+    def test_reponse_gzip(self):
+        import gzip
+        import json
+        response = self.client.get(reverse("api_v1_packs_complet"), HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertEqual(len(json.loads(gzip.decompress(response.content))["resultats"]), 3)
+
+    def test_repli_sans_orjson(self):
+        from . import serialisation
+        donnees = {"prix": Decimal("12.50"), "nom": "Fès", "liste": [1, None]}
+        rapide = serialisation.encoder_json(donnees)
+        with mock.patch.object(serialisation, "orjson", None):
+            self.assertEqual(serialisation.encoder_json(donnees), rapide)
+
+
+# -----------------------------
+# IMPORT DE RÉSERVATIONS EN LOT
+# -----------------------------
+
+class ImportReservationsTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="client@example.com", password="x", prenom="Samir", nom="Alaoui", tel="0600000000"
+        )
+        self.pack_jour = PackJour.objects.create(nom="Zagora express", prix_mad=500, prix_eur=50)
+        self.pack_complet = PackComplet.objects.create(nom="Atlas", prix_mad=3000, capacite_journaliere=5)
+        self.jour = timezone.now().date() + timedelta(days=10)
+
+    def _jsonl(self, *enregistrements):
+        import json
+        return "\n".join(json.dumps(e) for e in enregistrements) + "\n"
+
+    def _complet(self, reference, nb_personne, **autres):
+        return dict({
+            "type": "complet", "reference": reference, "pack": self.pack_complet.pk, "nb_personne": nb_personne,
+            "devise": "MAD", "date_debut": self.jour.isoformat(), "date_fin": (self.jour + timedelta(days=2)).isoformat(),
+        }, **autres)
+
+    def test_import_jsonl_valide_et_reserve_le_lot(self):
+        from .import_reservations import ImportReservations, lire_jsonl
+
+        contenu = self._jsonl(
+            {"type": "jour", "reference": "A1", "client": "CLIENT@example.com", "pack": self.pack_jour.pk,
+             "nb_personne": 2, "devise": "EUR", "date": self.jour.isoformat(),
+             "options": [{"nom_option": "Déjeuner", "prix_mad": "100", "quantite": 2}]},
+            self._complet("A2", 3),
+            self._complet("A3", 3),  # le lot dépasse les 5 places
+            {"type": "jour", "reference": "A4", "pack": 0, "nb_personne": 1, "date": "2000-01-01"},
+            {"type": "jour", "reference": "A5", "client": "inconnu@example.com", "pack": self.pack_jour.pk},
+        ) + "pas du json\n"
+        rapport = ImportReservations().importer(lire_jsonl(StringIO(contenu)))
+
+        self.assertEqual((rapport["lignes"], rapport["reservations"], rapport["options"]), (6, 2, 1))
+        self.assertEqual([e["reference"] for e in rapport["erreurs"]], ["A3", "A4", "A5", ""])
+        self.assertIn("pack", rapport["erreurs"][1]["erreurs"])
+        self.assertIn("date", rapport["erreurs"][1]["erreurs"])
+        self.assertIn("client", rapport["erreurs"][2]["erreurs"])
+
+        reservation = ReservationPackJour.objects.get()
+        self.assertEqual(reservation.user, self.user)
+        # Même total que MontantTotalMixin (pack et option dans la devise de la réservation)
+        self.assertEqual(reservation.montant_total, reservation.calculer_montant_total())
+        self.assertEqual(ReservationPackComplet.objects.get().nb_personne, 3)
+        self.assertEqual(disponibilites(self.pack_complet, self.jour, self.jour)[self.jour], 2)
+
+    def test_csv_regroupe_les_options_par_reference(self):
+        from .import_reservations import lire_csv
+
+        contenu = (
+            "type,reference,pack,nb_personne,date_debut,date_fin,option_nom_option,option_prix_mad\n"
+            "complet,B1,1,2,2030-01-02,2030-01-04,Dîner,350\n"
+            "complet,B1,1,2,2030-01-02,2030-01-04,Hammam,200\n"
+            "complet,B2,1,1,2030-01-02,2030-01-04,,\n"
+        )
+        enregistrements = list(lire_csv(StringIO(contenu)))
+        self.assertEqual([numero for numero, _ in enregistrements], [2, 4])
+        self.assertEqual(
+            enregistrements[0][1]["options"],
+            [{"nom_option": "Dîner", "prix_mad": "350"}, {"nom_option": "Hammam", "prix_mad": "200"}],
+        )
+        self.assertEqual(enregistrements[1][1]["options"], [])
+
+    @override_settings(PARTENAIRES_JETONS={"jeton-secret": "agence-sud"})
+    def test_endpoint_partenaire_sans_compte_client(self):
+        url = reverse("api_import_reservations")
+        contenu = self._jsonl(
+            self._complet("C1", 1, client="client@example.com"), self._complet("C2", 1), self._complet("C3", 1)
+        )
+        self.assertEqual(
+            self.client.post(url, contenu, content_type="application/x-ndjson").status_code, 401
+        )
+        response = self.client.post(
+            url + "?taille_lot=2", contenu, content_type="application/x-ndjson",
+            HTTP_AUTHORIZATION="Bearer jeton-secret",
+        )
+        self.assertEqual(response.status_code, 200)
+        # Un jeton d'agence ne rattache aucune réservation à un compte client
+        rapport = response.json()
+        self.assertEqual(rapport["reservations"], 2)
+        self.assertEqual([(e["reference"], list(e["erreurs"])) for e in rapport["erreurs"]], [("C1", ["client"])])
+        self.assertFalse(ReservationPackComplet.objects.filter(user__isnull=False).exists())
+        # Seul le récapitulatif admin est mis en file, aucun envoi immédiat
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(list(EmailSortant.objects.values_list("sujet", flat=True)), ["Import de réservations Estamira"])
+
+    @override_settings(PARTENAIRES_JETONS={"jeton-secret": "agence-sud", "autre-jeton": "agence-nord"})
+    def test_renvoi_sans_double_reservation(self):
+        url = reverse("api_import_reservations") + "?taille_lot=2"
+        contenu = self._jsonl(self._complet("G1", 1), self._complet("G2", 1), self._complet("G1", 1))
+
+        def envoyer(jeton):
+            return self.client.post(
+                url, contenu, content_type="application/x-ndjson", HTTP_AUTHORIZATION=f"Bearer {jeton}"
+            ).json()
+
+        premier = envoyer("jeton-secret")
+        self.assertEqual(premier["reservations"], 2)
+        self.assertEqual([(e["ligne"], list(e["erreurs"])) for e in premier["erreurs"]], [(3, ["reference"])])
+        renvoi = envoyer("jeton-secret")
+        self.assertEqual(renvoi["reservations"], 0)
+        self.assertEqual([e["reference"] for e in renvoi["erreurs"]], ["G1", "G2", "G1"])
+        # Les références sont propres à chaque agence
+        self.assertEqual(envoyer("autre-jeton")["reservations"], 2)
+        self.assertEqual(ReservationPackComplet.objects.filter(source_import="agence-sud").count(), 2)
+
+    def test_staff_un_recapitulatif_par_client(self):
+        staff = User.objects.create_superuser(email="admin@test.com", password="pass", prenom="A", nom="D", tel="0600000000")
+        autre = User.objects.create_user(email="autre@example.com", password="x", prenom="Nadia", nom="B", tel="0600000001")
+        self.client.force_login(staff)
+        contenu = self._jsonl(
+            self._complet("E1", 1, client="client@example.com"),
+            self._complet("E2", 1, client="client@example.com"),
+            self._complet("E3", 1, client="autre@example.com"),
+        )
+        response = self.client.post(
+            reverse("api_import_reservations"), contenu, content_type="application/x-ndjson"
+        )
+        self.assertEqual(response.json()["reservations"], 3)
+        envois = {
+            tuple(destinataires): sujet
+            for sujet, destinataires in EmailSortant.objects.values_list("sujet", "destinataires")
+        }
+        self.assertEqual(len(envois), 3)
+        self.assertEqual(envois[(self.user.email,)], "Confirmation de vos réservations Estamira")
+        self.assertEqual(envois[(autre.email,)], "Confirmation de votre réservation Estamira")
+
+    def test_recapitulatif_admin_borne(self):
+        from . import import_reservations
+        from .notification.email import notifier_import_reservations
+        contenu = self._jsonl(*(self._complet(f"F{i}", 1) for i in range(3)))
+        with mock.patch.object(import_reservations, "ECHANTILLON_ADMIN", 1):
+            importeur = import_reservations.ImportReservations(taille_lot=2, clients_autorises=False)
+            importeur.importer(import_reservations.lire_jsonl(StringIO(contenu)))
+        # Sans compte client, seule la première réservation reste en mémoire
+        self.assertEqual((importeur.nb_reservations, len(importeur.echantillon), importeur.par_client), (3, 1, {}))
+        notifier_import_reservations(importeur, source="agence-sud")
+        corps = EmailSortant.objects.get().contenu_html
+        self.assertIn("3 réservations importées", corps)
+        self.assertIn("et 2 autres", corps)
+
+    def test_commande(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".jsonl", delete=False, encoding="utf-8") as fichier:
+            fichier.write(self._jsonl(self._complet("D1", 2), self._complet("D2", 9)))
+        self.addCleanup(os.remove, fichier.name)
+        sortie, erreurs = StringIO(), StringIO()
+        call_command("import_reservations", fichier.name, "--sans-notification", stdout=sortie, stderr=erreurs)
+        self.assertIn("1 réservation(s)", sortie.getvalue())
+        self.assertIn("D2", erreurs.getvalue())
+        self.assertFalse(EmailSortant.objects.exists())
+
+
+# -----------------------------
+# EXPORT EN FLUX (ADMIN)
+# -----------------------------
+
+class ExportTests(TestCase):
+
+    def setUp(self):
+        self.staff = User.objects.create_superuser(email="admin@test.com", password="pass", prenom="A", nom="D", tel="0600000000")
+        self.client.force_login(self.staff)
+        pack = PackComplet.objects.create(nom="Atlas", prix_mad=3000, prix_eur=300, prix_usd=320)
+        self.reservations = [
+            ReservationPackComplet.objects.create(user=self.staff, pack=pack, nb_personne=2, devise="EUR")
+            for _ in range(5)
+        ]
+        OptionReservation.objects.create(
+            reservation_complet=self.reservations[0], nom_option="Dîner", prix_mad=100, prix_eur=10, prix_usd=11, quantite=2
+        )
+
+    def _exporter(self, format_fichier, modele="reservationpackcomplet"):
+        response = self.client.post(reverse(f"admin:Appli_{modele}_changelist"), {
+            "action": f"exporter_{format_fichier}",
+            "select_across": 1,
+            "_selected_action": [self.reservations[0].pk],
+        })
+        self.assertTrue(response.streaming)
+        self.assertIn("attachment;", response["Content-Disposition"])
+        return b"".join(response.streaming_content)
+
+    def test_csv_avec_totaux_par_devise(self):
+        import csv
+        contenu = self._exporter("csv").decode("utf-8-sig")
+        lignes = {ligne["ID"]: ligne for ligne in csv.DictReader(StringIO(contenu))}
+        self.assertEqual(len(lignes), 5)
+        ligne = lignes[str(self.reservations[0].pk)]
+        self.assertEqual((ligne["Pack"], ligne["Client"], ligne["Devise"]), ("Atlas", "admin@test.com", "EUR"))
+        self.assertEqual(Decimal(ligne["Total MAD"]), Decimal("6200"))
+        self.assertEqual(Decimal(ligne["Total EUR"]), Decimal(ligne["Montant total"]))
+        self.assertEqual(Decimal(ligne["Total USD"]), Decimal("662"))
+
+    def test_paquets_en_une_requete(self):
+        from .export import flux_csv
+        with self.assertNumQueries(1):
+            morceaux = list(flux_csv(ReservationPackComplet.objects.order_by("pk"), taille_paquet=2))
+        # Entête puis un morceau par paquet de deux lignes
+        self.assertEqual(len(morceaux), 4)
+
+    def test_xlsx_lisible(self):
+        import zipfile
+        from xml.etree import ElementTree
+        archive = zipfile.ZipFile(BytesIO(self._exporter("xlsx")))
+        self.assertIn("xl/workbook.xml", archive.namelist())
+        espace = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+        feuille = ElementTree.fromstring(archive.read("xl/worksheets/sheet1.xml"))
+        lignes = feuille.findall(f"{espace}sheetData/{espace}row")
+        self.assertEqual(len(lignes), 6)
+        self.assertEqual(lignes[0][1].find(f"{espace}is/{espace}t").text, "Pack")
+
+        options = zipfile.ZipFile(BytesIO(self._exporter("xlsx", "optionreservation")))
+        self.assertIn(b"D\xc3\xaener", options.read("xl/worksheets/sheet1.xml"))
@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import views, api, api_catalogue
 
 urlpatterns = [
     # Page d’accueil et pages statiques
@@ -16,4 +16,26 @@ urlpatterns = [
     # Réservation Pack Complet
     path('reservation/complet/', views.reservation_pack_complet, name='reservation_complet_base'),
     path('reservation/complet/<int:pack_id>/', views.reservation_pack_complet, name='reservation_complet_detail'),
+
+    # API : liste des packs (cartes, autocomplétion) et calendrier des disponibilités
+    path('api/packs/<str:type_pack>/', api.liste_packs, name='api_liste_packs'),
+    path('api/packs/<str:type_pack>/<int:pack_id>/availability', api.disponibilites_pack, name='api_disponibilites_pack'),
+
+    # API : import de réservations en lot (agences partenaires, staff)
+    path('api/reservations/import/', api.import_reservations, name='api_import_reservations'),
+
+    # API catalogue en lecture seule (versionnée)
+    path('api/v1/villes/', api_catalogue.liste, {'ressource': 'villes'}, name='api_v1_villes'),
+    path('api/v1/villes/<int:pk>/', api_catalogue.detail, {'ressource': 'villes'}, name='api_v1_ville'),
+    path('api/v1/packs/jour/', api_catalogue.liste, {'ressource': 'packs/jour'}, name='api_v1_packs_jour'),
+    path('api/v1/packs/jour/<int:pk>/', api_catalogue.detail, {'ressource': 'packs/jour'}, name='api_v1_pack_jour'),
+    path('api/v1/packs/complet/', api_catalogue.liste, {'ressource': 'packs/complet'}, name='api_v1_packs_complet'),
+    path('api/v1/packs/complet/<int:pk>/', api_catalogue.detail, {'ressource': 'packs/complet'}, name='api_v1_pack_complet'),
+
+    # Recherche plein texte et facettes
+    path('recherche/', api.recherche, name='recherche'),
+
+    # Rapports (staff)
+    path('rapports/chiffre-affaires/', views.rapport_chiffre_affaires, name='rapport_chiffre_affaires'),
+    path('__perf__/', views.perf, name='perf'),
 ]
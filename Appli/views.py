@@ -1,9 +1,12 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
 from django.contrib import messages
-from itertools import chain
 from django.db.models import Q
 from django.utils import timezone
+from django.conf import settings
+from datetime import date
 
 from .notification.email import (
     notifier_admins_reservation,
@@ -22,45 +25,90 @@ from .models import (
 )
 
 from .forms import ReservationPackJourForm, ReservationPackCompletForm
+from .catalogue import obtenir_catalogue
+from .chronologie import chronologie_reservations
+from .rapports import rapport, DIMENSIONS
+from .disponibilites import PlacesInsuffisantes
+from .profilage import budget_requetes, statistiques
+from .cache_pages import cache_anonyme
+from .liste_packs import filtres_requete, page_packs
 
 
 # -----------------------------------------------------------------
 # VUE : PAGE D’ACCUEIL
 # -----------------------------------------------------------------
-def home_page(request):
-    packs_jour = PackJour.objects.prefetch_related('activites').all()
-    packs_complet = PackComplet.objects.prefetch_related('activites').all()
 
-    packs = sorted(
-        chain(packs_jour, packs_complet),
-        key=lambda p: p.nom
-    )
+# Cartes de packs affichées sur l'accueil ; la suite est dans les listes paginées
+PACKS_ACCUEIL = 12
 
-    villes = Ville.objects.all()
+
+@budget_requetes(10)
+def home_page(request):
+    # Instantané pré-trié servi depuis le cache (aucune requête à chaud)
+    catalogue = obtenir_catalogue()
 
     context = {
-        "packs": packs,
-        "villes": villes,
+        "packs": catalogue["packs"][:PACKS_ACCUEIL],
+        "packs_suivants": len(catalogue["packs"]) > PACKS_ACCUEIL,
+        "villes": catalogue["villes"],
+        # Clé du fragment des cartes de packs (commun/cartes_packs.html)
+        "version_catalogue": catalogue["version"],
     }
     return render(request, "accueil.html", context)
 
 
 # -----------------------------------------------------------------
-# PAGES STATIQUES
+# PAGES STATIQUES (en cache pour les visiteurs anonymes)
 # -----------------------------------------------------------------
+@cache_anonyme()
 def services(request):
     return render(request, 'services.html')
 
+@cache_anonyme()
 def contact(request):
     return render(request, 'contact.html')
 
+@cache_anonyme()
 def about(request):
     return render(request, 'about.html')
 
 
+# -----------------------------------------------------------------
+# ENREGISTREMENT D'UNE RÉSERVATION
+# -----------------------------------------------------------------
+def _enregistrer_reservation(form, user):
+    """
+    Enregistre la réservation du formulaire validé. Les places sont réservées
+    dans la même transaction ; si un autre client a pris les dernières places
+    entre-temps, l'erreur est ajoutée au formulaire et None est retourné.
+    """
+    reservation = form.save(commit=False)
+    reservation.user = user
+    reservation.date_reservation = timezone.now()
+    try:
+        reservation.save()
+    except PlacesInsuffisantes as exc:
+        form.add_error(None, exc)
+        return None
+    return reservation
+
+
+# -----------------------------------------------------------------
+# LISTE DES PACKS DES PAGES DE RÉSERVATION
+# -----------------------------------------------------------------
+def _page_packs(request, modele):
+    """Page de packs filtrée par les paramètres GET (ignorés s'ils sont invalides), ?apres=<curseur>."""
+    try:
+        filtres = filtres_requete(request.GET)
+    except ValueError:
+        filtres = {}
+    return page_packs(modele, apres=request.GET.get("apres"), **filtres)
+
+
 # -----------------------------------------------------------------
 # VUE : RÉSERVATION PACK JOUR
 # -----------------------------------------------------------------
+@budget_requetes(25)
 @login_required
 def reservation_pack_jour(request, pack_id=None):
     user = request.user
@@ -79,18 +127,15 @@ def reservation_pack_jour(request, pack_id=None):
 
     form.fields['pack'].queryset = PackJour.objects.all()
 
+    reservation = None
     if request.method == "POST" and form.is_valid():
-        reservation = form.save(commit=False)
-        reservation.user = user
-        reservation.date_reservation = timezone.now()
-        reservation.save()
+        reservation = _enregistrer_reservation(form, user)
 
-        montant_total = reservation.pack.get_prix_par_devise(reservation.devise) * reservation.nb_personne
-
-        # Ajout du total des options liées
-        for option in reservation.options.all():
-            montant_total += option.get_prix_par_devise(reservation.devise) * option.quantite
+    if reservation is not None:
+        # Total (pack + options) calculé et stocké à la sauvegarde
+        montant_total = reservation.montant_total
 
+        # Les e-mails sont mis en file : aucun appel SMTP pendant la requête
         try:
             notifier_admins_reservation(reservation)
             notifier_utilisateur_reservation(reservation)
@@ -103,11 +148,12 @@ def reservation_pack_jour(request, pack_id=None):
             "montant_total": montant_total,
         })
 
-    packs_standards = PackJour.objects.all()
+    packs_standards, curseur_suivant = _page_packs(request, PackJour)
     return render(request, 'reservation/jour.html', {
         "form": form,
         "montant_total": montant_total,
         "packs_standards": packs_standards,
+        "curseur_suivant": curseur_suivant,
         "is_pack_jour": True,
     })
 
@@ -115,6 +161,7 @@ def reservation_pack_jour(request, pack_id=None):
 # -----------------------------------------------------------------
 # VUE : RÉSERVATION PACK COMPLET
 # -----------------------------------------------------------------
+@budget_requetes(25)
 @login_required
 def reservation_pack_complet(request, pack_id=None):
     user = request.user
@@ -133,18 +180,15 @@ def reservation_pack_complet(request, pack_id=None):
 
     form.fields['pack'].queryset = PackComplet.objects.all()
 
+    reservation = None
     if request.method == "POST" and form.is_valid():
-        reservation = form.save(commit=False)
-        reservation.user = user
-        reservation.date_reservation = timezone.now()
-        reservation.save()
+        reservation = _enregistrer_reservation(form, user)
 
-        montant_total = reservation.pack.get_prix_par_devise(reservation.devise) * reservation.nb_personne
-
-        # Ajout du total des options liées
-        for option in reservation.options.all():
-            montant_total += option.get_prix_par_devise(reservation.devise) * option.quantite
+    if reservation is not None:
+        # Total (pack + options) calculé et stocké à la sauvegarde
+        montant_total = reservation.montant_total
 
+        # Les e-mails sont mis en file : aucun appel SMTP pendant la requête
         try:
             notifier_admins_reservation(reservation)
             notifier_utilisateur_reservation(reservation)
@@ -157,31 +201,72 @@ def reservation_pack_complet(request, pack_id=None):
             "montant_total": montant_total,
         })
 
-    packs_standards = PackComplet.objects.all()
+    packs_standards, curseur_suivant = _page_packs(request, PackComplet)
     return render(request, 'reservation/complet.html', {
         "form": form,
         "montant_total": montant_total,
         "packs_standards": packs_standards,
+        "curseur_suivant": curseur_suivant,
         "is_pack_jour": False,
     })
 
 # -----------------------------------------------------------------
 # VUE : MES ACTIVITÉS
 # -----------------------------------------------------------------
+@budget_requetes(5)
 @login_required
 def mon_activite(request):
-    reservations_jour = ReservationPackJour.objects.filter(user=request.user)
-    reservations_complet = ReservationPackComplet.objects.filter(user=request.user)
-
-    for r in reservations_jour:
-        r.type_reservation = "Pack 1 Jour"
-    for r in reservations_complet:
-        r.type_reservation = "Pack Complet"
-
-    all_reservations = sorted(
-        chain(reservations_jour, reservations_complet),
-        key=lambda r: r.date_reservation,
-        reverse=True
+    # Chronologie unifiée (UNION SQL), paginée par curseur : ?apres=<curseur>
+    reservations, curseur_suivant = chronologie_reservations(
+        request.user,
+        apres=request.GET.get("apres"),
     )
 
-    return render(request, "mon_activite.html", {"reservations": all_reservations})
+    return render(request, "mon_activite.html", {
+        "reservations": reservations,
+        "curseur_suivant": curseur_suivant,
+    })
+
+
+# -----------------------------------------------------------------
+# VUE : RAPPORTS (STAFF, JSON)
+# -----------------------------------------------------------------
+@staff_member_required
+def rapport_chiffre_affaires(request):
+    """
+    /rapports/chiffre-affaires/?debut=AAAA-MM-JJ&fin=AAAA-MM-JJ&par=<dimension>
+    Lit uniquement les agrégats journaliers.
+    """
+    aujourd_hui = timezone.localdate()
+    try:
+        debut = date.fromisoformat(request.GET.get("debut", aujourd_hui.replace(month=1, day=1).isoformat()))
+        fin = date.fromisoformat(request.GET.get("fin", aujourd_hui.isoformat()))
+    except ValueError:
+        return JsonResponse({"erreur": "Dates invalides (format AAAA-MM-JJ)."}, status=400)
+
+    par = request.GET.get("par", "jour")
+    if par not in DIMENSIONS:
+        return JsonResponse({"erreur": f"Dimension inconnue. Choix : {', '.join(DIMENSIONS)}."}, status=400)
+
+    return JsonResponse({
+        "debut": debut,
+        "fin": fin,
+        "par": par,
+        "lignes": rapport(debut, fin, par=par),
+    })
+
+
+# -----------------------------------------------------------------
+# VUE : PROFILAGE SQL (STAFF)
+# -----------------------------------------------------------------
+@staff_member_required
+def perf(request):
+    """Percentiles glissants par vue, collectés par ProfilageSQLMiddleware."""
+    lignes = statistiques()
+    if request.GET.get("format") == "json":
+        return JsonResponse({"vues": lignes})
+    return render(request, "admin/Appli/perf.html", {
+        "lignes": lignes,
+        "actif": settings.PROFILAGE_SQL,
+        "title": "Profilage SQL par vue",
+    })
@@ -24,3 +24,6 @@ urlpatterns = [
     path('', include('Appli.urls')),
     path('auth/', include('authUser.urls'))
 ]
+
+if settings.DEBUG:
+    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 08:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authUser', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='tel',
+            field=models.CharField(blank=True, db_index=True, max_length=20, null=True),
+        ),
+    ]
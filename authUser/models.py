@@ -33,7 +33,7 @@ class User(AbstractBaseUser, PermissionsMixin):
     last_name = models.CharField(max_length=150, blank=True, null=True)
     prenom = models.CharField(max_length=60, blank=True, null=True)
     nom = models.CharField(max_length=60, blank=True, null=True)
-    tel = models.CharField(max_length=20, blank=True, null=True)
+    tel = models.CharField(max_length=20, blank=True, null=True, db_index=True)
     date_de_creation = models.DateField(default=timezone.now)  
 
     is_active = models.BooleanField(default=True)
@@ -0,0 +1,46 @@
+// Formulaire d'inscription (authUser/templates/registration/signup.html) :
+// affichage du mot de passe et règles vérifiées au fil de la saisie.
+// Les fonctions sont globales, appelées par les attributs on* du gabarit.
+"use strict";
+
+function toggleVisibility(id, bouton) {
+    var champ = document.getElementById(id);
+    var icone = bouton.querySelector("i");
+    var masque = champ.type === "password";
+    champ.type = masque ? "text" : "password";
+    icone.classList.toggle("fa-eye", !masque);
+    icone.classList.toggle("fa-eye-slash", masque);
+}
+
+function _regle(id, respectee) {
+    var regle = document.getElementById(id);
+    var icone = regle.querySelector(".icon i");
+    regle.classList.toggle("text-success", respectee);
+    regle.classList.toggle("text-danger", !respectee);
+    icone.className = respectee ? "bi bi-check-lg text-success me-1" : "bi bi-x-lg text-danger me-1";
+}
+
+function _contient(motDePasse, id) {
+    var valeur = document.getElementById(id).value.trim().toLowerCase();
+    return valeur.length > 0 && motDePasse.toLowerCase().indexOf(valeur) !== -1;
+}
+
+function validatePassword() {
+    var motDePasse = document.getElementById("formPassword").value;
+    _regle("rule-length", motDePasse.length >= 8);
+    _regle("rule-lower", /[a-z]/.test(motDePasse));
+    _regle("rule-upper", /[A-Z]/.test(motDePasse));
+    _regle("rule-digit", /\d/.test(motDePasse));
+    _regle("rule-special", /[^A-Za-z0-9]/.test(motDePasse));
+    _regle("rule-prenom", !_contient(motDePasse, "prenom"));
+    _regle("rule-nom", !_contient(motDePasse, "nom"));
+}
+
+function showRules() {
+    validatePassword();
+    document.getElementById("rules-box").style.display = "block";
+}
+
+function hideRules() {
+    document.getElementById("rules-box").style.display = "none";
+}
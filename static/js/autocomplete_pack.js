@@ -0,0 +1,50 @@
+// Autocomplétion des packs (widget AutocompletePack, Appli/forms.py).
+// Les suggestions sont demandées à l'API de liste des packs au fil de la
+// saisie ; le pack choisi renseigne le champ caché posté avec le formulaire.
+(function () {
+    "use strict";
+
+    var DELAI_MS = 200;
+    var SUGGESTIONS = 10;
+
+    function initialiser(bloc) {
+        var saisie = bloc.querySelector("[data-autocomplete-saisie]");
+        var valeur = bloc.querySelector("[data-autocomplete-valeur]");
+        var liste = bloc.querySelector("datalist");
+        var minuterie = null;
+        var packs = {};
+
+        function selectionner() {
+            var id = packs[saisie.value];
+            valeur.value = id === undefined ? "" : id;
+        }
+
+        function suggerer() {
+            var url = bloc.dataset.url + "?taille=" + SUGGESTIONS + "&q=" + encodeURIComponent(saisie.value.trim());
+            fetch(url, { headers: { "Accept": "application/json" } })
+                .then(function (reponse) { return reponse.ok ? reponse.json() : { packs: [] }; })
+                .then(function (donnees) {
+                    liste.innerHTML = "";
+                    packs = {};
+                    donnees.packs.forEach(function (pack) {
+                        var option = document.createElement("option");
+                        option.value = pack.nom;
+                        liste.appendChild(option);
+                        packs[pack.nom] = pack.id;
+                    });
+                    selectionner();
+                });
+        }
+
+        saisie.addEventListener("input", function () {
+            selectionner();
+            clearTimeout(minuterie);
+            minuterie = setTimeout(suggerer, DELAI_MS);
+        });
+        saisie.addEventListener("change", selectionner);
+    }
+
+    document.addEventListener("DOMContentLoaded", function () {
+        document.querySelectorAll(".autocomplete-pack").forEach(initialiser);
+    });
+})();